@@ -0,0 +1,164 @@
+import argparse
+import json
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from generate_report_data import (
+    TRACE_RELATORIO,
+    TRACE_RELATORIO_HTTP,
+    get_day_stats,
+    is_day_in_scope,
+    matches_relatorio_http_event,
+    new_pending_queue,
+    process_relatorio_event,
+    replay_pairing_trace,
+    scan_log_chunk,
+    serialize_stats,
+)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+USERS = ["", "guest", "ana@microset.com", "bruno@microset.com", "carla@microset.com", "diego@microset.com"]
+# Usuario que so aparece nos eventos (ex.: sincronizacao em lote): nunca pareia e se acumula.
+UNPAIRED_USER = "integracao@microset.com"
+RELATORIO_ROUTES = [
+    ("GET /tickets", "list"),
+    ("POST /tickets", "create"),
+    ("PUT /tickets/:id", "update"),
+    ("DELETE /tickets/:id", "delete"),
+    ("POST /sync", "sync"),
+]
+HTTP_REQUESTS = [
+    ("GET", "/home"),
+    ("GET", "/js/home.js"),
+    ("POST", "/api/mkt"),
+    ("GET", "/api/status/automations"),
+]
+RELATORIO_REQUESTS = [
+    ("GET", "/api/relatorio/tickets"),
+    ("POST", "/api/relatorio/tickets"),
+    ("PUT", "/api/relatorio/tickets/12"),
+    ("DELETE", "/api/relatorio/tickets/12"),
+    ("POST", "/api/relatorio/sync"),
+]
+RELATORIO_REQUEST_SHARE = 0.05
+
+
+def format_stamp(second):
+    return "{:02d}/{}/2026 {:02d}:{:02d}:{:02d}".format(
+        1 + (second // 86400) % 28,
+        MONTHS[(second // (86400 * 28)) % 12],
+        (second // 3600) % 24,
+        (second // 60) % 60,
+        second % 60,
+    )
+
+
+def write_bursty_log(path: Path, total_lines: int, burst_size: int, seed: int):
+    """Trafego HTTP comum com rajadas de eventos de relatorio que demoram a parear."""
+    rnd = random.Random(seed)
+    with path.open("w", encoding="utf-8") as handle:
+        for index in range(total_lines):
+            stamp = format_stamp(index * 2)
+            if index % (burst_size * 8) < burst_size:
+                route, action = rnd.choice(RELATORIO_ROUTES)
+                user = UNPAIRED_USER if rnd.random() < 0.2 else rnd.choice(USERS)
+                user_part = f" user={user}" if user and user != "guest" else ""
+                handle.write(f"[relatorio][{route}][OK] action={action}{user_part} tickets={rnd.randint(0, 40)}\n")
+                continue
+
+            # Poucas requisicoes de relatorio: as rajadas ficam pendentes por muitas linhas.
+            requests = RELATORIO_REQUESTS if rnd.random() < RELATORIO_REQUEST_SHARE else HTTP_REQUESTS
+            method, request_path = rnd.choice(requests)
+            handle.write(
+                f'10.0.0.{rnd.randint(1, 254)} - - [{stamp}] "{method} {request_path} HTTP/1.1" 200 512 - '
+                f"user={rnd.choice(USERS) or 'guest'} user-agent=Mozilla/5.0\n"
+            )
+
+
+def replay_linear(trace, scope):
+    """Pareamento antigo: percorre a lista inteira de pendentes a cada linha HTTP."""
+    start_dt, _, wanted_days = scope
+    daily_stats = {}
+    pending_relatorio_events = []
+    last_http_ts = None
+
+    for trace_kind, payload in trace:
+        if trace_kind == TRACE_RELATORIO:
+            pending_relatorio_events.append({"event": payload, "fallbackTs": last_http_ts})
+            continue
+
+        parsed_http = payload if trace_kind == TRACE_RELATORIO_HTTP else None
+        http_ts = parsed_http["ts"] if parsed_http is not None else payload
+        last_http_ts = http_ts
+        if not pending_relatorio_events:
+            continue
+
+        in_scope = is_day_in_scope(http_ts, *scope)
+        remaining_relatorio_events = []
+        matched_current_http = parsed_http is None
+        for pending in pending_relatorio_events:
+            event = pending["event"]
+            if not matched_current_http and matches_relatorio_http_event(event, parsed_http):
+                if in_scope:
+                    process_relatorio_event(get_day_stats(daily_stats, http_ts), event, http_ts)
+                matched_current_http = True
+                continue
+
+            fallback_ts = pending["fallbackTs"]
+            if fallback_ts is not None and not is_day_in_scope(fallback_ts, start_dt, datetime.max, wanted_days):
+                continue
+            remaining_relatorio_events.append(pending)
+        pending_relatorio_events = remaining_relatorio_events
+
+    return daily_stats, len(pending_relatorio_events)
+
+
+def replay_indexed(trace, scope):
+    daily_stats = {}
+    scan_state = {"lastHttpTs": None, "pending": new_pending_queue()}
+    replay_pairing_trace(scan_state, daily_stats, scope, trace)
+    return daily_stats, scan_state["pending"]["size"]
+
+
+def dump_stats(daily_stats):
+    return json.dumps({day_key: serialize_stats(stats) for day_key, stats in daily_stats.items()}, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o pareamento de relatorio com rajadas de eventos pendentes.")
+    parser.add_argument("--lines", type=int, default=100_000, help="Quantidade de linhas sinteticas")
+    parser.add_argument("--burst", type=int, default=1_000, help="Eventos de relatorio por rajada")
+    parser.add_argument("--seed", type=int, default=7, help="Semente do gerador")
+    args = parser.parse_args()
+
+    # Escopo a partir do segundo dia: os eventos do primeiro expiram como na varredura real.
+    scope = (datetime(2026, 1, 2), datetime(2026, 12, 31, 23, 59, 59), None)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = Path(tmp_dir) / "hub-bursty.log"
+        write_bursty_log(log_path, args.lines, args.burst, args.seed)
+        _, trace, _, _ = scan_log_chunk(str(log_path), 0, log_path.stat().st_size, scope)
+
+    started = time.perf_counter()
+    before, before_pending = replay_linear(trace, scope)
+    before_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    after, after_pending = replay_indexed(trace, scope)
+    after_seconds = time.perf_counter() - started
+
+    if dump_stats(before) != dump_stats(after) or before_pending != after_pending:
+        raise SystemExit("ERRO: o pareamento indexado divergiu do linear.")
+
+    relatorio_events = sum(1 for trace_kind, _ in trace if trace_kind == TRACE_RELATORIO)
+    print(f"Linhas: {args.lines} | eventos de relatorio: {relatorio_events} | pendentes no fim: {after_pending}")
+    print(f"Antes (lista linear): {before_seconds:.2f}s")
+    print(f"Depois (filas indexadas): {after_seconds:.2f}s")
+    print(f"Ganho: {before_seconds / after_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from generate_report_data import (
+    DATE_FORMAT,
+    LINE_HTTP,
+    LINE_RELATORIO,
+    LOG_PATTERN,
+    classify_log_line,
+    parse_http_line,
+    parse_relatorio_line,
+)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+USERS = ["guest", "ana@microset.com", "bruno@microset.com", "carla@microset.com"]
+REQUESTS = [
+    ("POST", "/api/mkt"),
+    ("POST", "/api/bkpMkt"),
+    ("POST", "/api/comandos-mkt/run"),
+    ("GET", "/home"),
+    ("GET", "/js/home.js"),
+    ("GET", "/api/status/automations"),
+    ("GET", "/api/relatorio/tickets"),
+    ("PUT", "/api/relatorio/tickets/12"),
+]
+NOISE = [
+    "[Python LOG] Conectando ao roteador",
+    "[OK] Rebootado 4g: unidade-07",
+    "[SESSION] ana@microset.com Iniciou: Geral",
+    "Traceback (most recent call last):",
+]
+
+
+def write_synthetic_log(path: Path, total_lines: int, seed: int):
+    rnd = random.Random(seed)
+    with path.open("w", encoding="utf-8") as handle:
+        for index in range(total_lines):
+            second = index // 20
+            stamp = "{:02d}/{}/2026 {:02d}:{:02d}:{:02d}".format(
+                1 + (second // 86400) % 28,
+                MONTHS[(second // (86400 * 28)) % 12],
+                (second // 3600) % 24,
+                (second // 60) % 60,
+                second % 60,
+            )
+            roll = rnd.random()
+            if roll < 0.05:
+                handle.write(f"[relatorio][PUT /tickets/:id][OK] action=update user={rnd.choice(USERS)} tickets=3\n")
+            elif roll < 0.25:
+                handle.write(rnd.choice(NOISE) + "\n")
+            else:
+                method, path = rnd.choice(REQUESTS)
+                handle.write(
+                    f'172.19.5.20 - - [{stamp}] "{method} {path} HTTP/1.1" 200 {rnd.randint(10, 99999)} - '
+                    f"user={rnd.choice(USERS)} user-agent=Mozilla/5.0\n"
+                )
+
+
+def parse_http_line_legacy(line):
+    match = LOG_PATTERN.search(line)
+    if not match:
+        return None
+
+    try:
+        ts = datetime.strptime(match["ts"], DATE_FORMAT)
+    except ValueError:
+        return None
+
+    path = match["path"]
+    if "?" in path:
+        path = path.split("?", 1)[0]
+
+    return {
+        "ts": ts,
+        "user": match.group("user") or "",
+        "method": match.group("method"),
+        "path": path,
+        "status": int(match.group("status")),
+    }
+
+
+def parse_regex_only(line):
+    relatorio_event = parse_relatorio_line(line)
+    if relatorio_event is not None:
+        return relatorio_event
+    return parse_http_line_legacy(line)
+
+
+def parse_fast_path(line):
+    line_kind = classify_log_line(line)
+    if line_kind == LINE_RELATORIO:
+        return parse_relatorio_line(line)
+    if line_kind == LINE_HTTP:
+        return parse_http_line(line)
+    return None
+
+
+def run_parser(lines, parser):
+    started = time.perf_counter()
+    results = [parser(line) for line in lines]
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede linhas/s do parser de log do HUB (caminho legado vs caminho rapido).")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Quantidade de linhas sinteticas")
+    parser.add_argument("--seed", type=int, default=7, help="Semente do gerador")
+    parser.add_argument("--log", default=None, help="Usa um log existente em vez do sintetico")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = Path(args.log) if args.log else Path(tmp_dir) / "hub-synthetic.log"
+        if not args.log:
+            write_synthetic_log(log_path, args.lines, args.seed)
+
+        with log_path.open("r", encoding="utf-8", errors="replace") as handle:
+            lines = [line.strip() for line in handle if line.strip()]
+
+    before, before_seconds = run_parser(lines, parse_regex_only)
+    after, after_seconds = run_parser(lines, parse_fast_path)
+
+    if before != after:
+        raise SystemExit("ERRO: a triagem rapida divergiu do parser por regex.")
+
+    print(f"Linhas: {len(lines)}")
+    print(f"Antes (regex + strptime): {len(lines) / before_seconds:,.0f} linhas/s ({before_seconds:.2f}s)")
+    print(f"Depois (caminho rapido): {len(lines) / after_seconds:,.0f} linhas/s ({after_seconds:.2f}s)")
+    print(f"Ganho: {before_seconds / after_seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,29 @@
 import argparse
+import glob
+import gzip
+import hashlib
+import heapq
+import io
 import json
+import mmap
+import operator
+import os
 import re
+import struct
 import sys
-from collections import Counter, defaultdict
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
 PRODUCTIVE_ENDPOINTS = {
     "POST /api/mkt": 51,
     "POST /api/mkt/gerawiki": 17,
@@ -30,6 +48,18 @@ NAV_PATHS = {
     "/api/work-session/active",
 }
 
+# Rotas antigas que continuam contando como a automacao atual.
+PRODUCTIVE_ALIASES = {
+    "/api/comandos-mkt/run": "POST /api/comandos-mkt/scan-super",
+    "/api/4g/run": "POST /api/4g",
+}
+
+NAV_PREFIXES = ("/js/", "/tabela/", "/login")
+
+# Arquivo JSON opcional que substitui as tabelas acima (herdado pelos workers via ambiente).
+ENDPOINTS_CONFIG_ENV = "HUB_ENDPOINTS_CONFIG"
+ROUTE_CACHE_SIZE = 4096
+
 LOG_PATTERN = re.compile(
     r"^(?P<ip>\d+\.\d+\.\d+\.\d+) - - \[(?P<ts>[^\]]+)\] \"(?P<method>GET|POST|PUT|DELETE|PATCH|HEAD) (?P<path>[^ ]+) HTTP/[0-9.]+\" (?P<status>\d{3}) (?P<size>-|\d+)(?: -)?(?: user=(?P<user>[^ ]+))?",
     re.IGNORECASE,
@@ -40,61 +70,195 @@ RELATORIO_PATTERN = re.compile(
     re.IGNORECASE,
 )
 
+LINE_HTTP = "http"
+LINE_RELATORIO = "relatorio"
+LINE_OTHER = "other"
+
+# Contagem de linhas por tipo e por dia. Linha sem timestamp proprio conta no dia do
+# proximo HTTP, o mesmo recorte das janelas do indice do log.
+LINE_KIND_FIELDS = ("http", "relatorio", "python", "bridge", "unparsed", "badTimestamp")
+(
+    LINE_KIND_HTTP,
+    LINE_KIND_RELATORIO,
+    LINE_KIND_PYTHON,
+    LINE_KIND_BRIDGE,
+    LINE_KIND_UNPARSED,
+    LINE_KIND_BAD_TIMESTAMP,
+) = range(len(LINE_KIND_FIELDS))
+# Saida dos scripts Python chamados pelo HUB e do reboot 4G (bridge_cli).
+PYTHON_LOG_PREFIXES = ("[Python ", "[PY]", "[PY ")
+BRIDGE_LOG_PREFIXES = ("[OK] Rebootado 4g", "[bridge_cli]")
+REJECTED_SAMPLE_ENV = "HUB_REJECTED_SAMPLE"
+REJECTED_SAMPLE_LIMIT = 200
+
+RELATORIO_FAMILY_TICKETS = "tickets"
+RELATORIO_FAMILY_TICKET_ID = "ticket-id"
+RELATORIO_FAMILY_ANY = "any"
+PENDING_COMPACT_THRESHOLD = 4096
+
+# Rastro de pareamento devolvido pelos workers do modo --workers.
+TRACE_RELATORIO = "relatorio"
+TRACE_RELATORIO_HTTP = "relatorio-http"
+TRACE_HTTP = "http"
+
 KEY_VALUE_PATTERN = re.compile(r"(?P<key>[A-Za-z][A-Za-z0-9_]*)=(?P<value>\S+)")
 DATE_FORMAT = "%d/%b/%Y %H:%M:%S"
 DATE_ONLY_FORMAT = "%Y-%m-%d"
+MONTH_NUMBERS = {
+    name: number
+    for number, name in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"],
+        start=1,
+    )
+}
+TIMESTAMP_CACHE_SIZE = 4096
 MAX_RANGE_DAYS = 90
-CACHE_SCHEMA_VERSION = 2
+# 4: cubo por hora e tipos de linha sempre presentes. Schemas anteriores ainda sao lidos
+# (secoes que faltam ficam vazias) e refeitos so quando o log ainda tem o dia.
+CACHE_SCHEMA_VERSION = 4
+FIRST_BINARY_CACHE_SCHEMA_VERSION = 3
+LEGACY_CACHE_SCHEMA_VERSION = 2
+# Cache diario: cabecalho fixo (magic, schema, flags, data, digest do log, mtime do log,
+# tamanho do corpo) seguido do corpo em JSON compacto.
+DAY_CACHE_MAGIC = b"HUBD"
+DAY_CACHE_HEADER = struct.Struct("<4sHB10s8sqI")
+DAY_CACHE_FLAG_OPEN = 1
+DAY_CACHE_HEADER_FIELDS = {"schemaVersion", "date", "open", "sourceLogFingerprint", "sourceLogMtimeNs", "cacheBytes"}
+ROLLUP_DAY = "day"
+ROLLUP_WEEK = "week"
+ROLLUP_MONTH = "month"
+LOG_INDEX_SCHEMA_VERSION = 1
+LOG_INDEX_HEAD_BYTES = 4096
+LOG_FILES_SCHEMA_VERSION = 1
+TOTALS_INDEX_SCHEMA_VERSION = 4
+LOG_SET_PATTERNS = ("*.log", "*.log.gz", "*.txt", "*.txt.gz")
+TAIL_DIGEST_BYTES = 4096
+SCAN_CHUNK_BYTES = 8 * 1024 * 1024
+SERVE_MEMORY_ENTRIES = 512
+# Campos de meta que mudam a cada execucao e ficam fora do hash do relatorio.
+REPORT_VOLATILE_META = frozenset({"generatedAt", "cacheHits", "cacheMisses", "scanSeconds", "tailBytes", "rollupHits", "profile"})
+REPORT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+LOCK_POLL_SECONDS = 0.05
+REPLACE_RETRIES = 20
+
+# Slots dos stats compactos: vetor de KPIs e registros em lista por endpoint/usuario.
+KPI_FIELDS = ("totalRequests", "productiveActions", "navigationActions", "totalEconomyMin", "pythonLogs", "bridgeLogs")
+KPI_TOTAL_REQUESTS, KPI_PRODUCTIVE_ACTIONS, KPI_NAVIGATION_ACTIONS, KPI_ECONOMY_MIN, KPI_PYTHON_LOGS, KPI_BRIDGE_LOGS = range(
+    len(KPI_FIELDS)
+)
+ENDPOINT_FREQUENCY, ENDPOINT_ECONOMY_MIN, ENDPOINT_TIME_PER_CALL_MIN, ENDPOINT_USERS = range(4)
+USER_TOTAL_REQUESTS, USER_PRODUCTIVE_ACTIONS, USER_ECONOMY_MIN, USER_ENDPOINTS = range(4)
+(
+    RELATORIO_USER_EVENTS,
+    RELATORIO_USER_LAST_TICKETS,
+    RELATORIO_USER_MAX_TICKETS,
+    RELATORIO_USER_LAST_SYNC_VERSION,
+    RELATORIO_USER_LAST_EVENT_TS,
+    RELATORIO_USER_ACTIONS,
+    RELATORIO_USER_RESULTS,
+) = range(7)
+STATS_SECTIONS = ("kpis", "statusDistribution", "endpoints", "users", "dailyActivity", "hourly", "relatorio")
+# Secoes do relatorio, na ordem de saida, e a secao dos stats de que cada uma depende.
+REPORT_SECTIONS = {
+    "kpis": "kpis",
+    "summary": "kpis",
+    "lineKinds": "kpis",
+    "statusDistribution": "statusDistribution",
+    "endpointEconomy": "endpoints",
+    "userActivityEndpoints": "users",
+    "userProductivity": "users",
+    "productiveEndpoints": "endpoints",
+    "dailyActivity": "dailyActivity",
+    "hourlyHeatmap": "hourly",
+    "relatorioSummary": "relatorio",
+    "relatorioUsers": "relatorio",
+    "relatorioActions": "relatorio",
+    "relatorioRoutes": "relatorio",
+    "relatorioDailyActivity": "relatorio",
+}
+TOTALS_STATS_SECTIONS = frozenset({"kpis", "statusDistribution", "endpoints", "relatorio"})
+# Cubo por hora: requisicoes fora dos endpoints produtivos caem em dois baldes fixos.
+HOURLY_NAV_ENDPOINT = "(navegacao)"
+HOURLY_OTHER_ENDPOINT = "(outros)"
+HOURS_PER_DAY = 24
+HOURS_PER_WEEK = 7 * HOURS_PER_DAY
+WEEKDAY_LABELS = ("seg", "ter", "qua", "qui", "sex", "sab", "dom")
+HEATMAP_TOP_ENDPOINTS = 10
+
+
+# Nomes (usuarios, endpoints, status, datas, acoes...) viram ids inteiros do processo:
+# os stats guardam so os ids e cada string existe uma unica vez na memoria.
+INTERNED_NAMES = []
+INTERNED_IDS = {}
+
+
+# Linhas/bytes lidos pelos parsers neste processo; as coletas medem a diferenca.
+SCAN_COUNTERS = {"linesRead": 0, "bytesRead": 0, "httpRejected": 0, "relatorioRejected": 0}
+
+# Amostra das linhas rejeitadas (--rejected-sample): ate "limit" linhas por tipo. O limite
+# vem do ambiente para valer tambem nos workers do --workers.
+REJECTED_SAMPLE = {"limit": int(os.environ.get(REJECTED_SAMPLE_ENV) or 0), "lines": {}}
+
+
+def intern_name(name):
+    name_id = INTERNED_IDS.get(name)
+    if name_id is None:
+        name_id = len(INTERNED_NAMES)
+        INTERNED_IDS[name] = name_id
+        INTERNED_NAMES.append(name)
+    return name_id
+
+
+HOURLY_NAV_ID = intern_name(HOURLY_NAV_ENDPOINT)
+HOURLY_OTHER_ID = intern_name(HOURLY_OTHER_ENDPOINT)
+
+
+def new_endpoint_record():
+    return [0, 0, 0, defaultdict(int)]
+
+
+def new_user_record():
+    return [0, 0, 0, defaultdict(int)]
+
+
+def new_hourly_record():
+    return [0] * HOURS_PER_DAY
+
+
+def new_line_kinds():
+    return [0] * len(LINE_KIND_FIELDS)
+
+
+def new_relatorio_user_record():
+    return [0, 0, 0, 0, "", defaultdict(int), defaultdict(int)]
 
 
 def empty_stats():
+    """Stats compactos: KPIs em vetor, registros em listas por slot e chaves internadas."""
     return {
-        "kpis": {
-            "totalRequests": 0,
-            "distinctUsers": set(),
-            "productiveActions": 0,
-            "navigationActions": 0,
-            "totalEconomyMin": 0,
-            "pythonLogs": 0,
-            "bridgeLogs": 0,
+        "kpis": [0] * len(KPI_FIELDS),
+        "distinctUsers": set(),
+        "statusDistribution": defaultdict(int),
+        "endpoints": defaultdict(new_endpoint_record),
+        "users": defaultdict(new_user_record),
+        "dailyActivity": defaultdict(int),
+        "lineKinds": new_line_kinds(),
+        # Cubo hora x endpoint x status, mais requisicoes e erros 5xx por hora da semana
+        # (dia da semana * 24 + hora) para o heatmap 7x24.
+        "hourly": {
+            "cube": defaultdict(new_hourly_record),
+            "week": [0] * HOURS_PER_WEEK,
+            "weekServerErrors": [0] * HOURS_PER_WEEK,
         },
-        "statusDistribution": Counter(),
-        "endpoints": defaultdict(
-            lambda: {
-                "frequency": 0,
-                "economyMin": 0,
-                "timePerCallMin": 0,
-                "users": defaultdict(int),
-            }
-        ),
-        "users": defaultdict(
-            lambda: {
-                "totalRequests": 0,
-                "productiveActions": 0,
-                "economyMin": 0,
-                "endpoints": defaultdict(int),
-            }
-        ),
-        "dailyActivity": Counter(),
         "relatorio": {
             "totalEvents": 0,
             "distinctUsers": set(),
-            "actions": Counter(),
-            "routes": Counter(),
-            "results": Counter(),
-            "dailyActivity": Counter(),
+            "actions": defaultdict(int),
+            "routes": defaultdict(int),
+            "results": defaultdict(int),
+            "dailyActivity": defaultdict(int),
             "maxSyncVersion": 0,
-            "users": defaultdict(
-                lambda: {
-                    "events": 0,
-                    "actions": Counter(),
-                    "results": Counter(),
-                    "lastTickets": 0,
-                    "maxTickets": 0,
-                    "lastSyncVersion": 0,
-                    "lastEventTs": "",
-                }
-            ),
+            "users": defaultdict(new_relatorio_user_record),
         },
     }
 
@@ -106,26 +270,60 @@ def month_range(target_date):
     return last_month_start.date(), last_month_end.date()
 
 
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_log_timestamp(raw_ts):
+    """Decodifica DATE_FORMAT sem strptime no formato fixo que o morgan grava.
+
+    Variacoes aceitas pelo strptime (dia com 1 digito, mes minusculo, espacos extras)
+    seguem para ele, entao o resultado e os ValueError sao os mesmos.
+    """
+    month = MONTH_NUMBERS.get(raw_ts[3:6])
+    digits = raw_ts[:2] + raw_ts[7:11] + raw_ts[12:14] + raw_ts[15:17] + raw_ts[18:]
+    if (
+        month is None
+        or len(raw_ts) != 20
+        or raw_ts[2] != "/"
+        or raw_ts[6] != "/"
+        or raw_ts[11] != " "
+        or raw_ts[14] != ":"
+        or raw_ts[17] != ":"
+        or not digits.isascii()
+        or not digits.isdigit()
+    ):
+        return datetime.strptime(raw_ts, DATE_FORMAT)
+
+    return datetime(
+        int(raw_ts[7:11]),
+        month,
+        int(raw_ts[:2]),
+        int(raw_ts[12:14]),
+        int(raw_ts[15:17]),
+        int(raw_ts[18:]),
+    )
+
+
 def parse_http_line(line):
-    match = LOG_PATTERN.search(line)
+    # O padrao comeca com "^", entao match() equivale ao search() original; groups()
+    # evita uma chamada de group() por campo.
+    match = LOG_PATTERN.match(line)
     if not match:
         return None
 
+    _, ts_raw, method, path, status, _, user = match.groups()
     try:
-        ts = datetime.strptime(match["ts"], DATE_FORMAT)
+        ts = parse_log_timestamp(ts_raw)
     except ValueError:
         return None
 
-    path = match["path"]
     if "?" in path:
         path = path.split("?", 1)[0]
 
     return {
         "ts": ts,
-        "user": match.group("user") or "",
-        "method": match.group("method"),
+        "user": user or "",
+        "method": method,
         "path": path,
-        "status": int(match.group("status")),
+        "status": int(status),
     }
 
 
@@ -154,45 +352,189 @@ def parse_relatorio_line(line):
     }
 
 
+def classify_log_line(line):
+    """Triagem barata pelo primeiro caractere antes de qualquer regex."""
+    first_char = line[0]
+    if first_char == "[":
+        prefix = line[:11]
+        # Fora do ASCII o IGNORECASE do regex pode casar variantes Unicode de "relatorio".
+        if not prefix.isascii() or prefix.lower() == "[relatorio]":
+            return LINE_RELATORIO
+        return LINE_OTHER
+    if first_char.isdecimal():
+        return LINE_HTTP
+    return LINE_OTHER
+
+
+def classify_other_line(line):
+    """Tipo de uma linha que nao e HTTP nem relatorio."""
+    if line.startswith(PYTHON_LOG_PREFIXES):
+        return LINE_KIND_PYTHON
+    if line.startswith(BRIDGE_LOG_PREFIXES):
+        return LINE_KIND_BRIDGE
+    return LINE_KIND_UNPARSED
+
+
+def rejected_http_kind(line):
+    # parse_http_line devolve None nos dois casos; so a linha que casa o formato tem data ruim.
+    return LINE_KIND_BAD_TIMESTAMP if LOG_PATTERN.match(line) else LINE_KIND_UNPARSED
+
+
+def add_line_kinds(stats, line_kinds):
+    stats["lineKinds"] = list(map(operator.add, stats["lineKinds"], line_kinds))
+    kpis = stats["kpis"]
+    kpis[KPI_PYTHON_LOGS] += line_kinds[LINE_KIND_PYTHON]
+    kpis[KPI_BRIDGE_LOGS] += line_kinds[LINE_KIND_BRIDGE]
+
+
+def sample_rejected_line(sample, line_kind, line):
+    limit = REJECTED_SAMPLE["limit"]
+    if not limit:
+        return
+    lines = sample.setdefault(LINE_KIND_FIELDS[line_kind], [])
+    if len(lines) < limit:
+        lines.append(line)
+
+
+def merge_rejected_sample(sample):
+    limit = REJECTED_SAMPLE["limit"]
+    for kind_name, lines in sample.items():
+        target = REJECTED_SAMPLE["lines"].setdefault(kind_name, [])
+        target.extend(lines[: max(0, limit - len(target))])
+
+
+def enable_rejected_sample(limit):
+    REJECTED_SAMPLE["limit"] = limit
+    # Workers do ProcessPoolExecutor (spawn no Windows) reimportam o modulo.
+    os.environ[REJECTED_SAMPLE_ENV] = str(limit)
+
+
+def write_rejected_sample(output_path: Path):
+    """Uma linha por amostra: tipo, tab e a linha original."""
+    rows = [
+        f"{kind_name}\t{line}\n"
+        for kind_name in LINE_KIND_FIELDS
+        for line in REJECTED_SAMPLE["lines"].get(kind_name, [])
+    ]
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text("".join(rows), encoding="utf-8")
+    return len(rows)
+
+
+def report_rejected_sample(raw_path):
+    if not raw_path:
+        return
+    sampled = write_rejected_sample(Path(raw_path))
+    # stderr: o stdout pode ser o JSON do relatorio.
+    sys.stderr.write(f"Amostra de linhas rejeitadas: {sampled} em {raw_path}\n")
+
+
 def normalize_path(path):
     if path.startswith("/api/"):
         return path.split("?", 1)[0]
     return path
 
 
-def normalize_productive_request_key(method, path):
-    if method != "POST":
-        return None
+def endpoint_table_digest(productive_endpoints, nav_paths, aliases, nav_prefixes):
+    table = {
+        "productiveEndpoints": productive_endpoints,
+        "navPaths": sorted(nav_paths),
+        "aliases": aliases,
+        "navPrefixes": list(nav_prefixes),
+    }
+    return hashlib.sha1(json.dumps(table, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def compile_route_classifier(
+    productive_endpoints=PRODUCTIVE_ENDPOINTS,
+    nav_paths=NAV_PATHS,
+    aliases=PRODUCTIVE_ALIASES,
+    nav_prefixes=NAV_PREFIXES,
+):
+    """Monta uma vez as tabelas de prefixo usadas por classify_request.
+
+    O casamento continua sendo por prefixo de texto (nao por segmento), como no
+    startswith original: "/api/mktX" ainda conta como "POST /api/mkt".
+    """
+    prefixes = {}
+    for key in productive_endpoints:
+        method, _, path = key.partition(" ")
+        # So POST conta como acao produtiva; chaves de outros metodos nunca casavam.
+        if method == "POST":
+            prefixes[path] = key
+
+    digest = endpoint_table_digest(productive_endpoints, nav_paths, aliases, nav_prefixes)
+    builtin_digest = endpoint_table_digest(PRODUCTIVE_ENDPOINTS, NAV_PATHS, PRODUCTIVE_ALIASES, NAV_PREFIXES)
+    return {
+        "productive": dict(productive_endpoints),
+        "prefixes": prefixes,
+        "prefixLengths": sorted({len(path) for path in prefixes}, reverse=True),
+        "aliases": tuple(aliases.items()),
+        "navPaths": frozenset(nav_paths),
+        "navPrefixes": tuple(nav_prefixes),
+        # Tabela padrao nao marca o cache, assim os caches ja gravados continuam validos.
+        "digest": None if digest == builtin_digest else digest,
+    }
 
-    if path.startswith("/api/comandos-mkt/run"):
-        return "POST /api/comandos-mkt/scan-super"
-    if path.startswith("/api/4g/run"):
-        return "POST /api/4g"
 
-    candidate = f"{method} {path}"
-    if candidate in PRODUCTIVE_ENDPOINTS:
-        return candidate
+def load_route_classifier(config_path):
+    """Le o JSON de endpoints; chaves ausentes mantem a tabela padrao."""
+    try:
+        payload = json.loads(Path(config_path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as error:
+        raise ValueError(f"Configuracao de endpoints invalida: {config_path} ({error})") from error
 
-    candidates = [key for key in PRODUCTIVE_ENDPOINTS if candidate.startswith(key)]
-    if not candidates:
-        return None
+    if not isinstance(payload, dict):
+        raise ValueError(f"Configuracao de endpoints invalida: {config_path} (esperado um objeto JSON)")
 
-    return max(candidates, key=len)
+    try:
+        productive_endpoints = {
+            str(key): int(minutes) for key, minutes in payload.get("productiveEndpoints", PRODUCTIVE_ENDPOINTS).items()
+        }
+        nav_paths = {str(path) for path in payload.get("navPaths", NAV_PATHS)}
+        aliases = {str(prefix): str(key) for prefix, key in payload.get("aliases", PRODUCTIVE_ALIASES).items()}
+        nav_prefixes = tuple(str(prefix) for prefix in payload.get("navPrefixes", NAV_PREFIXES))
+    except (AttributeError, TypeError, ValueError) as error:
+        raise ValueError(f"Configuracao de endpoints invalida: {config_path} ({error})") from error
+
+    return compile_route_classifier(productive_endpoints, nav_paths, aliases, nav_prefixes)
+
+
+def install_route_classifier(config_path=None):
+    global ROUTE_CLASSIFIER
+    if config_path:
+        ROUTE_CLASSIFIER = load_route_classifier(config_path)
+        # Workers do ProcessPoolExecutor (spawn no Windows) reimportam o modulo.
+        os.environ[ENDPOINTS_CONFIG_ENV] = str(config_path)
+    else:
+        ROUTE_CLASSIFIER = compile_route_classifier()
+    classify_request.cache_clear()
+    return ROUTE_CLASSIFIER
 
 
-def is_productive_request(method, path):
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def classify_request(method, path):
+    """Devolve (chave produtiva ou None, eh navegacao) para o metodo e o path bruto."""
+    classifier = ROUTE_CLASSIFIER
+    is_nav = path in classifier["navPaths"] or path.startswith(classifier["navPrefixes"])
     if method != "POST":
-        return False
+        return None, is_nav
 
-    return normalize_productive_request_key(method, normalize_path(path)) is not None
+    path = normalize_path(path)
+    for prefix, key in classifier["aliases"]:
+        if path.startswith(prefix):
+            return key, is_nav
 
+    prefixes = classifier["prefixes"]
+    for length in classifier["prefixLengths"]:
+        key = prefixes.get(path[:length])
+        if key is not None:
+            return key, is_nav
+    return None, is_nav
 
-def is_navigation_path(method, path):
-    if path in NAV_PATHS:
-        return True
-    if path.startswith("/api/") and not is_productive_request(method, path):
-        return False
-    return path.startswith("/js/") or path.startswith("/tabela/") or path.startswith("/login")
+
+ROUTE_CLASSIFIER = None
+install_route_classifier(os.environ.get(ENDPOINTS_CONFIG_ENV))
 
 
 def is_relatorio_http_request(parsed_http):
@@ -228,7 +570,7 @@ def should_track_user_endpoint(productive_key):
 
 
 def to_date_key(ts):
-    return ts.strftime(DATE_ONLY_FORMAT)
+    return ts.date().isoformat()
 
 
 def get_day_stats(daily_stats, ts):
@@ -244,600 +586,3039 @@ def process_relatorio_event(stats, relatorio_event, event_ts):
 
     relatorio_stats = stats["relatorio"]
     user = (relatorio_event["user"] or "").strip().lower()
-    action = relatorio_event["action"] or "unknown"
-    result = relatorio_event["result"] or "UNKNOWN"
-    route = relatorio_event["route"] or "unknown"
+    action_id = intern_name(relatorio_event["action"] or "unknown")
+    result_id = intern_name(relatorio_event["result"] or "UNKNOWN")
+    route_id = intern_name(relatorio_event["route"] or "unknown")
     tickets = relatorio_event["tickets"]
     sync_version = relatorio_event["syncVersion"]
-    event_key = to_date_key(event_ts)
     event_iso = event_ts.isoformat(timespec="seconds")
 
     relatorio_stats["totalEvents"] += 1
-    relatorio_stats["actions"][action] += 1
-    relatorio_stats["routes"][route] += 1
-    relatorio_stats["results"][result] += 1
-    relatorio_stats["dailyActivity"][event_key] += 1
+    relatorio_stats["actions"][action_id] += 1
+    relatorio_stats["routes"][route_id] += 1
+    relatorio_stats["results"][result_id] += 1
+    relatorio_stats["dailyActivity"][intern_name(to_date_key(event_ts))] += 1
 
     if sync_version is not None:
         relatorio_stats["maxSyncVersion"] = max(relatorio_stats["maxSyncVersion"], sync_version)
 
     if user:
-        relatorio_stats["distinctUsers"].add(user)
-        user_stats = relatorio_stats["users"][user]
-        user_stats["events"] += 1
-        user_stats["actions"][action] += 1
-        user_stats["results"][result] += 1
+        user_id = intern_name(user)
+        relatorio_stats["distinctUsers"].add(user_id)
+        user_record = relatorio_stats["users"][user_id]
+        user_record[RELATORIO_USER_EVENTS] += 1
+        user_record[RELATORIO_USER_ACTIONS][action_id] += 1
+        user_record[RELATORIO_USER_RESULTS][result_id] += 1
+        last_event_ts = user_record[RELATORIO_USER_LAST_EVENT_TS]
 
         if tickets is not None:
-            user_stats["maxTickets"] = max(user_stats["maxTickets"], tickets)
-            if not user_stats["lastEventTs"] or event_iso >= user_stats["lastEventTs"]:
-                user_stats["lastTickets"] = tickets
+            user_record[RELATORIO_USER_MAX_TICKETS] = max(user_record[RELATORIO_USER_MAX_TICKETS], tickets)
+            if not last_event_ts or event_iso >= last_event_ts:
+                user_record[RELATORIO_USER_LAST_TICKETS] = tickets
 
         if sync_version is not None:
-            user_stats["lastSyncVersion"] = max(user_stats["lastSyncVersion"], sync_version)
+            user_record[RELATORIO_USER_LAST_SYNC_VERSION] = max(user_record[RELATORIO_USER_LAST_SYNC_VERSION], sync_version)
 
-        if not user_stats["lastEventTs"] or event_iso >= user_stats["lastEventTs"]:
-            user_stats["lastEventTs"] = event_iso
+        if not last_event_ts or event_iso >= last_event_ts:
+            user_record[RELATORIO_USER_LAST_EVENT_TS] = event_iso
 
 
 def update_http_stats(stats, parsed_http):
     user = parsed_http["user"].strip().lower()
     is_guest = user == "guest" or not user
+    user_id = None if is_guest else intern_name(user)
+    kpis = stats["kpis"]
 
-    stats["kpis"]["totalRequests"] += 1
+    kpis[KPI_TOTAL_REQUESTS] += 1
     if not is_guest:
-        stats["kpis"]["distinctUsers"].add(user)
+        stats["distinctUsers"].add(user_id)
 
-    stats["statusDistribution"][str(parsed_http["status"])] += 1
-    stats["dailyActivity"][to_date_key(parsed_http["ts"])] += 1
+    http_ts = parsed_http["ts"]
+    status = parsed_http["status"]
+    status_id = intern_name(str(status))
+    stats["statusDistribution"][status_id] += 1
+    stats["dailyActivity"][intern_name(to_date_key(http_ts))] += 1
 
-    normalized_path = normalize_path(parsed_http["path"])
-    productive_key = normalize_productive_request_key(parsed_http["method"], normalized_path)
+    productive_key, is_nav = classify_request(parsed_http["method"], parsed_http["path"])
     is_prod = productive_key is not None
-    is_nav = is_navigation_path(parsed_http["method"], parsed_http["path"])
+    endpoint_id = intern_name(productive_key) if is_prod else None
+
+    hourly = stats["hourly"]
+    hourly_endpoint_id = endpoint_id if is_prod else HOURLY_NAV_ID if is_nav else HOURLY_OTHER_ID
+    hourly["cube"][(hourly_endpoint_id, status_id)][http_ts.hour] += 1
+    hour_of_week = http_ts.weekday() * HOURS_PER_DAY + http_ts.hour
+    hourly["week"][hour_of_week] += 1
+    if status >= 500:
+        hourly["weekServerErrors"][hour_of_week] += 1
 
     if is_prod and not is_guest:
-        economy_min = PRODUCTIVE_ENDPOINTS.get(productive_key, 0)
-        stats["kpis"]["productiveActions"] += 1
-        stats["kpis"]["totalEconomyMin"] += economy_min
-
-        endpoint_stats = stats["endpoints"][productive_key]
-        endpoint_stats["frequency"] += 1
-        endpoint_stats["economyMin"] += economy_min
-        endpoint_stats["timePerCallMin"] = PRODUCTIVE_ENDPOINTS.get(productive_key, 0)
-        endpoint_stats["users"][user] += 1
-
-        user_stats = stats["users"][user]
-        user_stats["productiveActions"] += 1
-        user_stats["economyMin"] += economy_min
+        economy_min = ROUTE_CLASSIFIER["productive"].get(productive_key, 0)
+        kpis[KPI_PRODUCTIVE_ACTIONS] += 1
+        kpis[KPI_ECONOMY_MIN] += economy_min
+
+        endpoint_record = stats["endpoints"][endpoint_id]
+        endpoint_record[ENDPOINT_FREQUENCY] += 1
+        endpoint_record[ENDPOINT_ECONOMY_MIN] += economy_min
+        endpoint_record[ENDPOINT_TIME_PER_CALL_MIN] = economy_min
+        endpoint_record[ENDPOINT_USERS][user_id] += 1
+
+        user_record = stats["users"][user_id]
+        user_record[USER_PRODUCTIVE_ACTIONS] += 1
+        user_record[USER_ECONOMY_MIN] += economy_min
     elif is_nav:
-        stats["kpis"]["navigationActions"] += 1
+        kpis[KPI_NAVIGATION_ACTIONS] += 1
 
     if not is_guest:
-        user_stats = stats["users"][user]
-        user_stats["totalRequests"] += 1
+        user_record = stats["users"][user_id]
+        user_record[USER_TOTAL_REQUESTS] += 1
         if should_track_user_endpoint(productive_key):
-            user_stats["endpoints"][productive_key] += 1
+            user_record[USER_ENDPOINTS][endpoint_id] += 1
+
+
+def named_counts(counts):
+    names = INTERNED_NAMES
+    return {names[name_id]: count for name_id, count in counts.items()}
+
+
+def sorted_names(name_ids):
+    names = INTERNED_NAMES
+    return sorted(names[name_id] for name_id in name_ids)
+
+
+def interned_counts(counts, payload):
+    for name, count in payload.items():
+        counts[intern_name(name)] += int(count)
+
+
+def add_counts(target, source):
+    for name_id, count in source.items():
+        target[name_id] += count
+
+
+def serialize_hourly(hourly):
+    names = INTERNED_NAMES
+    cube = {}
+    for (endpoint_id, status_id), hours in hourly["cube"].items():
+        cube.setdefault(names[endpoint_id], {})[names[status_id]] = hours
+    return {"cube": cube, "week": hourly["week"], "weekServerErrors": hourly["weekServerErrors"]}
 
 
 def serialize_stats(stats):
+    names = INTERNED_NAMES
+    kpis = stats["kpis"]
+    relatorio_stats = stats["relatorio"]
     return {
         "kpis": {
-            "totalRequests": stats["kpis"]["totalRequests"],
-            "distinctUsers": sorted(stats["kpis"]["distinctUsers"]),
-            "productiveActions": stats["kpis"]["productiveActions"],
-            "navigationActions": stats["kpis"]["navigationActions"],
-            "totalEconomyMin": stats["kpis"]["totalEconomyMin"],
-            "pythonLogs": stats["kpis"].get("pythonLogs", 0),
-            "bridgeLogs": stats["kpis"].get("bridgeLogs", 0),
+            "totalRequests": kpis[KPI_TOTAL_REQUESTS],
+            "distinctUsers": sorted_names(stats["distinctUsers"]),
+            "productiveActions": kpis[KPI_PRODUCTIVE_ACTIONS],
+            "navigationActions": kpis[KPI_NAVIGATION_ACTIONS],
+            "totalEconomyMin": kpis[KPI_ECONOMY_MIN],
+            "pythonLogs": kpis[KPI_PYTHON_LOGS],
+            "bridgeLogs": kpis[KPI_BRIDGE_LOGS],
         },
-        "statusDistribution": dict(stats["statusDistribution"]),
+        "statusDistribution": named_counts(stats["statusDistribution"]),
         "endpoints": {
-            endpoint: {
-                "frequency": data["frequency"],
-                "economyMin": data["economyMin"],
-                "timePerCallMin": data["timePerCallMin"],
-                "users": dict(data["users"]),
+            names[endpoint_id]: {
+                "frequency": record[ENDPOINT_FREQUENCY],
+                "economyMin": record[ENDPOINT_ECONOMY_MIN],
+                "timePerCallMin": record[ENDPOINT_TIME_PER_CALL_MIN],
+                "users": named_counts(record[ENDPOINT_USERS]),
             }
-            for endpoint, data in stats["endpoints"].items()
+            for endpoint_id, record in stats["endpoints"].items()
         },
         "users": {
-            user: {
-                "totalRequests": data["totalRequests"],
-                "productiveActions": data["productiveActions"],
-                "economyMin": data["economyMin"],
-                "endpoints": dict(data["endpoints"]),
+            names[user_id]: {
+                "totalRequests": record[USER_TOTAL_REQUESTS],
+                "productiveActions": record[USER_PRODUCTIVE_ACTIONS],
+                "economyMin": record[USER_ECONOMY_MIN],
+                "endpoints": named_counts(record[USER_ENDPOINTS]),
             }
-            for user, data in stats["users"].items()
+            for user_id, record in stats["users"].items()
         },
-        "dailyActivity": dict(stats["dailyActivity"]),
+        "dailyActivity": named_counts(stats["dailyActivity"]),
+        "lineKinds": dict(zip(LINE_KIND_FIELDS, stats["lineKinds"])),
+        "hourly": serialize_hourly(stats["hourly"]),
         "relatorio": {
-            "totalEvents": stats["relatorio"]["totalEvents"],
-            "distinctUsers": sorted(stats["relatorio"]["distinctUsers"]),
-            "actions": dict(stats["relatorio"]["actions"]),
-            "routes": dict(stats["relatorio"]["routes"]),
-            "results": dict(stats["relatorio"]["results"]),
-            "dailyActivity": dict(stats["relatorio"]["dailyActivity"]),
-            "maxSyncVersion": stats["relatorio"]["maxSyncVersion"],
+            "totalEvents": relatorio_stats["totalEvents"],
+            "distinctUsers": sorted_names(relatorio_stats["distinctUsers"]),
+            "actions": named_counts(relatorio_stats["actions"]),
+            "routes": named_counts(relatorio_stats["routes"]),
+            "results": named_counts(relatorio_stats["results"]),
+            "dailyActivity": named_counts(relatorio_stats["dailyActivity"]),
+            "maxSyncVersion": relatorio_stats["maxSyncVersion"],
             "users": {
-                user: {
-                    "events": data["events"],
-                    "actions": dict(data["actions"]),
-                    "results": dict(data["results"]),
-                    "lastTickets": data["lastTickets"],
-                    "maxTickets": data["maxTickets"],
-                    "lastSyncVersion": data["lastSyncVersion"],
-                    "lastEventTs": data.get("lastEventTs", ""),
+                names[user_id]: {
+                    "events": record[RELATORIO_USER_EVENTS],
+                    "actions": named_counts(record[RELATORIO_USER_ACTIONS]),
+                    "results": named_counts(record[RELATORIO_USER_RESULTS]),
+                    "lastTickets": record[RELATORIO_USER_LAST_TICKETS],
+                    "maxTickets": record[RELATORIO_USER_MAX_TICKETS],
+                    "lastSyncVersion": record[RELATORIO_USER_LAST_SYNC_VERSION],
+                    "lastEventTs": record[RELATORIO_USER_LAST_EVENT_TS],
                 }
-                for user, data in stats["relatorio"]["users"].items()
+                for user_id, record in relatorio_stats["users"].items()
             },
         },
     }
 
 
-def deserialize_stats(payload):
+def deserialize_stats(payload, sections=None):
+    """Reconstroi os stats; com sections, so essas secoes sao decodificadas e as outras ficam vazias."""
     stats = empty_stats()
+    wanted = STATS_SECTIONS if sections is None else sections
+
+    if "kpis" in wanted:
+        kpis_payload = payload.get("kpis", {})
+        stats["kpis"] = [int(kpis_payload.get(field, 0)) for field in KPI_FIELDS]
+        stats["distinctUsers"].update(intern_name(user) for user in kpis_payload.get("distinctUsers", []))
+        line_kinds_payload = payload.get("lineKinds", {})
+        stats["lineKinds"] = [int(line_kinds_payload.get(field, 0)) for field in LINE_KIND_FIELDS]
+
+    if "statusDistribution" in wanted:
+        interned_counts(stats["statusDistribution"], payload.get("statusDistribution", {}))
+
+    if "endpoints" in wanted:
+        for endpoint, data in payload.get("endpoints", {}).items():
+            endpoint_record = stats["endpoints"][intern_name(endpoint)]
+            endpoint_record[ENDPOINT_FREQUENCY] += int(data.get("frequency", 0))
+            endpoint_record[ENDPOINT_ECONOMY_MIN] += int(data.get("economyMin", 0))
+            endpoint_record[ENDPOINT_TIME_PER_CALL_MIN] = max(
+                endpoint_record[ENDPOINT_TIME_PER_CALL_MIN],
+                int(data.get("timePerCallMin", 0)),
+            )
+            interned_counts(endpoint_record[ENDPOINT_USERS], data.get("users", {}))
+
+    if "users" in wanted:
+        for user, data in payload.get("users", {}).items():
+            user_record = stats["users"][intern_name(user)]
+            user_record[USER_TOTAL_REQUESTS] += int(data.get("totalRequests", 0))
+            user_record[USER_PRODUCTIVE_ACTIONS] += int(data.get("productiveActions", 0))
+            user_record[USER_ECONOMY_MIN] += int(data.get("economyMin", 0))
+            interned_counts(user_record[USER_ENDPOINTS], data.get("endpoints", {}))
+
+    if "dailyActivity" in wanted:
+        interned_counts(stats["dailyActivity"], payload.get("dailyActivity", {}))
+
+    if "hourly" in wanted:
+        hourly_payload = payload.get("hourly", {})
+        hourly = stats["hourly"]
+        for endpoint, statuses in hourly_payload.get("cube", {}).items():
+            endpoint_id = intern_name(endpoint)
+            for status, hours in statuses.items():
+                hourly["cube"][(endpoint_id, intern_name(status))] = [int(count) for count in hours]
+        hourly["week"] = [int(count) for count in hourly_payload.get("week", hourly["week"])]
+        hourly["weekServerErrors"] = [int(count) for count in hourly_payload.get("weekServerErrors", hourly["weekServerErrors"])]
+
+    if "relatorio" in wanted:
+        deserialize_relatorio_stats(stats["relatorio"], payload.get("relatorio", {}))
+
+    return stats
 
-    kpis = payload.get("kpis", {})
-    stats["kpis"]["totalRequests"] = int(kpis.get("totalRequests", 0))
-    stats["kpis"]["distinctUsers"].update(kpis.get("distinctUsers", []))
-    stats["kpis"]["productiveActions"] = int(kpis.get("productiveActions", 0))
-    stats["kpis"]["navigationActions"] = int(kpis.get("navigationActions", 0))
-    stats["kpis"]["totalEconomyMin"] = int(kpis.get("totalEconomyMin", 0))
-    stats["kpis"]["pythonLogs"] = int(kpis.get("pythonLogs", 0))
-    stats["kpis"]["bridgeLogs"] = int(kpis.get("bridgeLogs", 0))
-
-    for status, count in payload.get("statusDistribution", {}).items():
-        stats["statusDistribution"][status] += int(count)
-
-    for endpoint, data in payload.get("endpoints", {}).items():
-        endpoint_stats = stats["endpoints"][endpoint]
-        endpoint_stats["frequency"] += int(data.get("frequency", 0))
-        endpoint_stats["economyMin"] += int(data.get("economyMin", 0))
-        endpoint_stats["timePerCallMin"] = max(
-            endpoint_stats["timePerCallMin"],
-            int(data.get("timePerCallMin", 0)),
-        )
-        for user, count in data.get("users", {}).items():
-            endpoint_stats["users"][user] += int(count)
-
-    for user, data in payload.get("users", {}).items():
-        user_stats = stats["users"][user]
-        user_stats["totalRequests"] += int(data.get("totalRequests", 0))
-        user_stats["productiveActions"] += int(data.get("productiveActions", 0))
-        user_stats["economyMin"] += int(data.get("economyMin", 0))
-        for endpoint, count in data.get("endpoints", {}).items():
-            user_stats["endpoints"][endpoint] += int(count)
-
-    for day, count in payload.get("dailyActivity", {}).items():
-        stats["dailyActivity"][day] += int(count)
-
-    relatorio_payload = payload.get("relatorio", {})
-    stats["relatorio"]["totalEvents"] = int(relatorio_payload.get("totalEvents", 0))
-    stats["relatorio"]["distinctUsers"].update(relatorio_payload.get("distinctUsers", []))
-    stats["relatorio"]["maxSyncVersion"] = int(relatorio_payload.get("maxSyncVersion", 0))
-
-    for action, count in relatorio_payload.get("actions", {}).items():
-        stats["relatorio"]["actions"][action] += int(count)
-    for route, count in relatorio_payload.get("routes", {}).items():
-        stats["relatorio"]["routes"][route] += int(count)
-    for result, count in relatorio_payload.get("results", {}).items():
-        stats["relatorio"]["results"][result] += int(count)
-    for day, count in relatorio_payload.get("dailyActivity", {}).items():
-        stats["relatorio"]["dailyActivity"][day] += int(count)
+
+def deserialize_relatorio_stats(relatorio_stats, relatorio_payload):
+    relatorio_stats["totalEvents"] = int(relatorio_payload.get("totalEvents", 0))
+    relatorio_stats["distinctUsers"].update(intern_name(user) for user in relatorio_payload.get("distinctUsers", []))
+    relatorio_stats["maxSyncVersion"] = int(relatorio_payload.get("maxSyncVersion", 0))
+
+    interned_counts(relatorio_stats["actions"], relatorio_payload.get("actions", {}))
+    interned_counts(relatorio_stats["routes"], relatorio_payload.get("routes", {}))
+    interned_counts(relatorio_stats["results"], relatorio_payload.get("results", {}))
+    interned_counts(relatorio_stats["dailyActivity"], relatorio_payload.get("dailyActivity", {}))
 
     for user, data in relatorio_payload.get("users", {}).items():
-        user_stats = stats["relatorio"]["users"][user]
-        user_stats["events"] += int(data.get("events", 0))
-        for action, count in data.get("actions", {}).items():
-            user_stats["actions"][action] += int(count)
-        for result, count in data.get("results", {}).items():
-            user_stats["results"][result] += int(count)
-        user_stats["maxTickets"] = max(user_stats["maxTickets"], int(data.get("maxTickets", 0)))
-        user_stats["lastSyncVersion"] = max(
-            user_stats["lastSyncVersion"],
+        user_record = relatorio_stats["users"][intern_name(user)]
+        user_record[RELATORIO_USER_EVENTS] += int(data.get("events", 0))
+        interned_counts(user_record[RELATORIO_USER_ACTIONS], data.get("actions", {}))
+        interned_counts(user_record[RELATORIO_USER_RESULTS], data.get("results", {}))
+        user_record[RELATORIO_USER_MAX_TICKETS] = max(user_record[RELATORIO_USER_MAX_TICKETS], int(data.get("maxTickets", 0)))
+        user_record[RELATORIO_USER_LAST_SYNC_VERSION] = max(
+            user_record[RELATORIO_USER_LAST_SYNC_VERSION],
             int(data.get("lastSyncVersion", 0)),
         )
         incoming_last_event = data.get("lastEventTs", "") or ""
-        if incoming_last_event and incoming_last_event >= user_stats["lastEventTs"]:
-            user_stats["lastEventTs"] = incoming_last_event
-            user_stats["lastTickets"] = int(data.get("lastTickets", 0))
-
-    return stats
+        if incoming_last_event and incoming_last_event >= user_record[RELATORIO_USER_LAST_EVENT_TS]:
+            user_record[RELATORIO_USER_LAST_EVENT_TS] = incoming_last_event
+            user_record[RELATORIO_USER_LAST_TICKETS] = int(data.get("lastTickets", 0))
 
 
 def merge_stats(target, source):
-    target["kpis"]["totalRequests"] += source["kpis"]["totalRequests"]
-    target["kpis"]["distinctUsers"].update(source["kpis"]["distinctUsers"])
-    target["kpis"]["productiveActions"] += source["kpis"]["productiveActions"]
-    target["kpis"]["navigationActions"] += source["kpis"]["navigationActions"]
-    target["kpis"]["totalEconomyMin"] += source["kpis"]["totalEconomyMin"]
-    target["kpis"]["pythonLogs"] += source["kpis"].get("pythonLogs", 0)
-    target["kpis"]["bridgeLogs"] += source["kpis"].get("bridgeLogs", 0)
-
-    target["statusDistribution"].update(source["statusDistribution"])
-    target["dailyActivity"].update(source["dailyActivity"])
-
-    for endpoint, data in source["endpoints"].items():
-        endpoint_stats = target["endpoints"][endpoint]
-        endpoint_stats["frequency"] += data["frequency"]
-        endpoint_stats["economyMin"] += data["economyMin"]
-        endpoint_stats["timePerCallMin"] = max(endpoint_stats["timePerCallMin"], data["timePerCallMin"])
-        for user, count in data["users"].items():
-            endpoint_stats["users"][user] += count
-
-    for user, data in source["users"].items():
-        user_stats = target["users"][user]
-        user_stats["totalRequests"] += data["totalRequests"]
-        user_stats["productiveActions"] += data["productiveActions"]
-        user_stats["economyMin"] += data["economyMin"]
-        for endpoint, count in data["endpoints"].items():
-            user_stats["endpoints"][endpoint] += count
-
-    target["relatorio"]["totalEvents"] += source["relatorio"]["totalEvents"]
-    target["relatorio"]["distinctUsers"].update(source["relatorio"]["distinctUsers"])
-    target["relatorio"]["actions"].update(source["relatorio"]["actions"])
-    target["relatorio"]["routes"].update(source["relatorio"]["routes"])
-    target["relatorio"]["results"].update(source["relatorio"]["results"])
-    target["relatorio"]["dailyActivity"].update(source["relatorio"]["dailyActivity"])
-    target["relatorio"]["maxSyncVersion"] = max(
-        target["relatorio"]["maxSyncVersion"],
-        source["relatorio"]["maxSyncVersion"],
+    # KPIs sao um vetor de tamanho fixo: o merge e uma soma elemento a elemento.
+    target["kpis"] = list(map(operator.add, target["kpis"], source["kpis"]))
+    target["lineKinds"] = list(map(operator.add, target["lineKinds"], source["lineKinds"]))
+    target["distinctUsers"].update(source["distinctUsers"])
+
+    add_counts(target["statusDistribution"], source["statusDistribution"])
+    add_counts(target["dailyActivity"], source["dailyActivity"])
+    target_hourly = target["hourly"]
+    source_hourly = source["hourly"]
+    for hourly_key, hours in source_hourly["cube"].items():
+        target_hourly["cube"][hourly_key] = list(map(operator.add, target_hourly["cube"][hourly_key], hours))
+    target_hourly["week"] = list(map(operator.add, target_hourly["week"], source_hourly["week"]))
+    target_hourly["weekServerErrors"] = list(
+        map(operator.add, target_hourly["weekServerErrors"], source_hourly["weekServerErrors"])
     )
 
-    for user, data in source["relatorio"]["users"].items():
-        user_stats = target["relatorio"]["users"][user]
-        user_stats["events"] += data["events"]
-        user_stats["actions"].update(data["actions"])
-        user_stats["results"].update(data["results"])
-        user_stats["maxTickets"] = max(user_stats["maxTickets"], data["maxTickets"])
-        user_stats["lastSyncVersion"] = max(user_stats["lastSyncVersion"], data["lastSyncVersion"])
-        incoming_last_event = data.get("lastEventTs", "") or ""
-        if incoming_last_event and incoming_last_event >= user_stats["lastEventTs"]:
-            user_stats["lastEventTs"] = incoming_last_event
-            user_stats["lastTickets"] = data["lastTickets"]
+    for endpoint_id, record in source["endpoints"].items():
+        endpoint_record = target["endpoints"][endpoint_id]
+        endpoint_record[ENDPOINT_FREQUENCY] += record[ENDPOINT_FREQUENCY]
+        endpoint_record[ENDPOINT_ECONOMY_MIN] += record[ENDPOINT_ECONOMY_MIN]
+        endpoint_record[ENDPOINT_TIME_PER_CALL_MIN] = max(
+            endpoint_record[ENDPOINT_TIME_PER_CALL_MIN],
+            record[ENDPOINT_TIME_PER_CALL_MIN],
+        )
+        add_counts(endpoint_record[ENDPOINT_USERS], record[ENDPOINT_USERS])
+
+    for user_id, record in source["users"].items():
+        user_record = target["users"][user_id]
+        user_record[USER_TOTAL_REQUESTS] += record[USER_TOTAL_REQUESTS]
+        user_record[USER_PRODUCTIVE_ACTIONS] += record[USER_PRODUCTIVE_ACTIONS]
+        user_record[USER_ECONOMY_MIN] += record[USER_ECONOMY_MIN]
+        add_counts(user_record[USER_ENDPOINTS], record[USER_ENDPOINTS])
+
+    target_relatorio = target["relatorio"]
+    source_relatorio = source["relatorio"]
+    target_relatorio["totalEvents"] += source_relatorio["totalEvents"]
+    target_relatorio["distinctUsers"].update(source_relatorio["distinctUsers"])
+    add_counts(target_relatorio["actions"], source_relatorio["actions"])
+    add_counts(target_relatorio["routes"], source_relatorio["routes"])
+    add_counts(target_relatorio["results"], source_relatorio["results"])
+    add_counts(target_relatorio["dailyActivity"], source_relatorio["dailyActivity"])
+    target_relatorio["maxSyncVersion"] = max(target_relatorio["maxSyncVersion"], source_relatorio["maxSyncVersion"])
+
+    for user_id, record in source_relatorio["users"].items():
+        user_record = target_relatorio["users"][user_id]
+        user_record[RELATORIO_USER_EVENTS] += record[RELATORIO_USER_EVENTS]
+        add_counts(user_record[RELATORIO_USER_ACTIONS], record[RELATORIO_USER_ACTIONS])
+        add_counts(user_record[RELATORIO_USER_RESULTS], record[RELATORIO_USER_RESULTS])
+        user_record[RELATORIO_USER_MAX_TICKETS] = max(user_record[RELATORIO_USER_MAX_TICKETS], record[RELATORIO_USER_MAX_TICKETS])
+        user_record[RELATORIO_USER_LAST_SYNC_VERSION] = max(
+            user_record[RELATORIO_USER_LAST_SYNC_VERSION],
+            record[RELATORIO_USER_LAST_SYNC_VERSION],
+        )
+        incoming_last_event = record[RELATORIO_USER_LAST_EVENT_TS]
+        if incoming_last_event and incoming_last_event >= user_record[RELATORIO_USER_LAST_EVENT_TS]:
+            user_record[RELATORIO_USER_LAST_EVENT_TS] = incoming_last_event
+            user_record[RELATORIO_USER_LAST_TICKETS] = record[RELATORIO_USER_LAST_TICKETS]
+
+
+def report_kpi_sections(stats):
+    kpis = stats["kpis"]
+    economy_total_min = kpis[KPI_ECONOMY_MIN]
+    line_kinds = stats["lineKinds"]
+    total_lines = sum(line_kinds)
+    rejected_lines = line_kinds[LINE_KIND_UNPARSED] + line_kinds[LINE_KIND_BAD_TIMESTAMP]
+    return {
+        "kpis": {
+            "totalRequests": kpis[KPI_TOTAL_REQUESTS],
+            "distinctUsers": len(stats["distinctUsers"]),
+            "productiveActions": kpis[KPI_PRODUCTIVE_ACTIONS],
+            "navigationActions": kpis[KPI_NAVIGATION_ACTIONS],
+            "totalEconomyMin": economy_total_min,
+            "totalEconomyHours": round(economy_total_min / 60, 2),
+        },
+        "summary": {
+            "totalRequests": kpis[KPI_TOTAL_REQUESTS],
+            "totalUsers": len(stats["distinctUsers"]),
+            "productiveActions": kpis[KPI_PRODUCTIVE_ACTIONS],
+            "navigationActions": kpis[KPI_NAVIGATION_ACTIONS],
+            "totalEconomyHours": round(economy_total_min / 60, 2),
+            "totalEconomyMin": economy_total_min,
+            "pythonLogs": kpis[KPI_PYTHON_LOGS],
+            "bridgeLogs": kpis[KPI_BRIDGE_LOGS],
+        },
+        "lineKinds": {
+            **dict(zip(LINE_KIND_FIELDS, line_kinds)),
+            "total": total_lines,
+            "rejected": rejected_lines,
+            "rejectedShare": round(rejected_lines / total_lines * 100, 2) if total_lines else 0,
+        },
+    }
+
+
+def report_status_sections(stats):
+    return {"statusDistribution": named_counts(stats["statusDistribution"])}
+
+
+def report_endpoint_sections(stats):
+    names = INTERNED_NAMES
+    endpoint_economy = []
+    for endpoint_id, record in stats["endpoints"].items():
+        if record[ENDPOINT_FREQUENCY] <= 0:
+            continue
 
+        endpoint_users = sorted(
+            named_counts(record[ENDPOINT_USERS]).items(),
+            key=lambda item: (-item[1], item[0]),
+        )
+        endpoint_economy.append(
+            {
+                "endpoint": names[endpoint_id],
+                "frequency": record[ENDPOINT_FREQUENCY],
+                "economyMin": record[ENDPOINT_ECONOMY_MIN],
+                "economyHours": round(record[ENDPOINT_ECONOMY_MIN] / 60, 2),
+                "timePerCallMin": record[ENDPOINT_TIME_PER_CALL_MIN],
+                "distinctUsers": len(record[ENDPOINT_USERS]),
+                "users": [
+                    {"user": user, "requests": count}
+                    for user, count in endpoint_users[:5]
+                ],
+            }
+        )
+
+    endpoint_economy = sorted(endpoint_economy, key=lambda item: -item["economyHours"])
+    return {"endpointEconomy": endpoint_economy, "productiveEndpoints": endpoint_economy}
 
-def build_report(stats, start_dt, end_dt, log_path, max_range_days, cache_meta):
-    economy_total_min = stats["kpis"]["totalEconomyMin"]
 
+def report_user_sections(stats):
+    names = INTERNED_NAMES
     user_activity = []
     user_productivity = []
 
-    for user, info in stats["users"].items():
-        if info["productiveActions"] <= 0:
+    for user_id, record in stats["users"].items():
+        if record[USER_PRODUCTIVE_ACTIONS] <= 0:
             continue
 
-        top_endpoints = sorted(info["endpoints"].items(), key=lambda item: -item[1])[:5]
+        user = names[user_id]
+        top_endpoints = sorted(record[USER_ENDPOINTS].items(), key=lambda item: -item[1])[:5]
         user_activity.append(
             {
                 "user": user,
-                "totalRequests": info["totalRequests"],
-                "economyHours": round(info["economyMin"] / 60, 2),
-                "topEndpoints": [{"endpoint": endpoint, "requests": count} for endpoint, count in top_endpoints],
+                "totalRequests": record[USER_TOTAL_REQUESTS],
+                "economyHours": round(record[USER_ECONOMY_MIN] / 60, 2),
+                "topEndpoints": [{"endpoint": names[endpoint_id], "requests": count} for endpoint_id, count in top_endpoints],
             }
         )
         user_productivity.append(
             {
                 "user": user,
-                "productiveActions": info["productiveActions"],
-                "economyMin": info["economyMin"],
-                "economyHours": round(info["economyMin"] / 60, 2),
+                "productiveActions": record[USER_PRODUCTIVE_ACTIONS],
+                "economyMin": record[USER_ECONOMY_MIN],
+                "economyHours": round(record[USER_ECONOMY_MIN] / 60, 2),
             }
         )
 
-    endpoint_economy = []
-    for endpoint, endpoint_stats in stats["endpoints"].items():
-        if endpoint_stats["frequency"] <= 0:
-            continue
+    return {
+        "userActivityEndpoints": sorted(user_activity, key=lambda item: -item["totalRequests"])[:5],
+        "userProductivity": sorted(user_productivity, key=lambda item: -item["productiveActions"])[:10],
+    }
 
-        endpoint_users = sorted(
-            endpoint_stats["users"].items(),
-            key=lambda item: (-item[1], item[0]),
-        )
-        endpoint_economy.append(
-            {
-                "endpoint": endpoint,
-                "frequency": endpoint_stats["frequency"],
-                "economyMin": endpoint_stats["economyMin"],
-                "economyHours": round(endpoint_stats["economyMin"] / 60, 2),
-                "timePerCallMin": endpoint_stats["timePerCallMin"],
-                "distinctUsers": len(endpoint_stats["users"]),
-                "users": [
-                    {"user": user, "requests": count}
-                    for user, count in endpoint_users[:5]
-                ],
-            }
-        )
 
-    endpoint_economy = sorted(endpoint_economy, key=lambda item: -item["economyHours"])
+def report_daily_sections(stats):
+    daily_activity = named_counts(stats["dailyActivity"])
+    return {
+        "dailyActivity": [
+            {"date": day, "requests": daily_activity[day]}
+            for day in sorted(daily_activity)
+        ],
+    }
+
+
+def report_hourly_sections(stats):
+    """Heatmap 7x24 (dia da semana x hora) somado no intervalo, com o perfil por hora
+    de cada status e dos endpoints mais acessados."""
+    names = INTERNED_NAMES
+    hourly = stats["hourly"]
+    status_hours = defaultdict(new_hourly_record)
+    endpoint_hours = defaultdict(new_hourly_record)
+    for (endpoint_id, status_id), hours in hourly["cube"].items():
+        status = names[status_id]
+        endpoint = names[endpoint_id]
+        status_hours[status] = list(map(operator.add, status_hours[status], hours))
+        endpoint_hours[endpoint] = list(map(operator.add, endpoint_hours[endpoint], hours))
+
+    week = hourly["week"]
+    peak_hour = max(range(HOURS_PER_WEEK), key=week.__getitem__)
+    peak = None
+    if week[peak_hour]:
+        peak_weekday, hour = divmod(peak_hour, HOURS_PER_DAY)
+        peak = {"weekday": WEEKDAY_LABELS[peak_weekday], "hour": hour, "requests": week[peak_hour]}
+
+    top_endpoints = sorted(endpoint_hours.items(), key=lambda item: (-sum(item[1]), item[0]))[:HEATMAP_TOP_ENDPOINTS]
+    return {
+        "hourlyHeatmap": {
+            "weekdays": list(WEEKDAY_LABELS),
+            "requests": [week[start:start + HOURS_PER_DAY] for start in range(0, HOURS_PER_WEEK, HOURS_PER_DAY)],
+            "serverErrors": [
+                hourly["weekServerErrors"][start:start + HOURS_PER_DAY] for start in range(0, HOURS_PER_WEEK, HOURS_PER_DAY)
+            ],
+            "peak": peak,
+            "statusByHour": {status: status_hours[status] for status in sorted(status_hours)},
+            "endpoints": [
+                {"endpoint": endpoint, "requests": sum(hours), "hours": hours}
+                for endpoint, hours in top_endpoints
+            ],
+        },
+    }
 
+
+def report_relatorio_sections(stats):
+    names = INTERNED_NAMES
+    relatorio_stats = stats["relatorio"]
+    create_id = INTERNED_IDS.get("create")
+    update_id = INTERNED_IDS.get("update")
+    delete_id = INTERNED_IDS.get("delete")
     relatorio_users = []
-    for user, info in stats["relatorio"]["users"].items():
+    for user_id, record in relatorio_stats["users"].items():
+        actions = record[RELATORIO_USER_ACTIONS]
         relatorio_users.append(
             {
-                "user": user,
-                "events": info["events"],
-                "creates": info["actions"].get("create", 0),
-                "updates": info["actions"].get("update", 0),
-                "deletes": info["actions"].get("delete", 0),
-                "results": dict(info["results"]),
-                "lastTickets": info["lastTickets"],
-                "maxTickets": info["maxTickets"],
-                "lastSyncVersion": info["lastSyncVersion"],
-                "lastEventTs": info.get("lastEventTs", ""),
+                "user": names[user_id],
+                "events": record[RELATORIO_USER_EVENTS],
+                "creates": actions.get(create_id, 0),
+                "updates": actions.get(update_id, 0),
+                "deletes": actions.get(delete_id, 0),
+                "results": named_counts(record[RELATORIO_USER_RESULTS]),
+                "lastTickets": record[RELATORIO_USER_LAST_TICKETS],
+                "maxTickets": record[RELATORIO_USER_MAX_TICKETS],
+                "lastSyncVersion": record[RELATORIO_USER_LAST_SYNC_VERSION],
+                "lastEventTs": record[RELATORIO_USER_LAST_EVENT_TS],
             }
         )
 
     relatorio_actions = [
         {"action": action, "count": count}
-        for action, count in sorted(stats["relatorio"]["actions"].items(), key=lambda item: -item[1])
+        for action, count in sorted(named_counts(relatorio_stats["actions"]).items(), key=lambda item: -item[1])
     ]
 
     relatorio_routes = [
         {"route": route, "count": count}
-        for route, count in sorted(stats["relatorio"]["routes"].items(), key=lambda item: -item[1])
+        for route, count in sorted(named_counts(relatorio_stats["routes"]).items(), key=lambda item: -item[1])
     ]
 
+    relatorio_daily_activity = named_counts(relatorio_stats["dailyActivity"])
+    return {
+        "relatorioSummary": {
+            "totalEvents": relatorio_stats["totalEvents"],
+            "distinctUsers": len(relatorio_stats["distinctUsers"]),
+            "results": named_counts(relatorio_stats["results"]),
+            "actions": named_counts(relatorio_stats["actions"]),
+            "routes": named_counts(relatorio_stats["routes"]),
+            "maxSyncVersion": relatorio_stats["maxSyncVersion"],
+        },
+        "relatorioUsers": sorted(relatorio_users, key=lambda item: -item["events"])[:10],
+        "relatorioActions": relatorio_actions,
+        "relatorioRoutes": relatorio_routes,
+        "relatorioDailyActivity": [
+            {"date": day, "events": relatorio_daily_activity[day]}
+            for day in sorted(relatorio_daily_activity)
+        ],
+    }
+
+
+REPORT_SECTION_BUILDERS = {
+    "kpis": report_kpi_sections,
+    "statusDistribution": report_status_sections,
+    "endpoints": report_endpoint_sections,
+    "users": report_user_sections,
+    "dailyActivity": report_daily_sections,
+    "hourly": report_hourly_sections,
+    "relatorio": report_relatorio_sections,
+}
+
+
+def parse_report_sections(raw_sections):
+    """Lista de secoes do relatorio (lista ou texto separado por virgula); None = todas."""
+    if raw_sections is None:
+        return None
+    if isinstance(raw_sections, str):
+        raw_sections = raw_sections.split(",")
+    if not isinstance(raw_sections, list):
+        raise ValueError("Parametro 'sections' invalido: esperada uma lista de secoes.")
+
+    sections = [str(section).strip() for section in raw_sections if str(section).strip()]
+    unknown = [section for section in sections if section not in REPORT_SECTIONS]
+    if unknown:
+        raise ValueError(
+            "Secao de relatorio desconhecida: {}. Use: {}.".format(", ".join(unknown), ", ".join(REPORT_SECTIONS))
+        )
+    if not sections:
+        raise ValueError("Informe pelo menos uma secao em 'sections'.")
+    return sections
+
+
+def stats_sections_for(report_sections):
+    """Secoes dos stats que precisam ser decodificadas para gerar as secoes pedidas."""
+    if report_sections is None:
+        return None
+    return frozenset(REPORT_SECTIONS[section] for section in report_sections)
+
+
+def build_report(stats, start_dt, end_dt, log_path, max_range_days, cache_meta, sections=None):
+    """Monta o relatorio; com sections, so as secoes pedidas sao calculadas (meta sempre vem)."""
+    report_started = time.perf_counter()
     total_days = (end_dt.date() - start_dt.date()).days + 1
 
-    return {
+    report = {
         "meta": {
             "from": start_dt.date().isoformat(),
             "to": end_dt.date().isoformat(),
             "days": total_days,
             "maxIntervalDays": max_range_days,
             "generatedAt": datetime.now().isoformat(timespec="seconds"),
-            "sourceLog": str(log_path),
+            "sourceLog": cache_meta.get("sourceLog", str(log_path)),
             "aggregationMode": "daily-cache-sum",
             "cacheHits": cache_meta["hits"],
             "cacheMisses": cache_meta["misses"],
             "cacheDir": cache_meta["cacheDir"],
+            "scanSeconds": cache_meta.get("scanSeconds", 0),
+            "tailBytes": cache_meta.get("tailBytes", 0),
+            "rollupHits": cache_meta.get("rollupHits", 0),
         },
-        "kpis": {
-            "totalRequests": stats["kpis"]["totalRequests"],
-            "distinctUsers": len(stats["kpis"]["distinctUsers"]),
-            "productiveActions": stats["kpis"]["productiveActions"],
-            "navigationActions": stats["kpis"]["navigationActions"],
-            "totalEconomyMin": economy_total_min,
-            "totalEconomyHours": round(economy_total_min / 60, 2),
-        },
-        "summary": {
-            "totalRequests": stats["kpis"]["totalRequests"],
-            "totalUsers": len(stats["kpis"]["distinctUsers"]),
-            "productiveActions": stats["kpis"]["productiveActions"],
-            "navigationActions": stats["kpis"]["navigationActions"],
-            "totalEconomyHours": round(economy_total_min / 60, 2),
-            "totalEconomyMin": economy_total_min,
-            "pythonLogs": stats["kpis"].get("pythonLogs", 0),
-            "bridgeLogs": stats["kpis"].get("bridgeLogs", 0),
-        },
-        "statusDistribution": dict(stats["statusDistribution"]),
-        "endpointEconomy": endpoint_economy,
-        "userActivityEndpoints": sorted(user_activity, key=lambda item: -item["totalRequests"])[:5],
-        "userProductivity": sorted(user_productivity, key=lambda item: -item["productiveActions"])[:10],
-        "productiveEndpoints": endpoint_economy,
-        "dailyActivity": [
-            {"date": day, "requests": stats["dailyActivity"][day]}
-            for day in sorted(stats["dailyActivity"])
-        ],
-        "relatorioSummary": {
-            "totalEvents": stats["relatorio"]["totalEvents"],
-            "distinctUsers": len(stats["relatorio"]["distinctUsers"]),
-            "results": dict(stats["relatorio"]["results"]),
-            "actions": dict(stats["relatorio"]["actions"]),
-            "routes": dict(stats["relatorio"]["routes"]),
-            "maxSyncVersion": stats["relatorio"]["maxSyncVersion"],
-        },
-        "relatorioUsers": sorted(relatorio_users, key=lambda item: -item["events"])[:10],
-        "relatorioActions": relatorio_actions,
-        "relatorioRoutes": relatorio_routes,
-        "relatorioDailyActivity": [
-            {"date": day, "events": stats["relatorio"]["dailyActivity"][day]}
-            for day in sorted(stats["relatorio"]["dailyActivity"])
-        ],
     }
 
+    built_sections = {}
+    for stats_section in stats_sections_for(sections) or STATS_SECTIONS:
+        built_sections.update(REPORT_SECTION_BUILDERS[stats_section](stats))
+    for section in REPORT_SECTIONS:
+        if section in built_sections and (sections is None or section in sections):
+            report[section] = built_sections[section]
+    if sections is not None:
+        report["meta"]["sections"] = [section for section in REPORT_SECTIONS if section in sections]
+
+    if "profile" in cache_meta:
+        profile = cache_meta["profile"]
+        report_seconds = round(time.perf_counter() - report_started, 4)
+        report["meta"]["profile"] = {**profile, "phases": {**profile["phases"], "report": report_seconds}}
+    return report
+
+
+def iter_log_lines(handle, start_offset=0):
+    handle.seek(start_offset)
+    offset = start_offset
+
+    for raw_line in handle:
+        line_start = offset
+        offset += len(raw_line)
+        text = raw_line.decode("utf-8", errors="replace")
+
+        # Mesmo comportamento do modo texto (universal newlines): '\r' isolado tambem quebra linha.
+        if "\r" in text:
+            for part in text.split("\r"):
+                yield line_start, offset, part
+            continue
 
-def collect_daily_stats(log_path: Path, start_dt: datetime, end_dt: datetime):
-    daily_stats = {}
-    last_http_ts = None
-    pending_relatorio_events = []
-
-    with log_path.open("r", encoding="utf-8", errors="replace") as handle:
-        for raw_line in handle:
-            line = raw_line.strip()
-            if not line:
-                continue
+        yield line_start, offset, text
 
-            relatorio_event = parse_relatorio_line(line)
-            if relatorio_event is not None:
-                pending_relatorio_events.append(
-                    {
-                        "event": relatorio_event,
-                        "fallbackTs": last_http_ts,
-                    }
-                )
-                continue
 
-            parsed_http = parse_http_line(line)
-            if parsed_http is None:
-                continue
+def is_day_in_scope(ts, start_dt, end_dt, wanted_days):
+    if not (start_dt <= ts <= end_dt):
+        return False
+    return wanted_days is None or to_date_key(ts) in wanted_days
 
-            last_http_ts = parsed_http["ts"]
-
-            if pending_relatorio_events:
-                remaining_relatorio_events = []
-                matched_current_http = False
-
-                for pending in pending_relatorio_events:
-                    event = pending["event"]
-                    if not matched_current_http and matches_relatorio_http_event(event, parsed_http):
-                        if start_dt <= parsed_http["ts"] <= end_dt:
-                            process_relatorio_event(
-                                get_day_stats(daily_stats, parsed_http["ts"]),
-                                event,
-                                parsed_http["ts"],
-                            )
-                        matched_current_http = True
-                        continue
 
-                    fallback_ts = pending["fallbackTs"]
-                    if fallback_ts is not None and fallback_ts < start_dt:
-                        continue
+def relatorio_event_family(relatorio_event):
+    if relatorio_event["routePath"] == "/tickets":
+        return RELATORIO_FAMILY_TICKETS
+    if relatorio_event["routePath"] == "/tickets/:id":
+        return RELATORIO_FAMILY_TICKET_ID
+    return RELATORIO_FAMILY_ANY
 
-                    remaining_relatorio_events.append(pending)
 
-                pending_relatorio_events = remaining_relatorio_events
+def http_relatorio_families(parsed_http):
+    """Familias de evento que um HTTP pode parear (mesmas regras de matches_relatorio_http_event)."""
+    normalized_http_path = normalize_path(parsed_http["path"])
+    if not normalized_http_path.startswith("/api/relatorio"):
+        return ()
+    if normalized_http_path == "/api/relatorio/tickets":
+        return (RELATORIO_FAMILY_TICKETS, RELATORIO_FAMILY_ANY)
+    if normalized_http_path.startswith("/api/relatorio/tickets/"):
+        return (RELATORIO_FAMILY_TICKET_ID, RELATORIO_FAMILY_ANY)
+    return (RELATORIO_FAMILY_ANY,)
 
-            if not (start_dt <= parsed_http["ts"] <= end_dt):
-                continue
 
-            if is_relatorio_http_request(parsed_http):
-                continue
+def new_pending_queue(pending_events=()):
+    """Eventos de relatorio pendentes em filas por (metodo, familia da rota) e usuario.
 
-            update_http_stats(get_day_stats(daily_stats, parsed_http["ts"]), parsed_http)
+    Cada entrada e [seq, pending, vivo]; seq preserva a ordem de chegada, entao o par
+    escolhido e o mesmo da varredura linear. Entradas removidas saem das filas sob demanda.
+    """
+    # keepFrom: inicio do primeiro lote quando a varredura continua outra (scan_carry).
+    queue = {"buckets": {}, "recent": [], "size": 0, "dead": 0, "nextSeq": 0, "keepFrom": None}
+    for pending in pending_events:
+        push_pending_relatorio(queue, pending)
+    return queue
 
-    for pending in pending_relatorio_events:
-        fallback_ts = pending["fallbackTs"]
-        if fallback_ts is None:
-            continue
-        if start_dt <= fallback_ts <= end_dt:
-            process_relatorio_event(
-                get_day_stats(daily_stats, fallback_ts),
-                pending["event"],
-                fallback_ts,
-            )
 
-    return daily_stats
+def push_pending_relatorio(queue, pending):
+    relatorio_event = pending["event"]
+    entry = [queue["nextSeq"], pending, True]
+    queue["nextSeq"] += 1
 
+    bucket_key = (relatorio_event["routeMethod"], relatorio_event_family(relatorio_event))
+    users = queue["buckets"].setdefault(bucket_key, {})
+    users.setdefault(relatorio_event["user"], deque()).append(entry)
+    queue["recent"].append(entry)
+    queue["size"] += 1
 
-def iter_days(start_day: date, end_day: date):
-    current_day = start_day
-    while current_day <= end_day:
-        yield current_day
-        current_day += timedelta(days=1)
 
+def drop_pending_entry(queue, entry):
+    entry[2] = False
+    queue["size"] -= 1
+    queue["dead"] += 1
 
-def group_consecutive_days(days):
-    if not days:
-        return []
 
-    ordered_days = sorted(days)
-    groups = []
-    group_start = ordered_days[0]
-    previous_day = ordered_days[0]
+def take_matching_pending(queue, parsed_http):
+    http_user = (parsed_http["user"] or "").strip().lower()
+    best_entries = None
 
-    for current_day in ordered_days[1:]:
-        if current_day == previous_day + timedelta(days=1):
-            previous_day = current_day
+    for family in http_relatorio_families(parsed_http):
+        users = queue["buckets"].get((parsed_http["method"], family))
+        if not users:
             continue
 
-        groups.append((group_start, previous_day))
-        group_start = current_day
-        previous_day = current_day
+        # Evento sem usuario pareia com qualquer HTTP, e HTTP sem usuario com qualquer evento.
+        candidates = (users.get(http_user), users.get("")) if http_user else users.values()
+        for entries in candidates:
+            while entries and not entries[0][2]:
+                entries.popleft()
+                queue["dead"] -= 1
+            if entries and (best_entries is None or entries[0][0] < best_entries[0][0]):
+                best_entries = entries
 
-    groups.append((group_start, previous_day))
-    return groups
+    if best_entries is None:
+        return None
 
+    entry = best_entries.popleft()
+    entry[2] = False
+    queue["size"] -= 1
+    return entry[1]
 
-def cache_file_for_day(cache_dir: Path, day: date):
-    return cache_dir / f"{day.isoformat()}.json"
+
+def compact_pending_queue(queue):
+    for users in queue["buckets"].values():
+        for user, entries in users.items():
+            users[user] = deque(entry for entry in entries if entry[2])
+    queue["dead"] = 0
 
 
-def should_refresh_cache(cache_path: Path, day: date, today: date, log_mtime_ns: int):
-    if not cache_path.exists():
-        return True
+def pending_relatorio_list(queue):
+    entries = [
+        entry
+        for users in queue["buckets"].values()
+        for user_entries in users.values()
+        for entry in user_entries
+        if entry[2]
+    ]
+    return [entry[1] for entry in sorted(entries, key=lambda entry: entry[0])]
+
+
+def pair_pending_relatorio(queue, daily_stats, scope, parsed_http, http_ts: datetime, in_scope):
+    """Confronta os eventos pendentes com uma linha HTTP (parsed_http None = HTTP que nao pareia)."""
+    if parsed_http is not None:
+        pending = take_matching_pending(queue, parsed_http)
+        if pending is not None and in_scope:
+            process_relatorio_event(get_day_stats(daily_stats, http_ts), pending["event"], http_ts)
+
+    # Evento com fallback fora do escopo so vale para o HTTP seguinte. Quem passa por
+    # um HTTP continua passando (o escopo nao muda), entao so os recentes sao checados.
+    # Fallback de um lote anterior da mesma varredura (keepFrom) continua valendo.
+    start_dt, _, wanted_days = scope
+    keep_from = queue["keepFrom"]
+    for entry in queue["recent"]:
+        fallback_ts = entry[1]["fallbackTs"]
+        if not entry[2] or fallback_ts is None or (keep_from is not None and keep_from <= fallback_ts):
+            continue
+        if not is_day_in_scope(fallback_ts, start_dt, datetime.max, wanted_days):
+            drop_pending_entry(queue, entry)
+    queue["recent"] = []
+
+    if queue["dead"] > PENDING_COMPACT_THRESHOLD and queue["dead"] > queue["size"]:
+        compact_pending_queue(queue)
+
+
+def scan_log_window(handle, scan_state, daily_stats, scope, start_offset, stop_offset, drain=False):
+    start_dt, end_dt, wanted_days = scope
+    pending_queue = scan_state["pending"]
+    # Linhas sem timestamp proprio contam no dia do proximo HTTP valido.
+    line_kinds = scan_state["lineKinds"]
+    rejected_sample = REJECTED_SAMPLE["lines"]
+    scanned_to = start_offset
+    lines_read = http_rejected = relatorio_rejected = 0
+    # Eventos logo apos a janela, ate o proximo HTTP, ainda tem fallback no intervalo.
+    push_events = not drain or (
+        scan_state["lastHttpTs"] is not None and is_day_in_scope(scan_state["lastHttpTs"], start_dt, end_dt, wanted_days)
+    )
 
     try:
-        payload = json.loads(cache_path.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
-        return True
+        for line_start, line_end, raw_line in iter_log_lines(handle, start_offset):
+            if stop_offset is not None and line_start >= stop_offset:
+                return line_start
+            # Fora das janelas a leitura so continua enquanto houver eventos pendentes.
+            if drain and not push_events and not pending_queue["size"]:
+                return line_start
+
+            scanned_to = line_end
+            line = raw_line.strip()
+            if not line:
+                continue
 
-    if int(payload.get("schemaVersion", 0)) != CACHE_SCHEMA_VERSION:
-        return True
+            lines_read += 1
+            line_kind = classify_log_line(line)
+            if line_kind == LINE_RELATORIO:
+                relatorio_event = parse_relatorio_line(line)
+                if relatorio_event is None:
+                    relatorio_rejected += 1
+                    line_kinds[LINE_KIND_UNPARSED] += 1
+                    sample_rejected_line(rejected_sample, LINE_KIND_UNPARSED, line)
+                    continue
+                line_kinds[LINE_KIND_RELATORIO] += 1
+                # Fora das janelas, eventos com fallback fora do intervalo nao podem cair nele
+                # nem disputar o pareamento com os pendentes anteriores.
+                if push_events:
+                    push_pending_relatorio(
+                        pending_queue,
+                        {
+                            "event": relatorio_event,
+                            "fallbackTs": scan_state["lastHttpTs"],
+                        },
+                    )
+                continue
 
-    if day == today:
-        return int(payload.get("sourceLogMtimeNs", 0)) != int(log_mtime_ns)
+            if line_kind != LINE_HTTP:
+                other_kind = classify_other_line(line)
+                line_kinds[other_kind] += 1
+                if other_kind == LINE_KIND_UNPARSED:
+                    sample_rejected_line(rejected_sample, other_kind, line)
+                continue
+
+            parsed_http = parse_http_line(line)
+            if parsed_http is None:
+                http_rejected += 1
+                rejected_kind = rejected_http_kind(line)
+                line_kinds[rejected_kind] += 1
+                sample_rejected_line(rejected_sample, rejected_kind, line)
+                continue
+
+            scan_state["lastHttpTs"] = parsed_http["ts"]
+            in_scope = is_day_in_scope(parsed_http["ts"], start_dt, end_dt, wanted_days)
+            push_events = not drain or in_scope
+
+            if pending_queue["size"]:
+                pair_pending_relatorio(pending_queue, daily_stats, scope, parsed_http, parsed_http["ts"], in_scope)
+
+            if not in_scope:
+                if any(line_kinds):
+                    scan_state["lineKinds"] = line_kinds = new_line_kinds()
+                continue
+
+            day_stats = get_day_stats(daily_stats, parsed_http["ts"])
+            day_stats["lineKinds"][LINE_KIND_HTTP] += 1
+            if any(line_kinds):
+                add_line_kinds(day_stats, line_kinds)
+                scan_state["lineKinds"] = line_kinds = new_line_kinds()
+
+            if is_relatorio_http_request(parsed_http):
+                continue
+
+            update_http_stats(day_stats, parsed_http)
+
+        return handle.tell()
+    finally:
+        count_scanned_lines((lines_read, scanned_to - start_offset, http_rejected, relatorio_rejected))
+
+
+def count_scanned_lines(counters):
+    """Soma (linhas, bytes, HTTP rejeitados, relatorio rejeitados) em SCAN_COUNTERS."""
+    lines_read, bytes_read, http_rejected, relatorio_rejected = counters
+    SCAN_COUNTERS["linesRead"] += lines_read
+    SCAN_COUNTERS["bytesRead"] += bytes_read
+    SCAN_COUNTERS["httpRejected"] += http_rejected
+    SCAN_COUNTERS["relatorioRejected"] += relatorio_rejected
+
+
+def split_byte_range(handle, start_offset, stop_offset):
+    """Divide [start, stop) em trechos de SCAN_CHUNK_BYTES alinhados no inicio de uma linha."""
+    boundaries = [start_offset]
+    nominal = start_offset + SCAN_CHUNK_BYTES
+    while nominal < stop_offset:
+        handle.seek(nominal - 1)
+        handle.readline()
+        boundary = handle.tell()
+        if boundary >= stop_offset:
+            break
+        if boundary > boundaries[-1]:
+            boundaries.append(boundary)
+        nominal = boundary + SCAN_CHUNK_BYTES
+    boundaries.append(stop_offset)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def scan_log_chunk(log_path, chunk_start, chunk_end, scope):
+    """Worker do modo --workers: agrega o HTTP do trecho e devolve o rastro para o pareamento
+    e os contadores de leitura (SCAN_COUNTERS do worker nao chega ao processo principal).
+
+    O pareamento de relatorio depende do que veio antes no arquivo, entao o worker so
+    registra os eventos e os HTTP que podem afeta-los; o processo principal refaz o
+    pareamento em ordem com replay_pairing_trace. Do mesmo jeito, as linhas antes do
+    primeiro HTTP e depois do ultimo voltam em separado para o dia certo ser decidido
+    junto com os trechos vizinhos.
+    """
+    daily_stats = {}
+    trace = []
+    line_kinds = new_line_kinds()
+    leading_kinds = None
+    first_http_ts = None
+    rejected_sample = {}
+    scanned_to = chunk_start
+    lines_read = http_rejected = relatorio_rejected = 0
+
+    with Path(log_path).open("rb") as handle:
+        for line_start, line_end, raw_line in iter_log_lines(handle, chunk_start):
+            if line_start >= chunk_end:
+                break
+
+            scanned_to = line_end
+            line = raw_line.strip()
+            if not line:
+                continue
+
+            lines_read += 1
+            line_kind = classify_log_line(line)
+            if line_kind == LINE_RELATORIO:
+                relatorio_event = parse_relatorio_line(line)
+                if relatorio_event is not None:
+                    line_kinds[LINE_KIND_RELATORIO] += 1
+                    trace.append((TRACE_RELATORIO, relatorio_event))
+                else:
+                    relatorio_rejected += 1
+                    line_kinds[LINE_KIND_UNPARSED] += 1
+                    sample_rejected_line(rejected_sample, LINE_KIND_UNPARSED, line)
+                continue
+
+            if line_kind != LINE_HTTP:
+                other_kind = classify_other_line(line)
+                line_kinds[other_kind] += 1
+                if other_kind == LINE_KIND_UNPARSED:
+                    sample_rejected_line(rejected_sample, other_kind, line)
+                continue
+
+            parsed_http = parse_http_line(line)
+            if parsed_http is None:
+                http_rejected += 1
+                rejected_kind = rejected_http_kind(line)
+                line_kinds[rejected_kind] += 1
+                sample_rejected_line(rejected_sample, rejected_kind, line)
+                continue
+
+            http_ts = parsed_http["ts"]
+            day_stats = get_day_stats(daily_stats, http_ts) if is_day_in_scope(http_ts, *scope) else None
+            if first_http_ts is None:
+                first_http_ts, leading_kinds = http_ts, line_kinds
+                line_kinds = new_line_kinds()
+            elif any(line_kinds):
+                if day_stats is not None:
+                    add_line_kinds(day_stats, line_kinds)
+                line_kinds = new_line_kinds()
+            if day_stats is not None:
+                day_stats["lineKinds"][LINE_KIND_HTTP] += 1
+
+            if is_relatorio_http_request(parsed_http):
+                trace.append((TRACE_RELATORIO_HTTP, parsed_http))
+                continue
+
+            # HTTP comum nunca pareia: em sequencia, so o ultimo ts importa.
+            if trace and trace[-1][0] == TRACE_HTTP:
+                trace[-1] = (TRACE_HTTP, http_ts)
+            else:
+                trace.append((TRACE_HTTP, http_ts))
+
+            if day_stats is not None:
+                update_http_stats(day_stats, parsed_http)
+
+    if first_http_ts is None:
+        leading_kinds, line_kinds = line_kinds, new_line_kinds()
+    counters = (lines_read, scanned_to - chunk_start, http_rejected, relatorio_rejected)
+    boundary_kinds = (leading_kinds, first_http_ts, line_kinds, rejected_sample)
+    return (
+        {day_key: serialize_stats(stats) for day_key, stats in daily_stats.items()},
+        trace,
+        counters,
+        boundary_kinds,
+    )
+
+
+def replay_pairing_trace(scan_state, daily_stats, scope, trace):
+    for trace_kind, payload in trace:
+        if trace_kind == TRACE_RELATORIO:
+            push_pending_relatorio(scan_state["pending"], {"event": payload, "fallbackTs": scan_state["lastHttpTs"]})
+            continue
+
+        parsed_http = payload if trace_kind == TRACE_RELATORIO_HTTP else None
+        http_ts = parsed_http["ts"] if parsed_http is not None else payload
+        scan_state["lastHttpTs"] = http_ts
+        if scan_state["pending"]["size"]:
+            in_scope = is_day_in_scope(http_ts, *scope)
+            pair_pending_relatorio(scan_state["pending"], daily_stats, scope, parsed_http, http_ts, in_scope)
+
+
+def submit_scan_chunks(executor, log_path: Path, handle, scan_windows, scope):
+    log_size = log_path.stat().st_size
+    window_jobs = []
+    covered = 0
+
+    for window_start, _, stop_offset in scan_windows:
+        chunk_start = max(window_start, covered)
+        chunk_stop = log_size if stop_offset is None else stop_offset
+        jobs = []
+        if chunk_start < chunk_stop:
+            jobs = [
+                executor.submit(scan_log_chunk, str(log_path), start, stop, scope)
+                for start, stop in split_byte_range(handle, chunk_start, chunk_stop)
+            ]
+        window_jobs.append((jobs, max(chunk_start, chunk_stop)))
+        covered = max(covered, chunk_stop)
+
+    return window_jobs
+
+
+def merge_scan_chunks(jobs, scan_state, daily_stats, scope):
+    for job in jobs:
+        chunk_stats, trace, counters, boundary_kinds = job.result()
+        count_scanned_lines(counters)
+        for day_key, serialized in chunk_stats.items():
+            if day_key not in daily_stats:
+                daily_stats[day_key] = empty_stats()
+            merge_stats(daily_stats[day_key], deserialize_stats(serialized))
+        replay_pairing_trace(scan_state, daily_stats, scope, trace)
+        merge_chunk_line_kinds(scan_state, daily_stats, scope, boundary_kinds)
+
+
+def merge_chunk_line_kinds(scan_state, daily_stats, scope, boundary_kinds):
+    """Linhas antes do primeiro HTTP do trecho vao para o dia dele junto com as que
+    sobraram do trecho anterior; as depois do ultimo esperam o proximo trecho."""
+    leading_kinds, first_http_ts, trailing_kinds, rejected_sample = boundary_kinds
+    merge_rejected_sample(rejected_sample)
+    line_kinds = list(map(operator.add, scan_state["lineKinds"], leading_kinds))
+    if first_http_ts is not None:
+        if any(line_kinds) and is_day_in_scope(first_http_ts, *scope):
+            add_line_kinds(get_day_stats(daily_stats, first_http_ts), line_kinds)
+        line_kinds = trailing_kinds
+    scan_state["lineKinds"] = line_kinds
+
+
+def new_scan_state():
+    return {"lastHttpTs": None, "pending": new_pending_queue(), "lineKinds": new_line_kinds()}
+
+
+def collect_daily_stats(
+    log_path: Path,
+    start_dt: datetime,
+    end_dt: datetime,
+    scan_windows=None,
+    wanted_days=None,
+    executor=None,
+    scan_carry=None,
+):
+    """Agrega o log por dia no intervalo.
+
+    scan_carry (dict) guarda o pareamento pendente no fim da ultima janela; a proxima
+    chamada que comeca exatamente ali continua dele, como se fosse uma varredura so.
+    """
+    daily_stats = {}
+    scope = (start_dt, end_dt, wanted_days)
+    scan_state = new_scan_state()
+    scan_log_file(log_path, scan_state, daily_stats, scope, scan_windows, executor, scan_carry)
+    apply_leftover_relatorio(scan_state, daily_stats, scope)
+    return daily_stats
+
+
+def scan_log_file(log_path: Path, scan_state, daily_stats, scope, scan_windows=None, executor=None, scan_carry=None):
+    """Varre um arquivo continuando de scan_state, que pode vir do arquivo anterior do
+    mesmo conjunto de logs. Os pendentes que sobrarem ficam em scan_state."""
+    start_dt, end_dt, _ = scope
+    position = 0
+
+    with open_log_file(log_path) as handle:
+        if scan_windows is None:
+            scan_windows = [locate_scan_window(log_path, handle, start_dt, end_dt)]
+        if (
+            scan_carry
+            and scan_windows
+            and scan_carry["log"] == str(log_path)
+            and scan_carry["offset"] == scan_windows[0][0]
+        ):
+            position = scan_carry["offset"]
+            scan_state.update(resume_scan_state(scan_carry))
+        window_jobs = submit_scan_chunks(executor, log_path, handle, scan_windows, scope) if executor else None
+
+        for window_index, (window_start, seed_ts, stop_offset) in enumerate(scan_windows):
+            # Pendentes em aberto precisam ver os HTTP entre as janelas, senao um HTTP do
+            # intervalo poderia parear um evento que ja teria sido consumido antes.
+            if position < window_start:
+                position = scan_log_window(handle, scan_state, daily_stats, scope, position, window_start, drain=True)
+            if position < window_start:
+                position = window_start
+                scan_state["lastHttpTs"] = seed_ts
+                scan_state["lineKinds"] = new_line_kinds()
+            if window_jobs is None:
+                position = scan_log_window(handle, scan_state, daily_stats, scope, position, stop_offset)
+            else:
+                jobs, position = window_jobs[window_index]
+                merge_scan_chunks(jobs, scan_state, daily_stats, scope)
+            if stop_offset is None:
+                break
+        else:
+            if scan_carry is not None:
+                scan_carry.update(save_scan_state(scan_state, start_dt), log=str(log_path), offset=position)
+            scan_log_window(handle, scan_state, daily_stats, scope, position, None, drain=True)
+
+    return scan_state
+
+
+def save_scan_state(scan_state, start_dt: datetime):
+    return {
+        "keepFrom": scan_state["pending"]["keepFrom"] or start_dt,
+        "lastHttpTs": scan_state["lastHttpTs"],
+        "pending": pending_relatorio_list(scan_state["pending"]),
+        "lineKinds": list(scan_state["lineKinds"]),
+    }
+
+
+def resume_scan_state(scan_carry):
+    pending = new_pending_queue(scan_carry["pending"])
+    # O fim da janela e logo apos um HTTP: nenhum pendente e recente ali.
+    pending["recent"] = []
+    pending["keepFrom"] = scan_carry["keepFrom"]
+    return {"lastHttpTs": scan_carry["lastHttpTs"], "pending": pending, "lineKinds": list(scan_carry["lineKinds"])}
+
+
+def apply_leftover_relatorio(scan_state, daily_stats, scope):
+    for pending in pending_relatorio_list(scan_state["pending"]):
+        fallback_ts = pending["fallbackTs"]
+        if fallback_ts is None:
+            continue
+        if is_day_in_scope(fallback_ts, *scope):
+            process_relatorio_event(
+                get_day_stats(daily_stats, fallback_ts),
+                pending["event"],
+                fallback_ts,
+            )
+
+
+def iter_days(start_day: date, end_day: date):
+    current_day = start_day
+    while current_day <= end_day:
+        yield current_day
+        current_day += timedelta(days=1)
+
+
+def group_consecutive_days(days):
+    if not days:
+        return []
+
+    ordered_days = sorted(days)
+    groups = []
+    group_start = ordered_days[0]
+    previous_day = ordered_days[0]
+
+    for current_day in ordered_days[1:]:
+        if current_day == previous_day + timedelta(days=1):
+            previous_day = current_day
+            continue
+
+        groups.append((group_start, previous_day))
+        group_start = current_day
+        previous_day = current_day
+
+    groups.append((group_start, previous_day))
+    return groups
+
+
+def cache_file_for_day(cache_dir: Path, day: date):
+    return cache_dir / f"{day.isoformat()}.hubday"
+
+
+def legacy_cache_file_for_day(cache_dir: Path, day: date):
+    return cache_dir / f"{day.isoformat()}.json"
+
+
+def lock_file_for_day(cache_dir: Path, day: date):
+    return cache_dir / "locks" / f"{day.isoformat()}.lock"
+
+
+def temp_file_for(path: Path):
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def replace_file(temp_path: Path, path: Path):
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(temp_path, path)
+            return
+        except PermissionError:
+            # No Windows o destino aberto por um leitor recusa a troca por um instante.
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(LOCK_POLL_SECONDS)
+
+
+def write_file_atomic(path: Path, data: bytes):
+    """Grava num temporario do mesmo diretorio e troca de uma vez: quem le ve o arquivo
+    antigo ou o novo, nunca um pela metade."""
+    temp_path = temp_file_for(path)
+    try:
+        temp_path.write_bytes(data)
+        replace_file(temp_path, path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def acquire_file_lock(lock_path: Path, blocking=True):
+    """Trava consultiva entre processos (o SO solta se o dono morrer).
+
+    Retorna o handle da trava, ou None quando outro processo ja a tem e blocking e falso.
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    handle = lock_path.open("a+b")
+    try:
+        if os.name != "nt":
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                return None
+            return handle
+
+        while True:
+            try:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return handle
+            except OSError:
+                if not blocking:
+                    handle.close()
+                    return None
+                time.sleep(LOCK_POLL_SECONDS)
+    except BaseException:
+        handle.close()
+        raise
+
+
+def release_file_lock(handle):
+    if os.name == "nt":
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    handle.close()
+
+
+@contextmanager
+def day_cache_lock(cache_dir: Path, day: date):
+    handle = acquire_file_lock(lock_file_for_day(cache_dir, day))
+    try:
+        yield
+    finally:
+        release_file_lock(handle)
+
+
+def lock_missing_days(cache_dir: Path, missing_days, blocking, unlocked_day=None):
+    """Trava os dias que este processo vai refazer.
+
+    Retorna (travas, dias travados, dias em uso por outro processo); unlocked_day entra
+    sem trava porque nunca e gravado (hoje no modo com varias instancias).
+    """
+    day_locks = {}
+    locked_days = []
+    busy_days = []
+    try:
+        for current_day in missing_days:
+            if current_day == unlocked_day:
+                locked_days.append(current_day)
+                continue
+            handle = acquire_file_lock(lock_file_for_day(cache_dir, current_day), blocking)
+            if handle is None:
+                busy_days.append(current_day)
+                continue
+            day_locks[current_day] = handle
+            locked_days.append(current_day)
+    except BaseException:
+        for handle in day_locks.values():
+            release_file_lock(handle)
+        raise
+    return day_locks, locked_days, busy_days
+
+
+def source_log_fingerprint(source_log):
+    return hashlib.sha1(str(source_log).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cache_payload(payload):
+    body = {key: value for key, value in payload.items() if key not in DAY_CACHE_HEADER_FIELDS}
+    flags = 0
+    if body.get("tail"):
+        flags |= DAY_CACHE_FLAG_OPEN
+    else:
+        body.pop("tail", None)
+
+    encoded_body = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header = DAY_CACHE_HEADER.pack(
+        DAY_CACHE_MAGIC,
+        CACHE_SCHEMA_VERSION,
+        flags,
+        payload["date"].encode("ascii"),
+        bytes.fromhex(source_log_fingerprint(payload["sourceLog"])),
+        int(payload["sourceLogMtimeNs"]),
+        len(encoded_body),
+    )
+    return header + encoded_body
+
+
+def decode_cache_header(raw):
+    if len(raw) < DAY_CACHE_HEADER.size:
+        return None
+
+    magic, schema_version, flags, raw_date, fingerprint, log_mtime_ns, body_size = DAY_CACHE_HEADER.unpack_from(raw)
+    if magic != DAY_CACHE_MAGIC or not FIRST_BINARY_CACHE_SCHEMA_VERSION <= schema_version <= CACHE_SCHEMA_VERSION:
+        return None
+    # Escrita interrompida no meio deixa o arquivo menor que o cabecalho anuncia.
+    if len(raw) != DAY_CACHE_HEADER.size + body_size:
+        return None
+
+    return {
+        "schemaVersion": schema_version,
+        "date": raw_date.decode("ascii", errors="replace"),
+        "open": bool(flags & DAY_CACHE_FLAG_OPEN),
+        "sourceLogFingerprint": fingerprint.hex(),
+        "sourceLogMtimeNs": log_mtime_ns,
+        "cacheBytes": len(raw),
+    }
+
+
+def decode_cache_payload(raw):
+    header = decode_cache_header(raw)
+    if header is None:
+        return None
+
+    try:
+        body = json.loads(raw[DAY_CACHE_HEADER.size:].decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+
+    return {**header, **body}
+
+
+def read_legacy_cache(cache_dir: Path, day: date):
+    """Cache JSON antigo (schema 2), no mesmo formato de decode_cache_payload.
+
+    So vira binario em upgrade_cached_day, depois de aceito; ate la o JSON fica intacto.
+    """
+    try:
+        raw = legacy_cache_file_for_day(cache_dir, day).read_bytes()
+        payload = json.loads(raw.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError, OSError):
+        return None
+
+    if int(payload.get("schemaVersion", 0)) != LEGACY_CACHE_SCHEMA_VERSION or payload.get("date") != day.isoformat():
+        return None
+    return {**payload, "schemaVersion": LEGACY_CACHE_SCHEMA_VERSION, "open": bool(payload.get("tail")), "cacheBytes": len(raw)}
+
+
+def read_cache_payload(cache_dir: Path, day: date):
+    """Cache do dia, inclusive de schema antigo (ver is_outdated_cache)."""
+    try:
+        raw = cache_file_for_day(cache_dir, day).read_bytes()
+    except FileNotFoundError:
+        payload = read_legacy_cache(cache_dir, day)
+    except OSError:
+        return None
+    else:
+        payload = decode_cache_payload(raw)
+
+    if payload is None or payload["date"] != day.isoformat():
+        return None
+    # Dia agregado com outra tabela de endpoints precisa ser refeito.
+    if payload.get("endpointTable") != ROUTE_CLASSIFIER["digest"]:
+        return None
+
+    return payload
+
+
+def is_outdated_cache(payload):
+    return payload is not None and payload["schemaVersion"] != CACHE_SCHEMA_VERSION
+
+
+def upgrade_cached_day(cache_dir: Path, day: date, payload):
+    """Regrava um cache de schema antigo no formato atual, com as secoes que faltam vazias."""
+    upgraded = {**payload, "stats": serialize_stats(deserialize_stats(payload.get("stats", {})))}
+    raw = encode_cache_payload(upgraded)
+    write_file_atomic(cache_file_for_day(cache_dir, day), raw)
+    # O JSON antigo so sai depois que o binario esta gravado.
+    legacy_cache_file_for_day(cache_dir, day).unlink(missing_ok=True)
+    return decode_cache_payload(raw)
+
+
+def settle_outdated_cache(cache_dir: Path, day: date, payload, log_covers_day):
+    """Cache de schema antigo: None (refazer) quando o log ainda tem o dia ou ele esta
+    aberto; senao ele e mantido e regravado no formato atual, sem perder o que guardava."""
+    if payload["open"] or log_covers_day:
+        return None
+    return upgrade_cached_day(cache_dir, day, payload)
+
+
+def apply_pending_relatorio(stats, pending_events, day: date):
+    for pending in pending_events:
+        fallback_ts = pending["fallbackTs"]
+        if fallback_ts is not None and fallback_ts.date() == day:
+            process_relatorio_event(stats, pending["event"], fallback_ts)
+
+
+def stats_from_cache_payload(payload, sections=None):
+    stats = deserialize_stats(payload.get("stats", {}), sections)
+    if payload.get("tail"):
+        tail_state = deserialize_tail_state(payload["tail"])
+        apply_pending_relatorio(stats, tail_state["pending"], date.fromisoformat(payload["date"]))
+    return stats
+
+
+def load_cached_day(cache_dir: Path, day: date, sections=None):
+    payload = read_cache_payload(cache_dir, day)
+    return stats_from_cache_payload(payload, sections) if payload is not None else None
+
+
+def write_cached_day(cache_dir: Path, day: date, stats, log_path: Path, log_mtime_ns: int, tail_state=None):
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "date": day.isoformat(),
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "sourceLog": str(log_path),
+        "sourceLogMtimeNs": int(log_mtime_ns),
+        "stats": serialize_stats(stats),
+    }
+    if ROUTE_CLASSIFIER["digest"] is not None:
+        payload["endpointTable"] = ROUTE_CLASSIFIER["digest"]
+    if tail_state is not None:
+        payload["tail"] = serialize_tail_state(tail_state)
+    write_file_atomic(cache_file_for_day(cache_dir, day), encode_cache_payload(payload))
+    # Um JSON antigo que nao pode ser migrado (schema velho) fica obsoleto com o rebuild.
+    legacy_cache_file_for_day(cache_dir, day).unlink(missing_ok=True)
+    for rollup_path in rollup_files_for_day(cache_dir, day):
+        rollup_path.unlink(missing_ok=True)
+    # Dia aberto nunca entra no indice de totais.
+    if tail_state is None:
+        mark_totals_dirty(cache_dir, day)
+
+
+def file_mtime_ns(path: Path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def new_memory_cache(max_entries):
+    return {"entries": OrderedDict(), "maxEntries": max_entries}
+
+
+def memory_cache_get(memory_cache, cache_path: Path):
+    """Stats ja decodificados de um cache em disco, desde que o arquivo nao tenha mudado."""
+    if memory_cache is None:
+        return None
+
+    entry = memory_cache["entries"].get(str(cache_path))
+    if entry is None or entry[0] != file_mtime_ns(cache_path):
+        return None
+
+    memory_cache["entries"].move_to_end(str(cache_path))
+    return entry[1]
+
+
+def memory_cache_put(memory_cache, cache_path: Path, mtime_ns, value):
+    if memory_cache is None or mtime_ns is None:
+        return
+
+    entries = memory_cache["entries"]
+    entries[str(cache_path)] = (mtime_ns, value)
+    entries.move_to_end(str(cache_path))
+    while len(entries) > memory_cache["maxEntries"]:
+        entries.popitem(last=False)
+
+
+def last_day_of_month(day: date):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def rollup_file(cache_dir: Path, kind, period_start: date):
+    if kind == ROLLUP_WEEK:
+        iso_year, iso_week, _ = period_start.isocalendar()
+        return cache_dir / f"_rollup-week-{iso_year}-W{iso_week:02d}.hubday"
+    return cache_dir / f"_rollup-month-{period_start:%Y-%m}.hubday"
+
+
+def rollup_files_for_day(cache_dir: Path, day: date):
+    return [
+        rollup_file(cache_dir, ROLLUP_WEEK, day - timedelta(days=day.weekday())),
+        rollup_file(cache_dir, ROLLUP_MONTH, day.replace(day=1)),
+    ]
+
+
+def plan_rollups(start_day: date, end_day: date, today: date):
+    """Menor combinacao de meses/semanas fechados e dias soltos que cobre o intervalo."""
+    days = list(iter_days(start_day, end_day))
+    best_count = [0] * (len(days) + 1)
+    best_period = [None] * len(days)
+
+    for index in range(len(days) - 1, -1, -1):
+        day = days[index]
+        candidates = []
+        if day.day == 1:
+            candidates.append((ROLLUP_MONTH, day, last_day_of_month(day)))
+        if day.weekday() == 0:
+            candidates.append((ROLLUP_WEEK, day, day + timedelta(days=6)))
+
+        best_period[index] = (ROLLUP_DAY, day, day)
+        best_count[index] = 1 + best_count[index + 1]
+        for kind, period_start, period_end in candidates:
+            if period_end > end_day or period_end >= today:
+                continue
+            count = 1 + best_count[index + (period_end - period_start).days + 1]
+            if count < best_count[index]:
+                best_period[index] = (kind, period_start, period_end)
+                best_count[index] = count
+
+    periods = []
+    index = 0
+    while index < len(days):
+        kind, period_start, period_end = best_period[index]
+        periods.append((kind, period_start, period_end))
+        index += (period_end - period_start).days + 1
+    return periods
+
+
+def load_rollup(cache_dir: Path, kind, period_start: date, period_end: date, memory_cache=None, profile=None, sections=None):
+    rollup_path = rollup_file(cache_dir, kind, period_start)
+    cached = memory_cache_get(memory_cache, rollup_path)
+    if cached is not None:
+        members, stats = cached
+    else:
+        rollup_mtime_ns = file_mtime_ns(rollup_path)
+        try:
+            payload = decode_cache_payload(rollup_path.read_bytes())
+        except OSError:
+            return None
+        if payload is None or is_outdated_cache(payload) or payload["date"] != period_start.isoformat():
+            return None
+        if payload.get("endpointTable") != ROUTE_CLASSIFIER["digest"]:
+            return None
+        if profile is not None:
+            profile["cacheBytesLoaded"] += payload["cacheBytes"]
+        members, stats = payload.get("members", {}), None
+
+    # Um dia refeito ou apagado por baixo do rollup invalida o agregado.
+    for current_day in iter_days(period_start, period_end):
+        member_mtime_ns = file_mtime_ns(cache_file_for_day(cache_dir, current_day))
+        if member_mtime_ns is None or members.get(current_day.isoformat()) != member_mtime_ns:
+            return None
+
+    if stats is None:
+        stats = deserialize_stats(payload.get("stats", {}), sections)
+        # Stats parciais nao vao para o LRU: outro pedido pode precisar das demais secoes.
+        if sections is None:
+            memory_cache_put(memory_cache, rollup_path, rollup_mtime_ns, (members, stats))
+    return stats
+
+
+def write_rollup(cache_dir: Path, kind, period_start: date, period_end: date, member_stats, log_path: Path, log_mtime_ns: int):
+    members = {}
+    for current_day in iter_days(period_start, period_end):
+        try:
+            members[current_day.isoformat()] = cache_file_for_day(cache_dir, current_day).stat().st_mtime_ns
+        except OSError:
+            return
+
+    stats = empty_stats()
+    for day_stats in member_stats:
+        merge_stats(stats, day_stats)
+
+    payload = {
+        "date": period_start.isoformat(),
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "sourceLog": str(log_path),
+        "sourceLogMtimeNs": int(log_mtime_ns),
+        "kind": kind,
+        "end": period_end.isoformat(),
+        "members": members,
+        "stats": serialize_stats(stats),
+    }
+    if ROUTE_CLASSIFIER["digest"] is not None:
+        payload["endpointTable"] = ROUTE_CLASSIFIER["digest"]
+    write_file_atomic(rollup_file(cache_dir, kind, period_start), encode_cache_payload(payload))
+
+
+def totals_index_dir(cache_dir: Path):
+    return cache_dir / "_totals"
+
+
+def totals_month_file(cache_dir: Path, month_start: date):
+    return totals_index_dir(cache_dir) / f"{month_start:%Y-%m}.json"
+
+
+def totals_dirty_dir(cache_dir: Path):
+    return cache_dir / "_totals-dirty"
+
+
+def mark_totals_dirty(cache_dir: Path, day: date):
+    """Dia regravado tira o total dele do indice; o proximo refresh le o dia de novo.
+
+    Um marcador por dia (arquivo vazio) evita ler e regravar o mes a cada dia escrito.
+    """
+    if not totals_index_dir(cache_dir).exists():
+        return
+    dirty_dir = totals_dirty_dir(cache_dir)
+    dirty_dir.mkdir(exist_ok=True)
+    (dirty_dir / day.isoformat()).touch()
+
+
+def empty_totals():
+    return {
+        "kpis": [0] * len(KPI_FIELDS),
+        "statusDistribution": {},
+        "endpoints": {},
+        "relatorioEvents": 0,
+        "relatorioActions": {},
+        "relatorioResults": {},
+    }
+
+
+def totals_from_payload(stats_payload):
+    """Contadores somaveis de stats serializados; usuarios distintos nao somam e ficam de fora."""
+    kpis = stats_payload.get("kpis", {})
+    relatorio = stats_payload.get("relatorio", {})
+    return {
+        "kpis": [kpis.get(field, 0) for field in KPI_FIELDS],
+        "statusDistribution": dict(stats_payload.get("statusDistribution", {})),
+        "endpoints": {
+            endpoint: [record["frequency"], record["economyMin"]]
+            for endpoint, record in stats_payload.get("endpoints", {}).items()
+        },
+        "relatorioEvents": relatorio.get("totalEvents", 0),
+        "relatorioActions": dict(relatorio.get("actions", {})),
+        "relatorioResults": dict(relatorio.get("results", {})),
+    }
+
+
+def combine_totals(target, source):
+    target["kpis"] = [value + other for value, other in zip(target["kpis"], source["kpis"])]
+    for key in ("statusDistribution", "relatorioActions", "relatorioResults"):
+        counts = target[key]
+        for name, count in source[key].items():
+            counts[name] = counts.get(name, 0) + count
+    for endpoint, (frequency, economy_min) in source["endpoints"].items():
+        record = target["endpoints"].setdefault(endpoint, [0, 0])
+        record[0] += frequency
+        record[1] += economy_min
+    target["relatorioEvents"] += source["relatorioEvents"]
+    return target
+
+
+def subtract_totals(target, source):
+    """target - source; contadores que zeram saem, como se nunca tivessem aparecido."""
+    target["kpis"] = [value - other for value, other in zip(target["kpis"], source["kpis"])]
+    for key in ("statusDistribution", "relatorioActions", "relatorioResults"):
+        counts = target[key]
+        for name, count in source[key].items():
+            counts[name] = counts.get(name, 0) - count
+            if not counts[name]:
+                del counts[name]
+    for endpoint, (frequency, economy_min) in source["endpoints"].items():
+        record = target["endpoints"].setdefault(endpoint, [0, 0])
+        record[0] -= frequency
+        record[1] -= economy_min
+        if record == [0, 0]:
+            del target["endpoints"][endpoint]
+    target["relatorioEvents"] -= source["relatorioEvents"]
+    return target
+
+
+def copy_totals(totals):
+    return combine_totals(empty_totals(), totals)
+
+
+def new_totals_month():
+    return {
+        "schemaVersion": TOTALS_INDEX_SCHEMA_VERSION,
+        "endpointTable": ROUTE_CLASSIFIER["digest"],
+        "offset": empty_totals(),
+        "days": {},
+        "prefix": {},
+    }
+
+
+def load_totals_month(cache_dir: Path, month_start: date):
+    try:
+        totals_month = json.loads(totals_month_file(cache_dir, month_start).read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return new_totals_month()
+    if totals_month.get("schemaVersion") != TOTALS_INDEX_SCHEMA_VERSION:
+        return new_totals_month()
+    if totals_month.get("endpointTable") != ROUTE_CLASSIFIER["digest"]:
+        return new_totals_month()
+    return totals_month
+
+
+def rebuild_totals_prefix(totals_month):
+    """Acumulado dentro do mes ate cada dia do indice, em ordem de data."""
+    running = empty_totals()
+    totals_month["prefix"] = {}
+    for day_key in sorted(totals_month["days"]):
+        combine_totals(running, totals_month["days"][day_key])
+        totals_month["prefix"][day_key] = copy_totals(running)
+
+
+def totals_month_end(totals_month):
+    """Acumulado do indice ate o fim do mes: offset mais o prefixo do ultimo dia."""
+    month_end = copy_totals(totals_month["offset"])
+    if totals_month["prefix"]:
+        combine_totals(month_end, totals_month["prefix"][max(totals_month["prefix"])])
+    return month_end
+
+
+def write_totals_month(cache_dir: Path, month_start: date, totals_month):
+    totals_index_dir(cache_dir).mkdir(parents=True, exist_ok=True)
+    write_file_atomic(
+        totals_month_file(cache_dir, month_start),
+        json.dumps(totals_month, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    )
+
+
+def apply_totals_dirty(cache_dir: Path):
+    """Tira do indice os dias regravados desde o ultimo refresh; devolve os meses alterados."""
+    try:
+        dirty_paths = list(totals_dirty_dir(cache_dir).iterdir())
+    except FileNotFoundError:
+        return set()
+
+    dirty_by_month = defaultdict(list)
+    for path in dirty_paths:
+        dirty_day = date.fromisoformat(path.name)
+        dirty_by_month[dirty_day.replace(day=1)].append(dirty_day.isoformat())
+    changed_months = set()
+    for month_start, day_keys in dirty_by_month.items():
+        totals_month = load_totals_month(cache_dir, month_start)
+        if any(totals_month["days"].pop(day_key, None) is not None for day_key in day_keys):
+            rebuild_totals_prefix(totals_month)
+            write_totals_month(cache_dir, month_start, totals_month)
+            changed_months.add(month_start)
+    for path in dirty_paths:
+        path.unlink(missing_ok=True)
+    return changed_months
+
+
+def chain_totals_offsets(cache_dir: Path, months, from_month: date):
+    """Refaz o offset (acumulado dos meses anteriores) de from_month em diante.
+
+    Meses sem arquivo nao somam nada; um mes alterado so regrava os posteriores.
+    """
+    month_starts = {date.fromisoformat(f"{path.stem}-01") for path in totals_index_dir(cache_dir).glob("*.json")}
+    month_starts.update(month_start for month_start, totals_month in months.items() if totals_month["days"])
+
+    carried = empty_totals()
+    for month_start in sorted(month_starts):
+        if month_start not in months:
+            months[month_start] = load_totals_month(cache_dir, month_start)
+        totals_month = months[month_start]
+        if month_start >= from_month and totals_month["offset"] != carried:
+            totals_month["offset"] = carried
+            write_totals_month(cache_dir, month_start, totals_month)
+        carried = totals_month_end(totals_month)
+
+
+def refresh_totals_index(cache_dir: Path, start_day: date, through_day: date):
+    """Indice de totais dos caches selados, um arquivo por mes.
+
+    Cada mes guarda os totais de cada dia, o acumulado dentro do mes ate cada dia e o
+    offset com o acumulado dos meses anteriores. Cobre de start_day ate o primeiro dia sem
+    cache selado (ou through_day); dias que faltam sao lidos do cache diario e so o mes
+    deles e os seguintes sao regravados.
+    """
+    # Formato antigo: um arquivo so com o acumulado de todos os dias.
+    (cache_dir / "_totals.json").unlink(missing_ok=True)
+    dirty_months = apply_totals_dirty(cache_dir)
+
+    months = {}
+    changed_months = set()
+    covered_end = start_day - timedelta(days=1)
+    for current_day in iter_days(start_day, through_day):
+        month_start = current_day.replace(day=1)
+        if month_start not in months:
+            months[month_start] = load_totals_month(cache_dir, month_start)
+        totals_month = months[month_start]
+        day_key = current_day.isoformat()
+        if day_key not in totals_month["days"]:
+            payload = read_cache_payload(cache_dir, current_day)
+            # Schema antigo passa antes por collect_with_scan_pool (refeito ou regravado).
+            if payload is None or payload["open"] or is_outdated_cache(payload):
+                break
+            totals_month["days"][day_key] = totals_from_payload(payload.get("stats", {}))
+            changed_months.add(month_start)
+        covered_end = current_day
+
+    for month_start in changed_months:
+        rebuild_totals_prefix(months[month_start])
+        write_totals_month(cache_dir, month_start, months[month_start])
+    if changed_months or dirty_months:
+        chain_totals_offsets(cache_dir, months, min(changed_months | dirty_months))
+    return {"months": months, "end": covered_end}
+
+
+def totals_index_end(totals_index):
+    """Ultimo dia coberto pelo indice (vespera do inicio quando nada foi coberto)."""
+    return totals_index["end"]
+
+
+def totals_index_prefix(totals_index, day: date):
+    """Acumulado do indice ate o fim de day: offset do mes mais o prefixo do dia."""
+    totals_month = totals_index["months"][day.replace(day=1)]
+    return combine_totals(copy_totals(totals_month["offset"]), totals_month["prefix"][day.isoformat()])
+
+
+def totals_index_range(totals_index, start_day: date, end_day: date):
+    """Totais de [start_day, end_day] pela diferenca de dois acumulados do indice."""
+    start_month = totals_index["months"][start_day.replace(day=1)]
+    # O acumulado de start_day ja inclui o proprio dia, que volta somado ao de end_day.
+    upper = combine_totals(totals_index_prefix(totals_index, end_day), start_month["days"][start_day.isoformat()])
+    return subtract_totals(upper, totals_index_prefix(totals_index, start_day))
+
+
+def serialize_tail_state(tail_state):
+    return {
+        "offset": tail_state["offset"],
+        "inode": tail_state["inode"],
+        "digest": tail_state["digest"],
+        "lastHttpTs": tail_state["lastHttpTs"].isoformat() if tail_state["lastHttpTs"] else None,
+        "pending": [
+            {
+                "event": pending["event"],
+                "fallbackTs": pending["fallbackTs"].isoformat() if pending["fallbackTs"] else None,
+            }
+            for pending in tail_state["pending"]
+        ],
+        "lineKinds": tail_state["lineKinds"],
+    }
+
+
+def deserialize_tail_state(payload):
+    return {
+        "offset": int(payload.get("offset", 0)),
+        "inode": int(payload.get("inode", 0)),
+        "digest": payload.get("digest", ""),
+        "lastHttpTs": datetime.fromisoformat(payload["lastHttpTs"]) if payload.get("lastHttpTs") else None,
+        "pending": [
+            {
+                "event": pending["event"],
+                "fallbackTs": datetime.fromisoformat(pending["fallbackTs"]) if pending.get("fallbackTs") else None,
+            }
+            for pending in payload.get("pending", [])
+        ],
+        "lineKinds": [int(count) for count in payload.get("lineKinds") or new_line_kinds()],
+    }
+
+
+def read_tail_digest(handle, offset):
+    start = max(0, offset - TAIL_DIGEST_BYTES)
+    handle.seek(start)
+    return hashlib.sha1(handle.read(offset - start)).hexdigest()
+
+
+def find_complete_offset(handle, size):
+    position = size
+    while position > 0:
+        chunk_start = max(0, position - 65536)
+        handle.seek(chunk_start)
+        newline_at = handle.read(position - chunk_start).rfind(b"\n")
+        if newline_at >= 0:
+            return chunk_start + newline_at + 1
+        position = chunk_start
+    return 0
+
+
+def is_valid_tail(tail_state, handle, log_stat):
+    if tail_state["inode"] != log_stat.st_ino or tail_state["offset"] > log_stat.st_size:
+        return False
+    # copytruncate mantem o inode; o trecho antes do offset tambem precisa ser o mesmo.
+    return read_tail_digest(handle, tail_state["offset"]) == tail_state["digest"]
+
+
+def ingest_day_tail(log_path: Path, day: date, tail_state, stats):
+    """Le apenas os bytes novos do log para o dia e devolve o novo estado do tail."""
+    log_stat = log_path.stat()
+    day_key = day.isoformat()
+    scope = (
+        datetime.combine(day, datetime.min.time()),
+        datetime.combine(day, datetime.max.time()),
+        {day_key},
+    )
+    scan_state = {
+        "lastHttpTs": tail_state["lastHttpTs"],
+        "pending": new_pending_queue(tail_state["pending"]),
+        "lineKinds": list(tail_state["lineKinds"]),
+    }
+    generated_days = {}
+
+    with log_path.open("rb") as handle:
+        complete_offset = find_complete_offset(handle, log_stat.st_size)
+        if complete_offset > tail_state["offset"]:
+            scan_log_window(handle, scan_state, generated_days, scope, tail_state["offset"], complete_offset)
+        complete_offset = max(complete_offset, tail_state["offset"])
+        digest = read_tail_digest(handle, complete_offset)
+
+    if day_key in generated_days:
+        merge_stats(stats, generated_days[day_key])
+
+    return {
+        "offset": complete_offset,
+        "inode": log_stat.st_ino,
+        "digest": digest,
+        "lastHttpTs": scan_state["lastHttpTs"],
+        "pending": pending_relatorio_list(scan_state["pending"]),
+        "lineKinds": scan_state["lineKinds"],
+    }
+
+
+def refresh_open_day(log_path: Path, cache_dir: Path, day: date, today: date, log_mtime_ns: int, payload, executor=None):
+    """Atualiza o cache de um dia ainda aberto (hoje ou nao selado) lendo so o final do log.
+
+    Retorna (stats, bytes_lidos, reconstruido), ou None quando um dia passado perdeu o tail
+    e precisa ser refeito pela varredura normal.
+    """
+    tail_state = deserialize_tail_state(payload["tail"]) if payload and payload.get("tail") else None
 
-    return False
+    with log_path.open("rb") as handle:
+        if tail_state is not None and not is_valid_tail(tail_state, handle, log_path.stat()):
+            tail_state = None
 
+    rebuilt = tail_state is None
+    if rebuilt and day != today:
+        return None
 
-def load_cached_day(cache_path: Path):
-    payload = json.loads(cache_path.read_text(encoding="utf-8"))
-    return deserialize_stats(payload.get("stats", {}))
+    if rebuilt:
+        # Sem tail valido (primeira execucao, log truncado ou rotacionado): recomeca o dia.
+        stats = empty_stats()
+        start_offset, seed_ts = resolve_day_start(update_log_index(log_path, cache_dir, executor), day)
+        tail_state = {
+            "offset": start_offset,
+            "inode": 0,
+            "digest": "",
+            "lastHttpTs": seed_ts,
+            "pending": [],
+            "lineKinds": new_line_kinds(),
+        }
+    else:
+        stats = deserialize_stats(payload.get("stats", {}))
 
+    previous_offset = tail_state["offset"]
+    tail_state = ingest_day_tail(log_path, day, tail_state, stats)
+    bytes_read = tail_state["offset"] - previous_offset
 
-def write_cached_day(cache_dir: Path, day: date, stats, log_path: Path, log_mtime_ns: int):
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    cache_file = cache_file_for_day(cache_dir, day)
-    payload = {
-        "schemaVersion": CACHE_SCHEMA_VERSION,
-        "date": day.isoformat(),
-        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+    if not rebuilt and bytes_read == 0:
+        apply_pending_relatorio(stats, tail_state["pending"], day)
+        return stats, 0, False
+
+    last_http_ts = tail_state["lastHttpTs"]
+    if last_http_ts is not None and last_http_ts.date() > day:
+        # O log ja passou do dia: aplica os pendentes e sela o cache.
+        apply_pending_relatorio(stats, tail_state["pending"], day)
+        write_cached_day(cache_dir, day, stats, log_path, log_mtime_ns)
+        return stats, bytes_read, rebuilt
+
+    write_cached_day(cache_dir, day, stats, log_path, log_mtime_ns, tail_state)
+    apply_pending_relatorio(stats, tail_state["pending"], day)
+    return stats, bytes_read, rebuilt
+
+
+def seal_open_day(cache_dir: Path, day: date):
+    """Fecha um dia que ficou aberto sem o log passar da meia-noite: os relatorio pendentes
+    caem no fallback e o tail e descartado. Retorna True se havia o que selar."""
+    with day_cache_lock(cache_dir, day):
+        payload = read_cache_payload(cache_dir, day)
+        if payload is None or not payload["open"]:
+            return False
+        stats = stats_from_cache_payload(payload)
+        write_cached_day(cache_dir, day, stats, payload["sourceLog"], payload["sourceLogMtimeNs"])
+    return True
+
+
+def log_index_file(cache_dir: Path, log_path: Path):
+    path_digest = hashlib.sha1(str(log_path.resolve()).encode("utf-8")).hexdigest()[:12]
+    return cache_dir / f"_log-index-{path_digest}.json"
+
+
+def empty_log_index(log_path: Path):
+    return {
+        "schemaVersion": LOG_INDEX_SCHEMA_VERSION,
         "sourceLog": str(log_path),
-        "sourceLogMtimeNs": int(log_mtime_ns),
-        "stats": serialize_stats(stats),
+        "headBytes": 0,
+        "headDigest": "",
+        "indexedBytes": 0,
+        "seekable": True,
+        "lastDay": "",
+        "lastHttpTs": None,
+        "lastHttpEnd": 0,
+        "headSettledAt": None,
+        "headPending": [],
+        "days": {},
+    }
+
+
+def read_head_digest(handle, head_bytes):
+    handle.seek(0)
+    return hashlib.sha1(handle.read(head_bytes)).hexdigest()
+
+
+def load_log_index(index_path: Path, log_path: Path, handle, log_size: int):
+    try:
+        payload = json.loads(index_path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return None
+
+    if int(payload.get("schemaVersion", 0)) != LOG_INDEX_SCHEMA_VERSION:
+        return None
+    if payload.get("sourceLog") != str(log_path):
+        return None
+
+    indexed_bytes = int(payload.get("indexedBytes", 0))
+    if indexed_bytes > log_size:
+        return None
+
+    # Log rotacionado ou reescrito: o inicio do arquivo nao bate mais com o indice.
+    if read_head_digest(handle, int(payload.get("headBytes", 0))) != payload.get("headDigest"):
+        return None
+
+    if indexed_bytes > 0:
+        handle.seek(indexed_bytes - 1)
+        if handle.read(1) != b"\n":
+            return None
+
+    return payload
+
+
+def record_indexed_http(log_index, day_key, line_end, http_ts):
+    days = log_index["days"]
+    if day_key == log_index["lastDay"]:
+        days[day_key]["end"] = line_end
+    elif day_key in days or day_key < log_index["lastDay"]:
+        log_index["seekable"] = False
+    else:
+        days[day_key] = {
+            "start": log_index["lastHttpEnd"],
+            "end": line_end,
+            "prevTs": log_index["lastHttpTs"],
+        }
+        log_index["lastDay"] = day_key
+
+    log_index["lastHttpTs"] = http_ts
+    log_index["lastHttpEnd"] = line_end
+
+
+def extend_log_index(log_index, handle, settle_only=False):
+    head_pending = log_index["headPending"]
+    offset = log_index["indexedBytes"]
+    handle.seek(offset)
+
+    for raw_line in handle:
+        # A ultima linha ainda pode estar sendo escrita pelo pm2.
+        if not raw_line.endswith(b"\n"):
+            break
+        # No modo paralelo so o inicio ate o primeiro pareamento completo e sequencial.
+        if settle_only and log_index["headSettledAt"] is not None:
+            break
+
+        offset += len(raw_line)
+        parts = [part.strip() for part in raw_line.decode("utf-8", errors="replace").split("\r")]
+        parts = [part for part in parts if part]
+
+        for line in parts:
+            line_kind = classify_log_line(line)
+            if line_kind == LINE_RELATORIO:
+                relatorio_event = parse_relatorio_line(line)
+                if relatorio_event is not None and log_index["lastHttpTs"] is None:
+                    head_pending.append(relatorio_event)
+                continue
+
+            if line_kind != LINE_HTTP:
+                continue
+
+            parsed_http = parse_http_line(line)
+            if parsed_http is None:
+                continue
+
+            if len(parts) > 1:
+                log_index["seekable"] = False
+
+            # Eventos de relatorio antes do primeiro HTTP nunca expiram; so da para pular
+            # o inicio do arquivo depois que todos forem pareados.
+            if log_index["headSettledAt"] is None:
+                if not head_pending:
+                    log_index["headSettledAt"] = 0
+                else:
+                    for position, event in enumerate(head_pending):
+                        if matches_relatorio_http_event(event, parsed_http):
+                            del head_pending[position]
+                            break
+                    if not head_pending:
+                        log_index["headSettledAt"] = offset
+
+            record_indexed_http(log_index, to_date_key(parsed_http["ts"]), offset, parsed_http["ts"].isoformat())
+
+    log_index["indexedBytes"] = offset
+
+
+def index_log_chunk(log_path, chunk_start, chunk_end):
+    """Worker do modo --workers: sequencia de dias (dia, fim da ultima linha HTTP, ts) do trecho."""
+    day_runs = []
+    seekable = True
+    offset = chunk_start
+
+    with Path(log_path).open("rb") as handle:
+        handle.seek(chunk_start)
+        for raw_line in handle:
+            if offset >= chunk_end:
+                break
+
+            offset += len(raw_line)
+            parts = [part.strip() for part in raw_line.decode("utf-8", errors="replace").split("\r")]
+            parts = [part for part in parts if part]
+
+            for line in parts:
+                if classify_log_line(line) != LINE_HTTP:
+                    continue
+
+                parsed_http = parse_http_line(line)
+                if parsed_http is None:
+                    continue
+
+                if len(parts) > 1:
+                    seekable = False
+
+                day_key = to_date_key(parsed_http["ts"])
+                if day_runs and day_runs[-1][0] == day_key:
+                    day_runs[-1] = (day_key, offset, parsed_http["ts"].isoformat())
+                else:
+                    day_runs.append((day_key, offset, parsed_http["ts"].isoformat()))
+
+    return day_runs, seekable
+
+
+def extend_log_index_parallel(log_index, handle, log_path: Path, executor):
+    extend_log_index(log_index, handle, settle_only=True)
+
+    complete_offset = find_complete_offset(handle, log_path.stat().st_size)
+    if log_index["indexedBytes"] >= complete_offset:
+        return
+
+    jobs = [
+        executor.submit(index_log_chunk, str(log_path), start, stop)
+        for start, stop in split_byte_range(handle, log_index["indexedBytes"], complete_offset)
+    ]
+    for job in jobs:
+        day_runs, seekable = job.result()
+        if not seekable:
+            log_index["seekable"] = False
+        for day_key, line_end, http_ts in day_runs:
+            record_indexed_http(log_index, day_key, line_end, http_ts)
+
+    log_index["indexedBytes"] = complete_offset
+
+
+def update_log_index(log_path: Path, cache_dir: Path, executor=None):
+    index_path = log_index_file(cache_dir, log_path)
+    log_size = log_path.stat().st_size
+
+    with log_path.open("rb") as handle:
+        log_index = load_log_index(index_path, log_path, handle, log_size) or empty_log_index(log_path)
+        if not log_index["seekable"] or log_index["indexedBytes"] >= log_size:
+            return log_index
+
+        if executor is None:
+            extend_log_index(log_index, handle)
+        else:
+            extend_log_index_parallel(log_index, handle, log_path, executor)
+        log_index["headBytes"] = min(log_index["indexedBytes"], LOG_INDEX_HEAD_BYTES)
+        log_index["headDigest"] = read_head_digest(handle, log_index["headBytes"])
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    write_file_atomic(index_path, json.dumps(log_index, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return log_index
+
+
+def resolve_scan_windows(log_index, missing_days):
+    if not log_index["seekable"] or log_index["headSettledAt"] is None:
+        return [(0, None, None)]
+
+    scan_windows = []
+    for group_start, group_end in group_consecutive_days(missing_days):
+        entries = [
+            log_index["days"][current_day.isoformat()]
+            for current_day in iter_days(group_start, group_end)
+            if current_day.isoformat() in log_index["days"]
+        ]
+        # Dia sem nenhuma linha HTTP no log nao tem o que agregar.
+        if not entries:
+            continue
+
+        stop_offset = entries[-1]["end"]
+        if entries[0]["start"] < log_index["headSettledAt"]:
+            scan_windows.append((0, None, stop_offset))
+            continue
+
+        seed_ts = datetime.fromisoformat(entries[0]["prevTs"]) if entries[0]["prevTs"] else None
+        scan_windows.append((entries[0]["start"], seed_ts, stop_offset))
+
+    return scan_windows
+
+
+def resolve_day_start(log_index, day: date):
+    if not log_index["seekable"] or log_index["headSettledAt"] is None:
+        return 0, None
+
+    day_key = day.isoformat()
+    entry = log_index["days"].get(day_key)
+    if entry is None:
+        if log_index["lastDay"] < day_key:
+            last_http_ts = log_index["lastHttpTs"]
+            return log_index["lastHttpEnd"], datetime.fromisoformat(last_http_ts) if last_http_ts else None
+        return 0, None
+
+    if entry["start"] < log_index["headSettledAt"]:
+        return 0, None
+
+    return entry["start"], datetime.fromisoformat(entry["prevTs"]) if entry["prevTs"] else None
+
+
+def next_clean_http_line(log_map, position, limit):
+    """Primeira linha HTTP inteira (sem '\\r' no meio) que comeca em [position, limit)."""
+    while position < limit:
+        line_end = log_map.find(b"\n", position)
+        line_end = len(log_map) if line_end == -1 else line_end + 1
+        raw_line = log_map[position:line_end].rstrip(b"\r\n")
+        if b"\r" not in raw_line:
+            line = raw_line.decode("utf-8", errors="replace").strip()
+            if line and classify_log_line(line) == LINE_HTTP:
+                parsed_http = parse_http_line(line)
+                if parsed_http is not None:
+                    return position, line_end, parsed_http["ts"]
+        position = line_end
+    return None
+
+
+def bisect_log_time(log_map, low, target_dt):
+    """Busca binaria pelo ponto do log onde os HTTP passam a ter ts >= target_dt.
+
+    Devolve (fim do ultimo HTTP anterior, ts dele, inicio do primeiro HTTP >= target_dt);
+    os dois primeiros sao None quando nao ha HTTP anterior depois de low.
+    """
+    lo, hi = low, len(log_map)
+    previous = (None, None)
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = lo
+        if mid > lo:
+            newline = log_map.find(b"\n", mid - 1, hi)
+            if newline == -1:
+                hi = mid
+                continue
+            line_start = newline + 1
+
+        found = next_clean_http_line(log_map, line_start, hi)
+        if found is None or found[2] >= target_dt:
+            hi = mid
+            continue
+
+        previous = (found[1], found[2])
+        lo = found[1]
+
+    following = next_clean_http_line(log_map, previous[0] or low, len(log_map))
+    return previous[0], previous[1], following[0] if following is not None else None
+
+
+def locate_scan_window(log_path: Path, handle, start_dt: datetime, end_dt: datetime):
+    """Sem indice, acha o trecho do log que cobre o intervalo por busca binaria nos timestamps.
+
+    Supoe o log em ordem cronologica, como o pm2 grava. Devolve uma janela no formato de
+    resolve_scan_windows; (0, None, None) quando nao da para pular nada.
+    """
+    full_scan = (0, None, None)
+    if log_path.suffix == ".gz":
+        return full_scan
+
+    # Eventos de relatorio antes do primeiro HTTP nunca expiram: so pula depois de pareados.
+    # Se nao parearem no primeiro bloco, a varredura completa sai mais barata.
+    handle.seek(0)
+    head_index = empty_log_index(log_path)
+    extend_log_index(head_index, io.BytesIO(handle.read(SCAN_CHUNK_BYTES)), settle_only=True)
+    if head_index["headSettledAt"] is None:
+        return full_scan
+
+    handle.seek(0)
+    try:
+        log_map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return full_scan
+
+    with log_map:
+        start_offset, seed_ts, _ = bisect_log_time(log_map, head_index["indexedBytes"], start_dt)
+        if start_offset is None:
+            start_offset = 0
+        _, _, stop_offset = bisect_log_time(log_map, start_offset, end_dt + timedelta(microseconds=1))
+
+    return start_offset, seed_ts, stop_offset
+
+
+def open_log_file(log_file: Path):
+    if log_file.suffix == ".gz":
+        return gzip.open(log_file, "rb")
+    return log_file.open("rb")
+
+
+def resolve_log_set(raw_log):
+    """Separa --log (arquivo, diretorio ou glob) no log ativo e nos rotacionados.
+
+    O ativo e o arquivo em texto modificado por ultimo; os demais (inclusive .gz do
+    pm2-logrotate) sao tratados como imutaveis.
+    """
+    log_path = Path(raw_log)
+    if log_path.is_dir():
+        candidates = {path for pattern in LOG_SET_PATTERNS for path in log_path.glob(pattern)}
+    elif any(char in raw_log for char in "*?["):
+        candidates = {Path(path) for path in glob.glob(raw_log)}
+    else:
+        return log_path, []
+
+    log_files = sorted(path for path in candidates if path.is_file())
+    plain_files = [path for path in log_files if path.suffix != ".gz"]
+    if not plain_files:
+        return log_path, log_files
+
+    live_log = max(plain_files, key=lambda path: path.stat().st_mtime_ns)
+    return live_log, [path for path in log_files if path != live_log]
+
+
+def log_file_fingerprint(log_file: Path):
+    log_stat = log_file.stat()
+    with log_file.open("rb") as handle:
+        head_digest = read_head_digest(handle, LOG_INDEX_HEAD_BYTES)
+    return f"{log_stat.st_size}-{log_stat.st_mtime_ns}-{head_digest}"
+
+
+def summarize_log_file(log_file: Path):
+    first_ts = None
+    last_ts = None
+
+    with open_log_file(log_file) as handle:
+        for _, _, raw_line in iter_log_lines(handle):
+            line = raw_line.strip()
+            if not line or classify_log_line(line) != LINE_HTTP:
+                continue
+
+            parsed_http = parse_http_line(line)
+            if parsed_http is None:
+                continue
+
+            if first_ts is None or parsed_http["ts"] < first_ts:
+                first_ts = parsed_http["ts"]
+            if last_ts is None or parsed_http["ts"] > last_ts:
+                last_ts = parsed_http["ts"]
+
+    return {
+        "firstTs": first_ts.isoformat() if first_ts else None,
+        "lastTs": last_ts.isoformat() if last_ts else None,
+    }
+
+
+def load_log_file_summaries(cache_dir: Path, log_files):
+    """Primeiro/ultimo timestamp de cada log rotacionado, validados por arquivo."""
+    summaries_path = cache_dir / "_log-files.json"
+    try:
+        payload = json.loads(summaries_path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        payload = {}
+    if int(payload.get("schemaVersion", 0)) != LOG_FILES_SCHEMA_VERSION:
+        payload = {"schemaVersion": LOG_FILES_SCHEMA_VERSION, "files": {}}
+
+    known_files = payload["files"]
+    summaries = {}
+    changed = False
+    for log_file in log_files:
+        file_key = str(log_file.resolve())
+        fingerprint = log_file_fingerprint(log_file)
+        entry = known_files.get(file_key)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            entry = {"fingerprint": fingerprint, **summarize_log_file(log_file)}
+            known_files[file_key] = entry
+            changed = True
+        summaries[log_file] = entry
+
+    if changed:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        write_file_atomic(summaries_path, json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return summaries
+
+
+def resolve_log_span(sources, cache_dir: Path, executor):
+    """Primeiro e ultimo dia com HTTP no conjunto de logs (ativos e rotacionados)."""
+    first_days = []
+    last_days = []
+    for live_log, rotated_logs in sources:
+        log_index = update_log_index(live_log, cache_dir, executor)
+        if log_index["days"]:
+            first_days.append(min(log_index["days"]))
+            last_days.append(log_index["lastDay"])
+        for summary in load_log_file_summaries(cache_dir, rotated_logs).values():
+            if summary["firstTs"]:
+                first_days.append(summary["firstTs"][:10])
+                last_days.append(summary["lastTs"][:10])
+    if not first_days:
+        return date.max, date.min
+    return date.fromisoformat(min(first_days)), date.fromisoformat(max(last_days))
+
+
+def log_covers_day(log_span, day: date):
+    """O log tem o dia inteiro: comeca antes dele e chega ate ele."""
+    return log_span[0] < day <= log_span[1]
+
+
+def collect_log_set_days(log_path: Path, scan_windows, rotated_logs, missing_days, cache_dir: Path, executor, scan_carry=None):
+    """Le os rotacionados que cobrem algum dia pedido e o log ativo como um arquivo so.
+
+    O pareamento de relatorio segue de um arquivo para o outro; os rotacionados entre o
+    primeiro escolhido e o ativo so sao drenados, sem janela.
+    """
+    scope = (
+        datetime.combine(missing_days[0], datetime.min.time()),
+        datetime.combine(missing_days[-1], datetime.max.time()),
+        {current_day.isoformat() for current_day in missing_days},
+    )
+    summaries = load_log_file_summaries(cache_dir, rotated_logs) if rotated_logs else {}
+    dated_logs = sorted(
+        (summary["firstTs"], summary["lastTs"], log_file)
+        for log_file, summary in summaries.items()
+        if summary["firstTs"]
+    )
+
+    file_plan = []
+    for first_ts, last_ts, log_file in dated_logs:
+        first_day = datetime.fromisoformat(first_ts).date()
+        last_day = datetime.fromisoformat(last_ts).date()
+        if any(first_day <= current_day <= last_day for current_day in missing_days):
+            file_plan.append((log_file, None))
+        elif file_plan:
+            file_plan.append((log_file, []))
+
+    daily_stats = {}
+    if not file_plan and not scan_windows:
+        return daily_stats
+
+    scan_state = new_scan_state()
+    for log_file, file_windows in file_plan:
+        scan_log_file(log_file, scan_state, daily_stats, scope, file_windows, executor if log_file.suffix != ".gz" else None)
+    scan_log_file(log_path, scan_state, daily_stats, scope, scan_windows, executor, scan_carry if scan_windows else None)
+    apply_leftover_relatorio(scan_state, daily_stats, scope)
+    return daily_stats
+
+
+def merged_cache_dir(cache_dir: Path, sources):
+    """Cada combinacao de instancias do HUB tem o proprio cache, chaveado pelos logs ativos."""
+    live_logs = sorted(str(live_log.resolve()) for live_log, _ in sources)
+    return cache_dir / f"merged-{source_log_fingerprint(chr(10).join(live_logs))}"
+
+
+def merged_source_label(sources):
+    return " + ".join(str(live_log) for live_log, _ in sources)
+
+
+def iter_source_lines(source_index, log_file: Path, scan_window, scan_state):
+    """Linhas uteis de um log, na ordem do arquivo, com a chave de tempo do merge.
+
+    Relatorio nao tem timestamp proprio e herda o do ultimo HTTP da mesma fonte.
+    """
+    window_start, seed_ts, stop_offset = scan_window
+    last_ts = seed_ts or datetime.min
+    sequence = 0
+    # Tipos das linhas sem timestamp desde o ultimo HTTP: seguem junto com o proximo.
+    line_kinds = new_line_kinds()
+    rejected_sample = REJECTED_SAMPLE["lines"]
+    scanned_to = window_start
+    lines_read = http_rejected = relatorio_rejected = 0
+
+    try:
+        with open_log_file(log_file) as handle:
+            for line_start, line_end, raw_line in iter_log_lines(handle, window_start):
+                # Depois da janela, so segue enquanto a propria fonte tiver eventos pendentes.
+                draining = stop_offset is not None and line_start >= stop_offset
+                if draining and not scan_state["pending"]["size"]:
+                    return
+
+                scanned_to = line_end
+                line = raw_line.strip()
+                if not line:
+                    continue
+
+                lines_read += 1
+                line_kind = classify_log_line(line)
+                if line_kind == LINE_RELATORIO:
+                    relatorio_event = parse_relatorio_line(line)
+                    if relatorio_event is None:
+                        relatorio_rejected += 1
+                        line_kinds[LINE_KIND_UNPARSED] += 1
+                        sample_rejected_line(rejected_sample, LINE_KIND_UNPARSED, line)
+                        continue
+                    line_kinds[LINE_KIND_RELATORIO] += 1
+                    if not draining:
+                        sequence += 1
+                        yield last_ts, source_index, sequence, LINE_RELATORIO, relatorio_event, None
+                    continue
+
+                if line_kind != LINE_HTTP:
+                    other_kind = classify_other_line(line)
+                    line_kinds[other_kind] += 1
+                    if other_kind == LINE_KIND_UNPARSED:
+                        sample_rejected_line(rejected_sample, other_kind, line)
+                    continue
+
+                parsed_http = parse_http_line(line)
+                if parsed_http is None:
+                    http_rejected += 1
+                    rejected_kind = rejected_http_kind(line)
+                    line_kinds[rejected_kind] += 1
+                    sample_rejected_line(rejected_sample, rejected_kind, line)
+                    continue
+
+                last_ts = parsed_http["ts"]
+                sequence += 1
+                yield last_ts, source_index, sequence, LINE_HTTP, parsed_http, line_kinds
+                line_kinds = new_line_kinds()
+    finally:
+        count_scanned_lines((lines_read, scanned_to - window_start, http_rejected, relatorio_rejected))
+
+
+def collect_merged_daily_stats(log_files, start_dt: datetime, end_dt: datetime, wanted_days=None):
+    """Junta os logs de varias instancias do HUB por timestamp (merge k-way com heap).
+
+    Cada arquivo e uma fonte com o proprio pareamento de relatorio/HTTP, e so a proxima
+    linha de cada fonte fica em memoria, qualquer que seja o tamanho dos logs.
+    """
+    daily_stats = {}
+    scope = (start_dt, end_dt, wanted_days)
+    scan_states = []
+    sources = []
+
+    for log_file in log_files:
+        with open_log_file(log_file) as handle:
+            scan_window = locate_scan_window(log_file, handle, start_dt, end_dt)
+        scan_state = {"lastHttpTs": scan_window[1], "pending": new_pending_queue()}
+        sources.append(iter_source_lines(len(scan_states), log_file, scan_window, scan_state))
+        scan_states.append(scan_state)
+
+    for _, source_index, _, line_kind, payload, line_kinds in heapq.merge(*sources):
+        scan_state = scan_states[source_index]
+        pending_queue = scan_state["pending"]
+        if line_kind == LINE_RELATORIO:
+            push_pending_relatorio(pending_queue, {"event": payload, "fallbackTs": scan_state["lastHttpTs"]})
+            continue
+
+        http_ts = payload["ts"]
+        scan_state["lastHttpTs"] = http_ts
+        in_scope = is_day_in_scope(http_ts, *scope)
+        if pending_queue["size"]:
+            pair_pending_relatorio(pending_queue, daily_stats, scope, payload, http_ts, in_scope)
+
+        if not in_scope:
+            continue
+
+        day_stats = get_day_stats(daily_stats, http_ts)
+        day_stats["lineKinds"][LINE_KIND_HTTP] += 1
+        if any(line_kinds):
+            add_line_kinds(day_stats, line_kinds)
+        if not is_relatorio_http_request(payload):
+            update_http_stats(day_stats, payload)
+
+    for scan_state in scan_states:
+        apply_leftover_relatorio(scan_state, daily_stats, scope)
+
+    return daily_stats
+
+
+def collect_merged_sources(sources, missing_days, cache_dir: Path):
+    start_dt = datetime.combine(missing_days[0], datetime.min.time())
+    end_dt = datetime.combine(missing_days[-1], datetime.max.time())
+    rotated_logs = [rotated_log for _, source_rotated in sources for rotated_log in source_rotated]
+    summaries = load_log_file_summaries(cache_dir, rotated_logs)
+
+    # Rotacionados fora do intervalo nao contribuem; os ativos sempre entram (busca binaria).
+    log_files = [
+        log_file
+        for log_file, summary in summaries.items()
+        if summary["firstTs"]
+        and summary["lastTs"] >= start_dt.isoformat()
+        and summary["firstTs"] <= end_dt.isoformat()
+    ]
+    log_files.extend(live_log for live_log, _ in sources)
+
+    return collect_merged_daily_stats(
+        log_files,
+        start_dt,
+        end_dt,
+        wanted_days={current_day.isoformat() for current_day in missing_days},
+    )
+
+
+def scan_missing_days(log_path: Path, missing_days, cache_dir: Path, executor, rotated_logs, sources, scan_carry=None):
+    if sources is not None:
+        return collect_merged_sources(sources, missing_days, cache_dir)
+
+    scan_windows = resolve_scan_windows(update_log_index(log_path, cache_dir, executor), missing_days)
+    return collect_log_set_days(log_path, scan_windows, rotated_logs, missing_days, cache_dir, executor, scan_carry)
+
+
+def ensure_live_logs(sources):
+    for live_log, _ in sources:
+        if not live_log.exists():
+            raise FileNotFoundError(f"Log nao encontrado: {live_log}")
+
+
+def new_profile():
+    return {"phases": {}, "counters": dict(SCAN_COUNTERS), "cacheBytesLoaded": 0}
+
+
+@contextmanager
+def profile_phase(profile, phase):
+    """Soma o tempo de parede do bloco na fase; a mesma fase pode aparecer varias vezes."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile["phases"][phase] = profile["phases"].get(phase, 0.0) + time.perf_counter() - started
+
+
+def finish_profile(profile):
+    """Resumo da coleta para o meta: fases, leitura do log e vazao do parser."""
+    scanned = {key: SCAN_COUNTERS[key] - profile["counters"][key] for key in SCAN_COUNTERS}
+    parse_seconds = profile["phases"].get("scan", 0.0) + profile["phases"].get("tail", 0.0)
+    return {
+        "phases": {phase: round(seconds, 4) for phase, seconds in profile["phases"].items()},
+        "bytesRead": scanned["bytesRead"],
+        "linesRead": scanned["linesRead"],
+        "linesPerSecond": round(scanned["linesRead"] / parse_seconds) if parse_seconds else 0,
+        "rejected": {"http": scanned["httpRejected"], "relatorio": scanned["relatorioRejected"]},
+        "cacheBytesLoaded": profile["cacheBytesLoaded"],
     }
-    cache_file.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
-def collect_with_daily_cache(log_path: Path, start_dt: datetime, end_dt: datetime, cache_dir: Path):
-    log_mtime_ns = log_path.stat().st_mtime_ns
+def format_profile(profile):
+    phases = " | ".join(f"{phase} {seconds:.3f}s" for phase, seconds in profile["phases"].items())
+    return [
+        f"Fases: {phases}",
+        "Log lido: {} linhas / {} bytes ({} linhas/s)".format(
+            profile["linesRead"],
+            profile["bytesRead"],
+            profile["linesPerSecond"],
+        ),
+        f"Linhas rejeitadas: {profile['rejected']['http']} HTTP / {profile['rejected']['relatorio']} relatorio",
+        f"Cache carregado: {profile['cacheBytesLoaded']} bytes",
+    ]
+
+
+def write_profile(profile, output_path: Path):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(profile, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def open_scan_pool(workers):
+    if workers <= 1:
+        return nullcontext()
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def collect_with_daily_cache(
+    log_path: Path,
+    start_dt: datetime,
+    end_dt: datetime,
+    cache_dir: Path,
+    workers=1,
+    rotated_logs=(),
+    extra_sources=(),
+    stats_sections=None,
+):
+    with open_scan_pool(workers) as executor:
+        return collect_with_scan_pool(
+            log_path,
+            start_dt,
+            end_dt,
+            cache_dir,
+            executor,
+            rotated_logs=rotated_logs,
+            extra_sources=extra_sources,
+            stats_sections=stats_sections,
+        )
+
+
+def collect_with_scan_pool(
+    log_path: Path,
+    start_dt: datetime,
+    end_dt: datetime,
+    cache_dir: Path,
+    executor,
+    memory_cache=None,
+    rotated_logs=(),
+    extra_sources=(),
+    stats_sections=None,
+    scan_carry=None,
+):
+    """Agrega o intervalo usando os caches diarios; extra_sources sao outras instancias
+    do HUB, (log ativo, rotacionados), somadas ao log principal por merge de timestamp.
+
+    Com stats_sections, os caches lidos do disco so decodificam essas secoes; dias
+    varridos ou atualizados pelo tail continuam completos. scan_carry e repassado a
+    varredura do log ativo (ver collect_daily_stats).
+    """
+    sources = [(log_path, list(rotated_logs)), *extra_sources] if extra_sources else None
+    if sources is not None:
+        cache_dir = merged_cache_dir(cache_dir, sources)
+        source_label = merged_source_label(sources)
+        log_mtime_ns = max(file_mtime_ns(live_log) or 0 for live_log, _ in sources)
+    else:
+        source_label = log_path
+        log_mtime_ns = log_path.stat().st_mtime_ns
+    log_sources = sources if sources is not None else [(log_path, list(rotated_logs))]
+    # Resumo dos logs so e montado quando aparece um cache de schema antigo.
+    log_span = None
     today = datetime.now().date()
+    profile = new_profile()
     daily_stats = {}
+    rollup_stats = {}
     cache_hits = 0
     cache_misses = 0
+    rollup_hits = 0
     missing_days = []
+    open_days = set()
+    stale_rollups = []
+    tail_bytes = 0
+    wanted_days = []
+
+    for kind, period_start, period_end in plan_rollups(start_dt.date(), end_dt.date(), today):
+        if kind != ROLLUP_DAY:
+            with profile_phase(profile, "cacheRead"):
+                stats = load_rollup(cache_dir, kind, period_start, period_end, memory_cache, profile, stats_sections)
+            if stats is not None:
+                rollup_stats[period_start.isoformat()] = stats
+                cache_hits += (period_end - period_start).days + 1
+                rollup_hits += 1
+                continue
+            stale_rollups.append((kind, period_start, period_end))
+        wanted_days.extend(iter_days(period_start, period_end))
+
+    for current_day in wanted_days:
+        # Sem tail por fonte no modo com varias instancias: hoje e refeito a cada chamada.
+        if sources is not None and current_day == today:
+            open_days.add(current_day)
+            missing_days.append(current_day)
+            continue
 
-    for current_day in iter_days(start_dt.date(), end_dt.date()):
         cache_path = cache_file_for_day(cache_dir, current_day)
-        if should_refresh_cache(cache_path, current_day, today, log_mtime_ns):
+        if current_day != today:
+            cached_stats = memory_cache_get(memory_cache, cache_path)
+            if cached_stats is not None:
+                daily_stats[current_day.isoformat()] = cached_stats
+                cache_hits += 1
+                continue
+
+        with profile_phase(profile, "cacheRead"):
+            cache_mtime_ns = file_mtime_ns(cache_path) if memory_cache is not None else None
+            payload = read_cache_payload(cache_dir, current_day)
+        if payload is not None:
+            profile["cacheBytesLoaded"] += payload["cacheBytes"]
+        if is_outdated_cache(payload):
+            log_span = log_span or resolve_log_span(log_sources, cache_dir, executor)
+            payload = settle_outdated_cache(cache_dir, current_day, payload, log_covers_day(log_span, current_day))
+        if current_day == today or (payload is not None and payload["open"]):
+            open_days.add(current_day)
+            with profile_phase(profile, "tail"), day_cache_lock(cache_dir, current_day):
+                # Outro processo pode ter avancado o tail enquanto esperavamos a trava.
+                payload = read_cache_payload(cache_dir, current_day)
+                # Dia aberto de schema antigo recomeca do log.
+                if is_outdated_cache(payload):
+                    payload = None
+                refreshed = refresh_open_day(log_path, cache_dir, current_day, today, log_mtime_ns, payload, executor)
+            if refreshed is None:
+                missing_days.append(current_day)
+                continue
+
+            daily_stats[current_day.isoformat()], bytes_read, rebuilt = refreshed
+            tail_bytes += bytes_read
+            if rebuilt:
+                cache_misses += 1
+            else:
+                cache_hits += 1
+            continue
+
+        if payload is None:
             missing_days.append(current_day)
             continue
 
-        daily_stats[current_day.isoformat()] = load_cached_day(cache_path)
+        with profile_phase(profile, "deserialize"):
+            daily_stats[current_day.isoformat()] = stats_from_cache_payload(payload, stats_sections)
+        if stats_sections is None:
+            memory_cache_put(memory_cache, cache_path, cache_mtime_ns, daily_stats[current_day.isoformat()])
         cache_hits += 1
 
-    for group_start, group_end in group_consecutive_days(missing_days):
-        generated_days = collect_daily_stats(
-            log_path,
-            datetime.combine(group_start, datetime.min.time()),
-            datetime.combine(group_end, datetime.max.time()),
-        )
+    scan_seconds = 0.0
+    unlocked_day = today if sources is not None else None
+    # Cada dia e refeito por um processo so. Na segunda rodada, quem achou o dia travado
+    # espera o dono terminar e reaproveita o cache que ele gravou.
+    for blocking in (False, True):
+        if not missing_days:
+            break
+        with profile_phase(profile, "lockWait"):
+            day_locks, locked_days, missing_days = lock_missing_days(cache_dir, missing_days, blocking, unlocked_day)
+        try:
+            build_days = []
+            for current_day in locked_days:
+                payload = read_cache_payload(cache_dir, current_day) if current_day in day_locks else None
+                if is_outdated_cache(payload):
+                    log_span = log_span or resolve_log_span(log_sources, cache_dir, executor)
+                    payload = settle_outdated_cache(cache_dir, current_day, payload, log_covers_day(log_span, current_day))
+                if payload is None or payload["open"]:
+                    build_days.append(current_day)
+                    continue
+                profile["cacheBytesLoaded"] += payload["cacheBytes"]
+                with profile_phase(profile, "deserialize"):
+                    daily_stats[current_day.isoformat()] = stats_from_cache_payload(payload, stats_sections)
+                if stats_sections is None:
+                    cache_path = cache_file_for_day(cache_dir, current_day)
+                    memory_cache_put(memory_cache, cache_path, file_mtime_ns(cache_path), daily_stats[current_day.isoformat()])
+                cache_hits += 1
+            if not build_days:
+                continue
 
-        for current_day in iter_days(group_start, group_end):
-            day_key = current_day.isoformat()
-            day_stats = generated_days.get(day_key, empty_stats())
-            daily_stats[day_key] = day_stats
-            write_cached_day(cache_dir, current_day, day_stats, log_path, log_mtime_ns)
-            cache_misses += 1
+            scan_started = time.perf_counter()
+            generated_days = scan_missing_days(log_path, build_days, cache_dir, executor, rotated_logs, sources, scan_carry)
+            scan_seconds += time.perf_counter() - scan_started
+            profile["phases"]["scan"] = scan_seconds
+
+            for current_day in build_days:
+                day_key = current_day.isoformat()
+                day_stats = generated_days.get(day_key, empty_stats())
+                daily_stats[day_key] = day_stats
+                cache_misses += 1
+                if current_day == unlocked_day:
+                    continue
+                with profile_phase(profile, "cacheWrite"):
+                    write_cached_day(cache_dir, current_day, day_stats, source_label, log_mtime_ns)
+                    cache_path = cache_file_for_day(cache_dir, current_day)
+                    memory_cache_put(memory_cache, cache_path, file_mtime_ns(cache_path), day_stats)
+        finally:
+            for handle in day_locks.values():
+                release_file_lock(handle)
+
+    for kind, period_start, period_end in stale_rollups:
+        period_days = list(iter_days(period_start, period_end))
+        # Dia ainda aberto (tail sem selar) fica de fora ate a proxima execucao.
+        if open_days.intersection(period_days):
+            continue
+        if stats_sections is None:
+            member_stats = [daily_stats[current_day.isoformat()] for current_day in period_days]
+        else:
+            # Os dias foram decodificados pela metade: o rollup precisa dos caches inteiros.
+            member_stats = [load_cached_day(cache_dir, current_day) for current_day in period_days]
+            if None in member_stats:
+                continue
+        with profile_phase(profile, "cacheWrite"):
+            write_rollup(cache_dir, kind, period_start, period_end, member_stats, source_label, log_mtime_ns)
 
+    # Rollups entram pela chave do primeiro dia, na mesma ordem cronologica dos dias soltos.
     aggregate_stats = empty_stats()
-    for day_key in sorted(daily_stats):
-        merge_stats(aggregate_stats, daily_stats[day_key])
+    with profile_phase(profile, "merge"):
+        for _, stats in sorted({**daily_stats, **rollup_stats}.items()):
+            merge_stats(aggregate_stats, stats)
 
     return aggregate_stats, {
         "hits": cache_hits,
         "misses": cache_misses,
+        "rollupHits": rollup_hits,
         "cacheDir": str(cache_dir),
+        "sourceLog": str(source_label),
+        "scanSeconds": round(scan_seconds, 3),
+        "tailBytes": tail_bytes,
+        "profile": finish_profile(profile),
     }
 
 
-def write_report(report, output_path: Path, export_name="reportData"):
-    content = f"export const {export_name} = " + json.dumps(report, ensure_ascii=False, indent=2) + ";\n"
-    output_path.write_text(content, encoding="utf-8")
+def collect_range_totals(
+    log_path: Path,
+    start_dt: datetime,
+    end_dt: datetime,
+    cache_dir: Path,
+    executor,
+    memory_cache=None,
+    rotated_logs=(),
+    extra_sources=(),
+):
+    """Totais do intervalo sem o merge completo dos dias.
+
+    Os dias selados saem do indice mensal de totais; so o que ele nao cobre (hoje,
+    ontem ainda aberto, dias sem cache) passa por collect_with_scan_pool.
+    """
+    sources = [(log_path, list(rotated_logs)), *extra_sources] if extra_sources else None
+    day_cache_dir = merged_cache_dir(cache_dir, sources) if sources is not None else cache_dir
+    start_day = start_dt.date()
+    end_day = end_dt.date()
+    closed_end = min(end_day, datetime.now().date() - timedelta(days=1))
+
+    totals_index = refresh_totals_index(day_cache_dir, start_day, closed_end)
+    covered_end = min(end_day, totals_index_end(totals_index))
+    totals = totals_index_range(totals_index, start_day, covered_end) if covered_end >= start_day else empty_totals()
+    meta = {
+        "hits": 0,
+        "misses": 0,
+        "cacheDir": str(day_cache_dir),
+        "sourceLog": merged_source_label(sources) if sources is not None else str(log_path),
+        "indexedDays": max(0, (covered_end - start_day).days + 1),
+    }
+
+    if covered_end < end_day:
+        rest_start = max(start_day, covered_end + timedelta(days=1))
+        stats, cache_meta = collect_with_scan_pool(
+            log_path,
+            datetime.combine(rest_start, datetime.min.time()),
+            end_dt,
+            cache_dir,
+            executor,
+            memory_cache,
+            rotated_logs,
+            extra_sources,
+            stats_sections=TOTALS_STATS_SECTIONS,
+        )
+        combine_totals(totals, totals_from_payload(serialize_stats(stats)))
+        meta["hits"] = cache_meta["hits"]
+        meta["misses"] = cache_meta["misses"]
+        if cache_meta["misses"]:
+            # Os dias que acabaram de ir para o cache ja entram no indice da proxima consulta.
+            refresh_totals_index(day_cache_dir, start_day, closed_end)
+
+    return totals, meta
+
+
+def build_totals_report(totals, start_dt, end_dt, cache_meta):
+    kpis = totals["kpis"]
+    productive = ROUTE_CLASSIFIER["productive"]
+    endpoint_economy = [
+        {
+            "endpoint": endpoint,
+            "frequency": frequency,
+            "economyMin": economy_min,
+            "economyHours": round(economy_min / 60, 2),
+            "timePerCallMin": productive.get(endpoint, 0),
+        }
+        for endpoint, (frequency, economy_min) in totals["endpoints"].items()
+        if frequency > 0
+    ]
+
+    return {
+        "meta": {
+            "from": start_dt.date().isoformat(),
+            "to": end_dt.date().isoformat(),
+            "days": (end_dt.date() - start_dt.date()).days + 1,
+            "generatedAt": datetime.now().isoformat(timespec="seconds"),
+            "sourceLog": cache_meta["sourceLog"],
+            "aggregationMode": "totals-index",
+            "indexedDays": cache_meta["indexedDays"],
+            "cacheHits": cache_meta["hits"],
+            "cacheMisses": cache_meta["misses"],
+            "cacheDir": cache_meta["cacheDir"],
+        },
+        "kpis": {
+            "totalRequests": kpis[KPI_TOTAL_REQUESTS],
+            "productiveActions": kpis[KPI_PRODUCTIVE_ACTIONS],
+            "navigationActions": kpis[KPI_NAVIGATION_ACTIONS],
+            "totalEconomyMin": kpis[KPI_ECONOMY_MIN],
+            "totalEconomyHours": round(kpis[KPI_ECONOMY_MIN] / 60, 2),
+            "pythonLogs": kpis[KPI_PYTHON_LOGS],
+            "bridgeLogs": kpis[KPI_BRIDGE_LOGS],
+        },
+        "statusDistribution": {status: count for status, count in totals["statusDistribution"].items() if count},
+        # Diferenca de acumulados nao guarda a ordem de aparicao: empate vai pelo nome.
+        "endpointEconomy": sorted(endpoint_economy, key=lambda item: (-item["economyHours"], item["endpoint"])),
+        "relatorioSummary": {
+            "totalEvents": totals["relatorioEvents"],
+            "results": {result: count for result, count in totals["relatorioResults"].items() if count},
+            "actions": {action: count for action, count in totals["relatorioActions"].items() if count},
+        },
+    }
+
+
+def report_sidecar_file(output_path: Path, suffix):
+    return output_path.with_name(output_path.name + suffix)
+
+
+def iter_report_chunks(report):
+    """JSON compacto do relatorio em pedacos: primeiro o meta inteiro, depois cada secao."""
+    yield '{"meta":' + REPORT_ENCODER.encode(report["meta"])
+    for section, value in report.items():
+        if section == "meta":
+            continue
+        yield "," + REPORT_ENCODER.encode(section) + ":"
+        yield from REPORT_ENCODER.iterencode(value)
+    yield "}"
+
 
+def write_report_files(report, output_path: Path, browser_output_path: Path, export_name="reportData"):
+    """Grava o modulo TS, o JS do browser e o JS gzipado numa unica serializacao em streaming.
 
-def write_browser_report(report, output_path: Path, global_name="reportData"):
-    content = f"window.{global_name} = " + json.dumps(report, ensure_ascii=False, indent=2) + ";\n"
-    output_path.write_text(content, encoding="utf-8")
+    O hash do conteudo vai para <js>.sha256 (ETag do servidor) e ignora os campos de meta
+    que mudam a cada execucao: se bater com o da ultima escrita, nada e regravado.
+    Retorna (hash, regravado).
+    """
+    gzip_path = report_sidecar_file(browser_output_path, ".gz")
+    hash_path = report_sidecar_file(browser_output_path, ".sha256")
+    output_paths = (output_path, browser_output_path, gzip_path)
+    temp_paths = [temp_file_for(path) for path in output_paths]
+    stable_meta = {key: value for key, value in report["meta"].items() if key not in REPORT_VOLATILE_META}
+    digest = hashlib.sha256(REPORT_ENCODER.encode(stable_meta).encode("utf-8"))
+
+    try:
+        with temp_paths[0].open("wb") as module_handle, temp_paths[1].open("wb") as browser_handle:
+            with gzip.GzipFile(temp_paths[2], "wb", mtime=0) as gzip_handle:
+                module_handle.write(f"export const {export_name} = ".encode("utf-8"))
+                browser_prefix = f"window.{export_name} = ".encode("utf-8")
+                browser_handle.write(browser_prefix)
+                gzip_handle.write(browser_prefix)
+
+                handles = (module_handle, browser_handle, gzip_handle)
+                chunks = iter_report_chunks(report)
+                meta_chunk = next(chunks).encode("utf-8")
+                for handle in handles:
+                    handle.write(meta_chunk)
+                for chunk in chunks:
+                    data = chunk.encode("utf-8")
+                    digest.update(data)
+                    for handle in handles:
+                        handle.write(data)
+                for handle in handles:
+                    handle.write(b";\n")
+
+        content_hash = digest.hexdigest()
+        try:
+            previous_hash = hash_path.read_text(encoding="ascii").strip()
+        except OSError:
+            previous_hash = None
+        if previous_hash == content_hash and all(path.exists() for path in output_paths):
+            return content_hash, False
+
+        for temp_path, path in zip(temp_paths, output_paths):
+            replace_file(temp_path, path)
+        # O hash vai por ultimo: uma troca interrompida no meio forca a regravacao.
+        write_file_atomic(hash_path, content_hash.encode("ascii"))
+        return content_hash, True
+    finally:
+        for temp_path in temp_paths:
+            temp_path.unlink(missing_ok=True)
 
 
 def parse_iso_date(raw_value, field_name):
     try:
         return date.fromisoformat(raw_value)
-    except ValueError as error:
+    # TypeError: no modo --serve o campo pode chegar como numero, lista etc.
+    except (TypeError, ValueError) as error:
         raise ValueError(f"Parametro '{field_name}' invalido. Use YYYY-MM-DD.") from error
 
 
@@ -868,6 +3649,95 @@ def resolve_range(args):
     )
 
 
+def answer_range_request(
+    raw_request,
+    log_path: Path,
+    cache_dir: Path,
+    max_days,
+    executor,
+    memory_cache,
+    rotated_logs=(),
+    extra_sources=(),
+):
+    request_id = None
+    try:
+        request = json.loads(raw_request)
+        request_id = request.get("id")
+        range_args = argparse.Namespace(
+            from_date=request.get("from"),
+            to_date=request.get("to"),
+            as_date=request.get("asDate"),
+            max_days=max_days,
+        )
+        start_dt, end_dt = resolve_range(range_args)
+        sections = parse_report_sections(request.get("sections"))
+    except ValueError as error:
+        return {"id": request_id, "error": str(error), "validation": True}
+    except AttributeError:
+        return {"id": request_id, "error": "Pedido invalido: esperado um objeto JSON.", "validation": True}
+
+    try:
+        if request.get("totals"):
+            totals, cache_meta = collect_range_totals(
+                log_path,
+                start_dt,
+                end_dt,
+                cache_dir,
+                executor,
+                memory_cache,
+                rotated_logs,
+                extra_sources,
+            )
+            return {"id": request_id, "totals": build_totals_report(totals, start_dt, end_dt, cache_meta)}
+
+        stats, cache_meta = collect_with_scan_pool(
+            log_path,
+            start_dt,
+            end_dt,
+            cache_dir,
+            executor,
+            memory_cache,
+            rotated_logs,
+            extra_sources,
+            stats_sections=stats_sections_for(sections),
+        )
+        report = build_report(stats, start_dt, end_dt, log_path, max_days, cache_meta, sections)
+        return {"id": request_id, "report": report}
+    except Exception as error:  # o modo residente nao pode cair por causa de um pedido
+        return {"id": request_id, "error": f"{type(error).__name__}: {error}"}
+
+
+def serve_json_lines(log_path: Path, cache_dir: Path, max_days, workers, memory_entries, rotated_logs=(), extra_sources=()):
+    """Modo residente: le pedidos {"id", "from", "to"} em JSON, um por linha no stdin,
+    e responde uma linha {"id", "report"} ou {"id", "error"} no stdout. Com "totals": true
+    responde {"id", "totals"} so com os totais do intervalo (indice mensal de totais);
+    com "sections": [...] o relatorio traz so essas secoes.
+
+    Os stats decodificados ficam em um LRU em memoria e o dia de hoje e atualizado a
+    cada pedido lendo so os bytes acrescentados ao log.
+    """
+    sys.stdin.reconfigure(encoding="utf-8")
+    sys.stdout.reconfigure(encoding="utf-8")
+    memory_cache = new_memory_cache(memory_entries)
+
+    with open_scan_pool(workers) as executor:
+        for raw_request in sys.stdin:
+            if not raw_request.strip():
+                continue
+            response = answer_range_request(
+                raw_request,
+                log_path,
+                cache_dir,
+                max_days,
+                executor,
+                memory_cache,
+                rotated_logs,
+                extra_sources,
+            )
+            sys.stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+
 def main():
     project_root = Path(__file__).resolve().parents[1]
     default_log_path = Path.home() / ".pm2" / "logs" / "hub-out.log"
@@ -876,7 +3746,13 @@ def main():
     default_cache_dir = project_root / "data" / "hub-insights-daily"
 
     parser = argparse.ArgumentParser(description="Gera o reportData a partir dos logs do HUB.")
-    parser.add_argument("--log", default=str(default_log_path), help="Caminho do arquivo de log")
+    parser.add_argument(
+        "--log",
+        nargs="+",
+        default=[str(default_log_path)],
+        help="Arquivo de log, ou diretorio/glob com os logs rotacionados (.gz inclusive); "
+        "varios valores somam instancias diferentes do HUB",
+    )
     parser.add_argument("--out", default=str(default_out_path), help="Arquivo TS de saida")
     parser.add_argument("--out-browser", default=str(default_browser_out_path), help="Arquivo JS para browser")
     parser.add_argument("--as-date", default=None, help="Data de referencia (YYYY-MM-DD) para gerar o mes anterior")
@@ -885,45 +3761,152 @@ def main():
     parser.add_argument("--cache-dir", default=str(default_cache_dir), help="Diretorio do cache diario")
     parser.add_argument("--max-days", type=int, default=MAX_RANGE_DAYS, help="Intervalo maximo permitido")
     parser.add_argument("--stdout-json", action="store_true", help="Escreve o relatorio em JSON no stdout")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para varrer o log em paralelo (1 = sequencial)")
+    parser.add_argument("--serve", action="store_true", help="Modo residente: atende pedidos JSON por linha no stdin")
+    parser.add_argument(
+        "--memory-entries",
+        type=int,
+        default=SERVE_MEMORY_ENTRIES,
+        help="Dias/rollups mantidos em memoria no modo --serve",
+    )
+    parser.add_argument(
+        "--endpoints",
+        default=None,
+        help=f"JSON com a tabela de endpoints produtivos/navegacao (padrao: ${ENDPOINTS_CONFIG_ENV} ou a tabela embutida)",
+    )
+    parser.add_argument(
+        "--totals",
+        action="store_true",
+        help="Escreve no stdout so os totais do intervalo em JSON (indice mensal de totais, sem o merge dos dias)",
+    )
+    parser.add_argument(
+        "--sections",
+        default=None,
+        help="Secoes do relatorio separadas por virgula (ex.: kpis,relatorioSummary); padrao: todas",
+    )
+    parser.add_argument(
+        "--rejected-sample",
+        default=None,
+        help="Grava uma amostra das linhas rejeitadas (tipo<TAB>linha) neste arquivo; "
+        "so entram linhas lidas nesta execucao, dias ja em cache nao sao relidos",
+    )
+    parser.add_argument(
+        "--rejected-sample-limit",
+        type=int,
+        default=REJECTED_SAMPLE_LIMIT,
+        help="Linhas guardadas por tipo de rejeicao na amostra",
+    )
+    parser.add_argument("--profile", action="store_true", help="Mostra o tempo de cada fase e a vazao da leitura do log")
+    parser.add_argument("--profile-out", default=None, help="Grava o perfil da execucao em JSON neste arquivo")
     args = parser.parse_args()
 
+    if args.workers < 1:
+        parser.error("--workers deve ser pelo menos 1.")
+    if args.rejected_sample_limit < 1:
+        parser.error("--rejected-sample-limit deve ser pelo menos 1.")
+    if args.endpoints:
+        try:
+            install_route_classifier(args.endpoints)
+        except ValueError as error:
+            parser.error(str(error))
+
+    sources = [resolve_log_set(raw_log) for raw_log in args.log]
+    log_path, rotated_logs = sources[0]
+    extra_sources = sources[1:]
+    cache_dir = Path(args.cache_dir)
+    if args.serve:
+        ensure_live_logs(sources)
+        serve_json_lines(
+            log_path,
+            cache_dir,
+            args.max_days,
+            args.workers,
+            args.memory_entries,
+            rotated_logs,
+            extra_sources,
+        )
+        return
+
     try:
         start_dt, end_dt = resolve_range(args)
+        sections = parse_report_sections(args.sections)
     except ValueError as error:
         parser.error(str(error))
+    stats_sections = stats_sections_for(sections)
+
+    ensure_live_logs(sources)
+    if args.rejected_sample:
+        enable_rejected_sample(args.rejected_sample_limit)
+
+    if args.totals:
+        with open_scan_pool(args.workers) as executor:
+            totals, cache_meta = collect_range_totals(
+                log_path,
+                start_dt,
+                end_dt,
+                cache_dir,
+                executor,
+                rotated_logs=rotated_logs,
+                extra_sources=extra_sources,
+            )
+        sys.stdout.write(json.dumps(build_totals_report(totals, start_dt, end_dt, cache_meta), ensure_ascii=False))
+        report_rejected_sample(args.rejected_sample)
+        return
 
-    log_path = Path(args.log)
-    if not log_path.exists():
-        raise FileNotFoundError(f"Log nao encontrado: {log_path}")
-
-    cache_dir = Path(args.cache_dir)
-    stats, cache_meta = collect_with_daily_cache(log_path, start_dt, end_dt, cache_dir)
-    report = build_report(stats, start_dt, end_dt, log_path, args.max_days, cache_meta)
+    stats, cache_meta = collect_with_daily_cache(
+        log_path,
+        start_dt,
+        end_dt,
+        cache_dir,
+        args.workers,
+        rotated_logs,
+        extra_sources,
+        stats_sections,
+    )
+    report_rejected_sample(args.rejected_sample)
+    report = build_report(stats, start_dt, end_dt, log_path, args.max_days, cache_meta, sections)
+    profile = report["meta"]["profile"]
 
     if args.stdout_json:
         sys.stdout.write(json.dumps(report, ensure_ascii=False))
+        if args.profile:
+            sys.stderr.write("\n".join(format_profile(profile)) + "\n")
+        if args.profile_out:
+            write_profile(profile, Path(args.profile_out))
         return
 
+    write_started = time.perf_counter()
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    write_report(report, out_path)
-
     browser_out_path = Path(args.out_browser)
     browser_out_path.parent.mkdir(parents=True, exist_ok=True)
-    write_browser_report(report, browser_out_path)
+    content_hash, rewritten = write_report_files(report, out_path, browser_out_path)
+    # A escrita fica fora do relatorio ja gravado: so aparece no --profile/--profile-out.
+    profile["phases"]["write"] = round(time.perf_counter() - write_started, 4)
 
-    print("OK: relatorio gerado em", out_path)
-    print("OK: relatorio browser gerado em", browser_out_path)
+    if rewritten:
+        print("OK: relatorio gerado em", out_path)
+        print("OK: relatorio browser gerado em", browser_out_path)
+    else:
+        print("OK: relatorio sem mudancas, arquivos mantidos em", out_path, "e", browser_out_path)
+    print(f"Hash do conteudo: {content_hash}")
     print("Periodo: {} ate {}".format(start_dt.strftime(DATE_ONLY_FORMAT), end_dt.strftime(DATE_ONLY_FORMAT)))
     print(f"Cache diario: {cache_meta['hits']} hits / {cache_meta['misses']} misses")
-    print(f"Total requests: {stats['kpis']['totalRequests']}")
-    print(f"Usuarios unicos: {len(stats['kpis']['distinctUsers'])}")
-    print(
-        "Acoes produtivas: {} (economia: {} min)".format(
-            stats["kpis"]["productiveActions"],
-            stats["kpis"]["totalEconomyMin"],
+    if stats_sections is not None and "kpis" not in stats_sections:
+        print("Secoes: " + ", ".join(report["meta"]["sections"]))
+    else:
+        print(f"Total requests: {stats['kpis'][KPI_TOTAL_REQUESTS]}")
+        print(f"Usuarios unicos: {len(stats['distinctUsers'])}")
+        print(
+            "Acoes produtivas: {} (economia: {} min)".format(
+                stats["kpis"][KPI_PRODUCTIVE_ACTIONS],
+                stats["kpis"][KPI_ECONOMY_MIN],
+            )
         )
-    )
+    if args.profile:
+        print("\n".join(format_profile(profile)))
+    if args.profile_out:
+        write_profile(profile, Path(args.profile_out))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,349 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+from generate_report_data import (
+    ENDPOINTS_CONFIG_ENV,
+    LINE_HTTP,
+    LINE_RELATORIO,
+    LOG_INDEX_HEAD_BYTES,
+    classify_log_line,
+    classify_request,
+    ensure_live_logs,
+    find_complete_offset,
+    install_route_classifier,
+    is_relatorio_http_request,
+    iter_log_lines,
+    open_log_file,
+    parse_http_line,
+    parse_relatorio_line,
+    read_head_digest,
+    resolve_log_set,
+)
+
+EVENT_STORE_SCHEMA_VERSION = 2
+INSERT_BATCH_ROWS = 10_000
+QUERY_EVENT_LIMIT = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    head_digest TEXT NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    last_http_ts TEXT
+);
+CREATE TABLE IF NOT EXISTS http_events (
+    ts TEXT NOT NULL,
+    user TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    productive INTEGER NOT NULL,
+    economy_min INTEGER NOT NULL,
+    source_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relatorio_events (
+    ts TEXT,
+    user TEXT NOT NULL,
+    route TEXT NOT NULL,
+    action TEXT NOT NULL,
+    result TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    tickets INTEGER,
+    sync_version INTEGER,
+    source_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS http_events_ts ON http_events (ts);
+CREATE INDEX IF NOT EXISTS http_events_user_ts ON http_events (user, ts);
+CREATE INDEX IF NOT EXISTS http_events_endpoint_ts ON http_events (endpoint, ts);
+CREATE INDEX IF NOT EXISTS http_events_source ON http_events (source_id);
+CREATE INDEX IF NOT EXISTS relatorio_events_ts ON relatorio_events (ts);
+CREATE INDEX IF NOT EXISTS relatorio_events_user_ts ON relatorio_events (user, ts);
+CREATE INDEX IF NOT EXISTS relatorio_events_source ON relatorio_events (source_id);
+"""
+
+
+def open_event_store(db_path: Path, classifier):
+    """Abre (ou cria) o banco de eventos; com outra tabela de endpoints, os eventos sao refeitos."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+
+    stored = dict(connection.execute("SELECT key, value FROM store_meta"))
+    expected = {
+        "schemaVersion": str(EVENT_STORE_SCHEMA_VERSION),
+        "endpointTable": classifier["digest"] or "",
+    }
+    if stored != expected:
+        with connection:
+            # Endpoint/produtivo sao gravados ja classificados: outra tabela invalida tudo.
+            connection.execute("DELETE FROM http_events")
+            connection.execute("DELETE FROM relatorio_events")
+            connection.execute("DELETE FROM sources")
+            connection.execute("DELETE FROM store_meta")
+            connection.executemany("INSERT INTO store_meta (key, value) VALUES (?, ?)", expected.items())
+    return connection
+
+
+def http_event_row(parsed_http, classifier, source_id):
+    """Mesmas regras de update_http_stats: acao produtiva e economia so contam para usuario logado."""
+    productive_key, _ = classify_request(parsed_http["method"], parsed_http["path"])
+    user = parsed_http["user"].strip().lower() or "guest"
+    productive = productive_key is not None and user != "guest"
+    return (
+        parsed_http["ts"].isoformat(),
+        user,
+        parsed_http["method"],
+        parsed_http["path"],
+        productive_key or f"{parsed_http['method']} {parsed_http['path']}",
+        parsed_http["status"],
+        int(productive),
+        classifier["productive"].get(productive_key, 0) if productive else 0,
+        source_id,
+    )
+
+
+def relatorio_event_row(relatorio_event, event_ts, source_id):
+    # Usuario em branco fica em branco, como no relatorio; "guest" e trafego HTTP anonimo.
+    return (
+        event_ts.isoformat() if event_ts is not None else None,
+        relatorio_event["user"],
+        relatorio_event["route"],
+        relatorio_event["action"],
+        relatorio_event["result"],
+        relatorio_event["ticketId"],
+        relatorio_event["tickets"],
+        relatorio_event["syncVersion"],
+        source_id,
+    )
+
+
+def flush_rows(connection, http_rows, relatorio_rows):
+    connection.executemany("INSERT INTO http_events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", http_rows)
+    connection.executemany("INSERT INTO relatorio_events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", relatorio_rows)
+    http_rows.clear()
+    relatorio_rows.clear()
+
+
+def ingest_log_file(connection, classifier, log_file: Path):
+    """Grava os eventos novos de um log; retorna (linhas HTTP, eventos de relatorio) inseridos.
+
+    Cada arquivo guarda o offset ja ingerido e e retomado dali. Se o inicio do arquivo mudou
+    (truncado ou recriado), os eventos dele sao apagados e a ingestao recomeca do zero.
+    Relatorio nao tem timestamp proprio e fica com o do ultimo HTTP, como o fallback do relatorio.
+    """
+    file_key = str(log_file.resolve())
+    with open_log_file(log_file) as handle:
+        # Rotacionados .gz sao imutaveis e lidos ate o fim; o ativo para na ultima linha completa.
+        stop_offset = None if log_file.suffix == ".gz" else find_complete_offset(handle, log_file.stat().st_size)
+
+        with connection:
+            source = connection.execute(
+                "SELECT id, head_digest, byte_offset, last_http_ts FROM sources WHERE path = ?",
+                (file_key,),
+            ).fetchone()
+            if source is None:
+                source_id = connection.execute(
+                    "INSERT INTO sources (path, head_digest, byte_offset) VALUES (?, '', 0)",
+                    (file_key,),
+                ).lastrowid
+                start_offset, last_http_ts = 0, None
+            else:
+                source_id, stored_digest, start_offset, stored_ts = source
+                last_http_ts = datetime.fromisoformat(stored_ts) if stored_ts else None
+                # O digest cobre so o trecho ja ingerido do inicio, que nao muda com appends.
+                head_digest = read_head_digest(handle, min(start_offset, LOG_INDEX_HEAD_BYTES))
+                if stored_digest != head_digest or (stop_offset is not None and stop_offset < start_offset):
+                    connection.execute("DELETE FROM http_events WHERE source_id = ?", (source_id,))
+                    connection.execute("DELETE FROM relatorio_events WHERE source_id = ?", (source_id,))
+                    start_offset, last_http_ts = 0, None
+
+            http_rows = []
+            relatorio_rows = []
+            http_total = 0
+            relatorio_total = 0
+            position = start_offset
+            for line_start, line_end, raw_line in iter_log_lines(handle, start_offset):
+                if stop_offset is not None and line_start >= stop_offset:
+                    break
+                position = line_end
+
+                line = raw_line.strip()
+                if not line:
+                    continue
+
+                line_kind = classify_log_line(line)
+                if line_kind == LINE_RELATORIO:
+                    relatorio_event = parse_relatorio_line(line)
+                    if relatorio_event is not None:
+                        relatorio_rows.append(relatorio_event_row(relatorio_event, last_http_ts, source_id))
+                        relatorio_total += 1
+                    continue
+
+                if line_kind != LINE_HTTP:
+                    continue
+
+                parsed_http = parse_http_line(line)
+                if parsed_http is None:
+                    continue
+
+                last_http_ts = parsed_http["ts"]
+                # Requisicoes do proprio relatorio ficam fora dos totais, como em collect_daily_stats.
+                if is_relatorio_http_request(parsed_http):
+                    continue
+                http_rows.append(http_event_row(parsed_http, classifier, source_id))
+                http_total += 1
+                if len(http_rows) >= INSERT_BATCH_ROWS:
+                    flush_rows(connection, http_rows, relatorio_rows)
+
+            flush_rows(connection, http_rows, relatorio_rows)
+            head_digest = read_head_digest(handle, min(position, LOG_INDEX_HEAD_BYTES))
+            connection.execute(
+                "UPDATE sources SET head_digest = ?, byte_offset = ?, last_http_ts = ? WHERE id = ?",
+                (head_digest, position, last_http_ts.isoformat() if last_http_ts else None, source_id),
+            )
+
+    return http_total, relatorio_total
+
+
+def day_bounds(start_day: date, end_day: date):
+    return (
+        datetime.combine(start_day, datetime.min.time()).isoformat(),
+        datetime.combine(end_day, datetime.max.time().replace(microsecond=0)).isoformat(),
+    )
+
+
+def query_events(connection, start_day: date, end_day: date, user=None, endpoint=None, limit=QUERY_EVENT_LIMIT):
+    """Drill-down por usuario e/ou endpoint no intervalo, sempre por um dos indices (campo, ts)."""
+    start_ts, end_ts = day_bounds(start_day, end_day)
+    conditions = ["ts BETWEEN ? AND ?"]
+    params = [start_ts, end_ts]
+    if user:
+        conditions.insert(0, "user = ?")
+        params.insert(0, user.strip().lower())
+    if endpoint:
+        conditions.insert(0, "endpoint = ?")
+        params.insert(0, endpoint)
+    where = " AND ".join(conditions)
+
+    def rows(sql, extra=()):
+        return connection.execute(sql.format(where=where), (*params, *extra)).fetchall()
+
+    totals = rows("SELECT COUNT(*), COALESCE(SUM(productive), 0), COALESCE(SUM(economy_min), 0) FROM http_events WHERE {where}")[0]
+    result = {
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "user": user,
+        "endpoint": endpoint,
+        "totalRequests": totals[0],
+        "productiveActions": totals[1],
+        "economyMin": totals[2],
+        "dailyActivity": [
+            {"date": day, "requests": count}
+            for day, count in rows("SELECT substr(ts, 1, 10) AS day, COUNT(*) FROM http_events WHERE {where} GROUP BY day ORDER BY day")
+        ],
+        "statusDistribution": dict(
+            (str(status), count) for status, count in rows("SELECT status, COUNT(*) FROM http_events WHERE {where} GROUP BY status")
+        ),
+    }
+    if not endpoint:
+        result["topEndpoints"] = [
+            {"endpoint": name, "requests": count}
+            for name, count in rows(
+                "SELECT endpoint, COUNT(*) AS total FROM http_events WHERE {where} GROUP BY endpoint ORDER BY total DESC LIMIT 10"
+            )
+        ]
+    if not user:
+        result["topUsers"] = [
+            {"user": name, "requests": count}
+            for name, count in rows(
+                "SELECT user, COUNT(*) AS total FROM http_events WHERE {where} GROUP BY user ORDER BY total DESC LIMIT 10"
+            )
+        ]
+    if not endpoint:
+        # Relatorio nao tem endpoint: so entra no drill-down por usuario/intervalo.
+        result["relatorioActions"] = dict(rows("SELECT action, COUNT(*) FROM relatorio_events WHERE {where} GROUP BY action"))
+    result["events"] = [
+        {"ts": ts, "user": event_user, "method": method, "path": path, "status": status}
+        for ts, event_user, method, path, status in rows(
+            "SELECT ts, user, method, path, status FROM http_events WHERE {where} ORDER BY ts DESC LIMIT ?",
+            (limit,),
+        )
+    ]
+    return result
+
+
+def parse_iso_date(raw_value, field_name):
+    try:
+        return date.fromisoformat(raw_value)
+    except ValueError as error:
+        raise ValueError(f"Parametro '{field_name}' invalido. Use YYYY-MM-DD.") from error
+
+
+def main():
+    project_root = Path(__file__).resolve().parents[1]
+    parser = argparse.ArgumentParser(description="Banco SQLite de eventos do HUB para consultas por usuario/endpoint.")
+    parser.add_argument("command", choices=("ingest", "query"), help="ingest grava os eventos novos; query consulta")
+    parser.add_argument("--db", default=str(project_root / "data" / "hub-events.sqlite3"), help="Arquivo SQLite")
+    parser.add_argument(
+        "--log",
+        nargs="+",
+        default=[str(Path.home() / ".pm2" / "logs" / "hub-out.log")],
+        help="Arquivo de log, ou diretorio/glob com os logs rotacionados (.gz inclusive)",
+    )
+    parser.add_argument(
+        "--endpoints",
+        default=None,
+        help=f"JSON com a tabela de endpoints produtivos/navegacao (padrao: ${ENDPOINTS_CONFIG_ENV} ou a tabela embutida)",
+    )
+    parser.add_argument("--from", dest="from_date", default=None, help="Data inicial da consulta (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", default=None, help="Data final da consulta (YYYY-MM-DD)")
+    parser.add_argument("--user", default=None, help="Filtra a consulta por usuario")
+    parser.add_argument("--endpoint", default=None, help="Filtra a consulta por endpoint (chave produtiva ou 'METODO /path')")
+    parser.add_argument("--limit", type=int, default=QUERY_EVENT_LIMIT, help="Eventos mais recentes na resposta")
+    args = parser.parse_args()
+
+    try:
+        classifier = install_route_classifier(args.endpoints or os.environ.get(ENDPOINTS_CONFIG_ENV))
+        if args.command == "query":
+            today = datetime.now().date()
+            start_day = parse_iso_date(args.from_date, "from") if args.from_date else today
+            end_day = parse_iso_date(args.to_date, "to") if args.to_date else today
+            if start_day > end_day:
+                raise ValueError("A data inicial nao pode ser maior que a final.")
+    except ValueError as error:
+        parser.error(str(error))
+
+    connection = open_event_store(Path(args.db), classifier)
+    try:
+        if args.command == "query":
+            started = time.perf_counter()
+            result = query_events(connection, start_day, end_day, args.user, args.endpoint, args.limit)
+            result["queryMs"] = round((time.perf_counter() - started) * 1000, 2)
+            sys.stdout.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+            return
+
+        sources = [resolve_log_set(raw_log) for raw_log in args.log]
+        ensure_live_logs(sources)
+        started = time.perf_counter()
+        for live_log, rotated_logs in sources:
+            for log_file in [*rotated_logs, live_log]:
+                http_total, relatorio_total = ingest_log_file(connection, classifier, log_file)
+                print(f"{log_file}: +{http_total} HTTP, +{relatorio_total} relatorio")
+        print(f"Ingestao concluida em {time.perf_counter() - started:.1f}s.")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
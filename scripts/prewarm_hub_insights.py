@@ -1,13 +1,50 @@
 import argparse
+import ctypes
+import os
+import select
+import struct
+import sys
+import time
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
 from generate_report_data import (
     MAX_RANGE_DAYS,
+    ENDPOINTS_CONFIG_ENV,
     build_report,
     collect_with_daily_cache,
+    collect_with_scan_pool,
+    ensure_live_logs,
+    format_profile,
+    group_consecutive_days,
+    install_route_classifier,
+    is_outdated_cache,
+    iter_days,
+    load_log_file_summaries,
+    merged_cache_dir,
+    merged_source_label,
+    open_scan_pool,
+    read_cache_payload,
+    resolve_log_set,
+    seal_open_day,
+    update_log_index,
+    write_profile,
 )
 
+BACKFILL_BATCH_DAYS = 7
+WATCH_POLL_SECONDS = 2.0
+WATCH_IDLE_SECONDS = 60.0
+WATCH_SEAL_GRACE_SECONDS = 300
+
+# inotify(7): eventos do diretorio do log que indicam append, rotacao ou truncamento.
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+INOTIFY_EVENT = struct.Struct("iIII")
+
 
 def format_iso_day(value: date):
     return value.isoformat()
@@ -41,7 +78,8 @@ def resolve_range(args):
         raise ValueError("Nao e permitido solicitar datas futuras.")
 
     total_days = (end_day - start_day).days + 1
-    if total_days > MAX_RANGE_DAYS:
+    # O backfill so grava os caches diarios; o limite vale para o relatorio.
+    if total_days > MAX_RANGE_DAYS and not args.backfill:
         raise ValueError(f"O intervalo maximo permitido e de {MAX_RANGE_DAYS} dias.")
 
     return (
@@ -64,32 +102,335 @@ def resolve_default_log_path():
     return candidates[0]
 
 
+def backfill_split_day(log_index):
+    """Primeiro dia que pode ser quebrado em lotes.
+
+    So a varredura do log ativo indexado continua o pareamento de um lote no seguinte;
+    dias dos rotacionados ou de varias instancias ficam num lote so por trecho.
+    """
+    if not log_index["seekable"] or log_index["headSettledAt"] is None or not log_index["days"]:
+        return None
+    return date.fromisoformat(min(log_index["days"]))
+
+
+def plan_backfill_batches(day_cache_dir: Path, start_day: date, end_day: date, batch_days, split_from=None):
+    """Lotes de dias consecutivos ainda sem cache selado no schema atual.
+
+    Dias ja gravados ficam de fora, entao rodar de novo retoma de onde parou. So os dias
+    a partir de split_from sao quebrados em lotes de batch_days.
+    """
+    missing_days = []
+    for current_day in iter_days(start_day, end_day):
+        payload = read_cache_payload(day_cache_dir, current_day)
+        if payload is None or payload["open"] or is_outdated_cache(payload):
+            missing_days.append(current_day)
+
+    batches = []
+    for group_start, group_end in group_consecutive_days(missing_days):
+        if split_from is None or group_end < split_from:
+            batches.append((group_start, group_end))
+            continue
+        batch_start = group_start
+        if group_start < split_from:
+            batches.append((group_start, split_from - timedelta(days=1)))
+            batch_start = split_from
+        while batch_start <= group_end:
+            batch_end = min(group_end, batch_start + timedelta(days=batch_days - 1))
+            batches.append((batch_start, batch_end))
+            batch_start = batch_end + timedelta(days=1)
+    return batches
+
+
+def backfill_batch(sources, cache_dir: Path, first_day: date, last_day: date, executor, scan_carry):
+    """Aquece um lote e grava o cache de cada dia dele.
+
+    scan_carry leva os eventos de relatorio ainda sem HTTP ao lote seguinte; sem ele, o
+    evento do fim de um lote pareado com um HTTP do proximo se perdia.
+    """
+    log_path, rotated_logs = sources[0]
+    started = time.perf_counter()
+    _, cache_meta = collect_with_scan_pool(
+        log_path,
+        datetime.combine(first_day, datetime.min.time()),
+        datetime.combine(last_day, datetime.max.time()),
+        cache_dir,
+        executor,
+        rotated_logs=rotated_logs,
+        extra_sources=sources[1:],
+        scan_carry=scan_carry,
+    )
+    profile = cache_meta["profile"]
+    return profile["linesRead"], profile["bytesRead"], time.perf_counter() - started
+
+
+def run_backfill(sources, cache_dir: Path, start_day: date, end_day: date, workers, batch_days):
+    day_cache_dir = merged_cache_dir(cache_dir, sources) if len(sources) > 1 else cache_dir
+    # Os lotes rodam em ordem, cada um continuando o pareamento do anterior; os processos
+    # dividem a varredura de cada lote em trechos.
+    with open_scan_pool(workers) as executor:
+        # Indice do log ativo e resumo dos rotacionados saem uma vez aqui; os lotes so leem.
+        load_log_file_summaries(day_cache_dir, [rotated_log for _, rotated_logs in sources for rotated_log in rotated_logs])
+        split_from = None
+        if len(sources) == 1:
+            split_from = backfill_split_day(update_log_index(sources[0][0], cache_dir, executor))
+
+        batches = plan_backfill_batches(day_cache_dir, start_day, end_day, batch_days, split_from)
+        total_days = sum((last_day - first_day).days + 1 for first_day, last_day in batches)
+        print(
+            f"Backfill de {format_iso_day(start_day)} ate {format_iso_day(end_day)}: "
+            f"{total_days} dia(s) em {len(batches)} lote(s), "
+            f"{(end_day - start_day).days + 1 - total_days} ja no cache."
+        )
+        if not batches:
+            return
+
+        started = time.perf_counter()
+        done_days = 0
+        lines_read = 0
+        bytes_read = 0
+        scan_carry = {}
+        try:
+            for first_day, last_day in batches:
+                batch_lines, batch_bytes, batch_seconds = backfill_batch(
+                    sources, cache_dir, first_day, last_day, executor, scan_carry
+                )
+                done_days += (last_day - first_day).days + 1
+                lines_read += batch_lines
+                bytes_read += batch_bytes
+                elapsed = time.perf_counter() - started
+                print(
+                    f"[{done_days}/{total_days}] {format_iso_day(first_day)} ate {format_iso_day(last_day)} "
+                    f"em {batch_seconds:.1f}s | {lines_read / elapsed:,.0f} linhas/s | "
+                    f"{bytes_read / elapsed / (1024 * 1024):.1f} MB/s | {done_days / elapsed * 3600:.0f} dias/h",
+                    flush=True,
+                )
+        except KeyboardInterrupt:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise SystemExit(f"Interrompido com {done_days}/{total_days} dia(s) gravados; rode de novo para continuar.")
+
+    print(f"Backfill concluido: {done_days} dia(s), {lines_read} linhas em {time.perf_counter() - started:.1f}s.")
+
+
+def open_inotify(directories):
+    """inotify pela libc; None quando nao existe (Windows, macOS) e o watch cai no polling."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if inotify_fd < 0:
+        return None
+
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    for directory in directories:
+        if libc.inotify_add_watch(inotify_fd, os.fsencode(str(directory)), mask) < 0:
+            os.close(inotify_fd)
+            return None
+    return inotify_fd
+
+
+def read_inotify_names(inotify_fd):
+    names = set()
+    while True:
+        try:
+            data = os.read(inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(data):
+            _, _, _, name_size = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            names.add(data[offset:offset + name_size].rstrip(b"\0"))
+            offset += name_size
+
+
+def snapshot_logs(live_logs):
+    snapshot = {}
+    for live_log in live_logs:
+        try:
+            log_stat = live_log.stat()
+        except OSError:
+            snapshot[live_log] = None
+            continue
+        snapshot[live_log] = (log_stat.st_ino, log_stat.st_size, log_stat.st_mtime_ns)
+    return snapshot
+
+
+def open_log_watcher(live_logs):
+    return {
+        "fd": open_inotify({live_log.resolve().parent for live_log in live_logs}),
+        "names": {os.fsencode(live_log.name) for live_log in live_logs},
+        "logs": list(live_logs),
+        "snapshot": snapshot_logs(live_logs),
+    }
+
+
+def wait_for_log_change(watcher, timeout, poll_seconds):
+    """Espera um append/rotacao nos logs observados; False quando o timeout vence antes."""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+
+        if watcher["fd"] is not None:
+            ready, _, _ = select.select([watcher["fd"]], [], [], remaining)
+            if ready and read_inotify_names(watcher["fd"]) & watcher["names"]:
+                return True
+            continue
+
+        time.sleep(min(poll_seconds, remaining))
+        snapshot = snapshot_logs(watcher["logs"])
+        if snapshot != watcher["snapshot"]:
+            watcher["snapshot"] = snapshot
+            return True
+
+
+def warm_watched_days(sources, cache_dir: Path, first_day: date, now: datetime):
+    """Incorpora as linhas novas aos dias abertos e sela os anteriores a hoje.
+
+    Retorna o primeiro dia que continua aberto, de onde parte a proxima rodada.
+    """
+    today = now.date()
+    log_path, rotated_logs = sources[0]
+    started = time.perf_counter()
+    _, cache_meta = collect_with_daily_cache(
+        log_path,
+        datetime.combine(first_day, datetime.min.time()),
+        datetime.combine(today, datetime.max.time()),
+        cache_dir,
+        rotated_logs=rotated_logs,
+        extra_sources=sources[1:],
+    )
+    if cache_meta["tailBytes"] or cache_meta["misses"]:
+        print(
+            f"[{now:%H:%M:%S}] {format_iso_day(first_day)} ate {format_iso_day(today)}: "
+            f"+{cache_meta['tailBytes']} bytes, {cache_meta['profile']['linesRead']} linhas "
+            f"em {time.perf_counter() - started:.2f}s",
+            flush=True,
+        )
+
+    # O tail sela o dia quando o log passa da meia-noite; sem trafego, sela apos a tolerancia.
+    day_cache_dir = Path(cache_meta["cacheDir"])
+    for current_day in iter_days(first_day, today - timedelta(days=1)):
+        payload = read_cache_payload(day_cache_dir, current_day)
+        if payload is None or not payload["open"]:
+            continue
+        day_end = datetime.combine(current_day + timedelta(days=1), datetime.min.time())
+        if (now - day_end).total_seconds() < WATCH_SEAL_GRACE_SECONDS:
+            return current_day
+        if seal_open_day(day_cache_dir, current_day):
+            print(f"[{now:%H:%M:%S}] {format_iso_day(current_day)} selado.", flush=True)
+    return today
+
+
+def run_watch(raw_logs, cache_dir: Path, poll_seconds):
+    sources = [resolve_log_set(raw_log) for raw_log in raw_logs]
+    watcher = open_log_watcher([live_log for live_log, _ in sources])
+    mode = "inotify" if watcher["fd"] is not None else f"polling a cada {poll_seconds:g}s"
+    print(f"Observando {merged_source_label(sources)} via {mode}. Ctrl+C para sair.", flush=True)
+
+    # Ontem entra na primeira rodada: um watch anterior pode ter parado com o dia aberto.
+    first_day = datetime.now().date() - timedelta(days=1)
+    try:
+        while True:
+            # Rotacao cria arquivos novos no conjunto; a lista e refeita a cada rodada.
+            sources = [resolve_log_set(raw_log) for raw_log in raw_logs]
+            first_day = warm_watched_days(sources, cache_dir, first_day, datetime.now())
+            if wait_for_log_change(watcher, WATCH_IDLE_SECONDS, poll_seconds):
+                # Junta a rajada de appends numa rodada so.
+                time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("Watch encerrado.")
+    finally:
+        if watcher["fd"] is not None:
+            os.close(watcher["fd"])
+
+
 def main():
     project_root = Path(__file__).resolve().parents[1]
     parser = argparse.ArgumentParser(description="Aquece o cache diario de insights do HUB.")
-    parser.add_argument("--log", default=str(resolve_default_log_path()), help="Caminho do arquivo de log")
+    parser.add_argument(
+        "--log",
+        nargs="+",
+        default=[str(resolve_default_log_path())],
+        help="Arquivo de log, ou diretorio/glob com os logs rotacionados (.gz inclusive); "
+        "varios valores somam instancias diferentes do HUB",
+    )
     parser.add_argument("--cache-dir", default=str(project_root / "data" / "hub-insights-daily"), help="Diretorio do cache diario")
     parser.add_argument("--days", type=int, default=1, help="Quantidade de dias retroativos para aquecer")
     parser.add_argument("--from", dest="from_date", default=None, help="Data inicial (YYYY-MM-DD)")
     parser.add_argument("--to", dest="to_date", default=None, help="Data final (YYYY-MM-DD)")
+    parser.add_argument(
+        "--endpoints",
+        default=None,
+        help=f"JSON com a tabela de endpoints produtivos/navegacao (padrao: ${ENDPOINTS_CONFIG_ENV} ou a tabela embutida)",
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Aquece um historico longo em lotes, retomando dos dias que ja estao no cache",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos do --backfill")
+    parser.add_argument("--batch-days", type=int, default=BACKFILL_BATCH_DAYS, help="Dias por lote do --backfill")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Fica rodando e incorpora as linhas novas do log ao cache de hoje (inotify ou polling)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=WATCH_POLL_SECONDS,
+        help="Segundos entre verificacoes do --watch sem inotify e para agrupar appends",
+    )
+    parser.add_argument("--profile", action="store_true", help="Mostra o tempo de cada fase e a vazao da leitura do log")
+    parser.add_argument("--profile-out", default=None, help="Grava o perfil da execucao em JSON neste arquivo")
     args = parser.parse_args()
 
     try:
         start_dt, end_dt = resolve_range(args)
+        if args.endpoints:
+            install_route_classifier(args.endpoints)
     except ValueError as error:
         parser.error(str(error))
+    if args.workers < 1 or args.batch_days < 1:
+        parser.error("--workers e --batch-days devem ser pelo menos 1.")
+    if args.interval <= 0:
+        parser.error("--interval deve ser maior que zero.")
 
-    log_path = Path(args.log)
-    if not log_path.exists():
-        raise FileNotFoundError(f"Log nao encontrado: {log_path}")
+    sources = [resolve_log_set(raw_log) for raw_log in args.log]
+    ensure_live_logs(sources)
+    log_path, rotated_logs = sources[0]
 
     cache_dir = Path(args.cache_dir)
-    stats, cache_meta = collect_with_daily_cache(log_path, start_dt, end_dt, cache_dir)
+    if args.watch:
+        run_watch(args.log, cache_dir, args.interval)
+        return
+    if args.backfill:
+        run_backfill(sources, cache_dir, start_dt.date(), end_dt.date(), args.workers, args.batch_days)
+        return
+
+    stats, cache_meta = collect_with_daily_cache(
+        log_path,
+        start_dt,
+        end_dt,
+        cache_dir,
+        rotated_logs=rotated_logs,
+        extra_sources=sources[1:],
+    )
     report = build_report(stats, start_dt, end_dt, log_path, MAX_RANGE_DAYS, cache_meta)
 
     print(f"Cache HUB aquecido para {format_iso_day(start_dt.date())} ate {format_iso_day(end_dt.date())}.")
     print(f"Cache diario: {cache_meta['hits']} hit(s) / {cache_meta['misses']} miss(es).")
     print(f"Total requests no intervalo: {report['kpis']['totalRequests']}.")
+    if args.profile:
+        print("\n".join(format_profile(report["meta"]["profile"])))
+    if args.profile_out:
+        write_profile(report["meta"]["profile"], Path(args.profile_out))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import generate_report_data as report  # noqa: E402
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+USERS = ["ana@x.com", "bob@x.com", "guest", "carl@x.com", "Dee@X.com", ""]
+PATHS = [
+    ("POST", "/api/mkt"),
+    ("POST", "/api/mkt/gerawiki"),
+    ("POST", "/api/bkpMkt"),
+    ("POST", "/api/comandos-mkt/run/abc"),
+    ("POST", "/api/4g/run"),
+    ("GET", "/home"),
+    ("GET", "/js/home.js"),
+    ("GET", "/tabela/ips"),
+    ("GET", "/api/other"),
+    ("GET", "/login?next=/"),
+    ("GET", "/api/relatorio/tickets"),
+    ("POST", "/api/relatorio/tickets"),
+    ("PUT", "/api/relatorio/tickets/7"),
+    ("DELETE", "/api/relatorio/tickets/8"),
+]
+RELATORIO_ROUTES = [
+    ("POST /tickets", "create"),
+    ("PUT /tickets/:id", "update"),
+    ("DELETE /tickets/:id", "delete"),
+    ("GET /tickets", "list"),
+]
+FIRST_LOG_DAY = date(2025, 3, 1)
+
+
+def format_log_ts(ts):
+    return f"{ts.day:02d}/{MONTHS[ts.month - 1]}/{ts.year} {ts:%H:%M:%S}"
+
+
+def http_line(ts, method, path, user, status=200):
+    user_field = f" user={user}" if user else ""
+    return f'172.19.5.9 - - [{format_log_ts(ts)}] "{method} {path} HTTP/1.1" {status} 120 -{user_field} user-agent=Mozilla/5.0 (X)\n'
+
+
+def write_hub_log(log_path: Path, first_day=FIRST_LOG_DAY, days=12, per_day=400, seed=7):
+    """Log sintetico no formato do pm2: HTTP, relatorio, Python e linhas soltas.
+
+    Todo dia fecha com eventos de relatorio antes da meia-noite cujo HTTP so chega no
+    dia seguinte: um com um HTTP que nao pareia no meio e outro depois do ultimo HTTP.
+    Depois do ultimo HTTP vem tambem um evento que nunca pareia.
+    """
+    rnd = random.Random(seed)
+    lines = []
+    for day_index in range(days):
+        day_start = datetime.combine(first_day + timedelta(days=day_index), datetime.min.time())
+        ts = day_start + timedelta(seconds=30)
+        step = 86000 / per_day
+        while True:
+            ts += timedelta(seconds=rnd.expovariate(1 / step))
+            if ts >= day_start + timedelta(seconds=86300):
+                break
+            roll = rnd.random()
+            user = rnd.choice(USERS)
+            if roll < 0.06:
+                route, action = rnd.choice(RELATORIO_ROUTES)
+                user_field = f" user={user.lower()}" if user and user != "guest" else ""
+                result = rnd.choice(["OK", "OK", "ERROR"])
+                lines.append(f"[relatorio][{route}][{result}] action={action}{user_field} ticketId={rnd.randint(1, 9)}\n")
+            elif roll < 0.09:
+                lines.append(f"[Python LOG] saida {rnd.random()}\n")
+            elif roll < 0.10:
+                lines.append(f"[OK] Rebootado 4g: unidade{rnd.randint(1, 5)}\n")
+            elif roll < 0.105:
+                lines.append("\n")
+            else:
+                method, path = rnd.choice(PATHS)
+                lines.append(http_line(ts, method, path, user, rnd.choice([200, 200, 302, 404, 500])))
+
+        midnight = day_start + timedelta(days=1)
+        lines.append(http_line(midnight - timedelta(seconds=20), "GET", "/home", "ana@x.com"))
+        lines.append("[relatorio][POST /tickets][OK] action=create user=bob@x.com ticketId=3\n")
+        lines.append(http_line(midnight - timedelta(seconds=5), "GET", "/tabela/ips", "carl@x.com"))
+        lines.append("[relatorio][PUT /tickets/:id][OK] action=update user=dee@x.com ticketId=4\n")
+        lines.append("[relatorio][GET /tickets/:id][OK] action=view user=zed@x.com ticketId=9\n")
+        lines.append(http_line(midnight + timedelta(seconds=5), "POST", "/api/relatorio/tickets", "bob@x.com"))
+        lines.append(http_line(midnight + timedelta(seconds=9), "PUT", "/api/relatorio/tickets/4", "dee@x.com"))
+
+    log_path.write_text("".join(lines), encoding="utf-8")
+    return log_path
+
+
+@pytest.fixture
+def hub_log(tmp_path):
+    return write_hub_log(tmp_path / "hub-out.log")
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / "cache"
+
+
+def day_range(first_day, days):
+    first_dt = datetime.combine(first_day, datetime.min.time())
+    last_dt = datetime.combine(first_day + timedelta(days=days - 1), datetime.max.time())
+    return first_dt, last_dt
+
+
+def single_pass_days(log_path: Path, first_day=FIRST_LOG_DAY, days=12):
+    """Stats serializados por dia de uma varredura so do log, sem cache."""
+    start_dt, end_dt = day_range(first_day, days)
+    daily_stats = report.collect_daily_stats(log_path, start_dt, end_dt)
+    return {day_key: report.serialize_stats(stats) for day_key, stats in daily_stats.items()}
+
+
+def full_scan_days(log_path: Path, first_day=FIRST_LOG_DAY, days=12):
+    """Referencia do coletor original: le o log inteiro do inicio, sem indice nem janelas."""
+    start_dt, end_dt = day_range(first_day, days)
+    daily_stats = report.collect_daily_stats(log_path, start_dt, end_dt, scan_windows=[(0, None, None)])
+    return {day_key: report.serialize_stats(stats) for day_key, stats in daily_stats.items()}
+
+
+def cached_days(cache_dir: Path, first_day=FIRST_LOG_DAY, days=12):
+    """Stats serializados por dia lidos dos caches gravados."""
+    cached = {}
+    for current_day in report.iter_days(first_day, first_day + timedelta(days=days - 1)):
+        payload = report.read_cache_payload(cache_dir, current_day)
+        assert payload is not None and not payload["open"], current_day
+        cached[current_day.isoformat()] = report.serialize_stats(report.stats_from_cache_payload(payload))
+    return cached
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+import generate_report_data as report
+import prewarm_hub_insights as prewarm
+from conftest import FIRST_LOG_DAY, cached_days, single_pass_days
+
+
+def test_backfill_matches_single_pass(hub_log, cache_dir):
+    # Lotes so quebram no log indexado; sem isso o teste nao passaria por nenhuma fronteira.
+    assert prewarm.backfill_split_day(report.update_log_index(hub_log, cache_dir, None)) == FIRST_LOG_DAY
+    last_day = FIRST_LOG_DAY + timedelta(days=11)
+    prewarm.run_backfill([(hub_log, [])], cache_dir, FIRST_LOG_DAY, last_day, workers=1, batch_days=3)
+
+    assert cached_days(cache_dir) == single_pass_days(hub_log)
+
+
+def test_backfill_with_workers_matches_single_pass(hub_log, cache_dir):
+    last_day = FIRST_LOG_DAY + timedelta(days=11)
+    prewarm.run_backfill([(hub_log, [])], cache_dir, FIRST_LOG_DAY, last_day, workers=2, batch_days=2)
+
+    assert cached_days(cache_dir) == single_pass_days(hub_log)
+
+
+def test_backfill_batches_split_only_the_indexed_log(cache_dir):
+    last_day = FIRST_LOG_DAY + timedelta(days=9)
+
+    assert prewarm.plan_backfill_batches(cache_dir, FIRST_LOG_DAY, last_day, 4) == [(FIRST_LOG_DAY, last_day)]
+    assert prewarm.plan_backfill_batches(cache_dir, FIRST_LOG_DAY, last_day, 4, FIRST_LOG_DAY + timedelta(days=2)) == [
+        (FIRST_LOG_DAY, FIRST_LOG_DAY + timedelta(days=1)),
+        (FIRST_LOG_DAY + timedelta(days=2), FIRST_LOG_DAY + timedelta(days=5)),
+        (FIRST_LOG_DAY + timedelta(days=6), last_day),
+    ]
@@ -0,0 +1,34 @@
+import json
+from datetime import timedelta
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, cached_days, day_range, single_pass_days
+
+DAYS = 12
+
+
+def dump_stats(stats):
+    return json.dumps(report.serialize_stats(stats), sort_keys=True)
+
+
+def test_cold_cache_matches_single_pass(hub_log, cache_dir):
+    stats, cache_meta = report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+
+    assert cache_meta["misses"] == DAYS
+    assert cached_days(cache_dir) == single_pass_days(hub_log)
+    single_pass = report.collect_daily_stats(hub_log, *day_range(FIRST_LOG_DAY, DAYS))
+    expected = report.empty_stats()
+    for _, day_stats in sorted(single_pass.items()):
+        report.merge_stats(expected, day_stats)
+    assert dump_stats(stats) == dump_stats(expected)
+
+
+def test_missing_day_is_rebuilt_alone(hub_log, cache_dir):
+    report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+    hole = FIRST_LOG_DAY + timedelta(days=5)
+    report.cache_file_for_day(cache_dir, hole).unlink()
+
+    _, cache_meta = report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+
+    assert cache_meta["misses"] == 1
+    assert cached_days(cache_dir)[hole.isoformat()] == single_pass_days(hub_log, hole, 1)[hole.isoformat()]
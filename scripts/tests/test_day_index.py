@@ -0,0 +1,15 @@
+from datetime import date
+
+import generate_report_data as report
+from conftest import cached_days, day_range, full_scan_days
+
+# Intervalos que terminam num dia cujo ultimo evento de relatorio nunca pareia.
+RANGES = [(date(2025, 3, 12), 1), (date(2025, 3, 4), 3), (date(2025, 3, 1), 12)]
+
+
+def test_indexed_windows_match_full_scan(hub_log, tmp_path):
+    for first_day, days in RANGES:
+        cache_dir = tmp_path / f"cache-{first_day}-{days}"
+        report.collect_with_daily_cache(hub_log, *day_range(first_day, days), cache_dir)
+
+        assert cached_days(cache_dir, first_day, days) == full_scan_days(hub_log, first_day, days)
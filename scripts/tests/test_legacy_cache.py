@@ -0,0 +1,76 @@
+import json
+import shutil
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, single_pass_days
+
+COMMITTED_CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / "hub-insights-daily"
+LEGACY_DAY = date(2026, 2, 5)
+
+
+def copy_legacy_day(cache_dir: Path, day=LEGACY_DAY, as_day=None):
+    payload = json.loads((COMMITTED_CACHE_DIR / f"{day.isoformat()}.json").read_text(encoding="utf-8"))
+    as_day = as_day or day
+    payload["date"] = as_day.isoformat()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    legacy_path = cache_dir / f"{as_day.isoformat()}.json"
+    legacy_path.write_text(json.dumps(payload), encoding="utf-8")
+    return payload, legacy_path
+
+
+def test_legacy_day_outside_the_log_is_kept(hub_log, cache_dir):
+    legacy_payload, legacy_path = copy_legacy_day(cache_dir)
+    day_range = (datetime.combine(LEGACY_DAY, datetime.min.time()), datetime.combine(LEGACY_DAY, datetime.max.time()))
+
+    stats, cache_meta = report.collect_with_daily_cache(hub_log, *day_range, cache_dir)
+
+    assert cache_meta["misses"] == 0
+    assert report.serialize_stats(stats)["kpis"]["totalRequests"] == legacy_payload["stats"]["kpis"]["totalRequests"] == 108
+    # Regravado no formato atual so depois de aceito; o JSON sai junto.
+    payload = report.read_cache_payload(cache_dir, LEGACY_DAY)
+    assert payload["schemaVersion"] == report.CACHE_SCHEMA_VERSION
+    assert payload["stats"]["kpis"]["totalRequests"] == 108
+    assert not legacy_path.exists()
+
+    stats, cache_meta = report.collect_with_daily_cache(hub_log, *day_range, cache_dir)
+    assert cache_meta["hits"] == 1
+    assert report.serialize_stats(stats)["kpis"]["totalRequests"] == 108
+
+
+def test_legacy_read_does_not_touch_the_file(cache_dir):
+    _, legacy_path = copy_legacy_day(cache_dir)
+
+    payload = report.read_cache_payload(cache_dir, LEGACY_DAY)
+
+    assert report.is_outdated_cache(payload)
+    assert legacy_path.exists()
+    assert not report.cache_file_for_day(cache_dir, LEGACY_DAY).exists()
+
+
+def test_committed_legacy_month_survives_a_report(hub_log, cache_dir):
+    shutil.copytree(COMMITTED_CACHE_DIR, cache_dir)
+    expected = sum(
+        json.loads(path.read_text(encoding="utf-8"))["stats"]["kpis"]["totalRequests"]
+        for path in cache_dir.glob("2026-02-*.json")
+    )
+
+    stats, cache_meta = report.collect_with_daily_cache(hub_log, datetime(2026, 2, 1), datetime(2026, 2, 28, 23, 59, 59), cache_dir)
+
+    assert cache_meta["misses"] == 0
+    assert report.serialize_stats(stats)["kpis"]["totalRequests"] == expected
+    assert not list(cache_dir.glob("2026-02-*.json"))
+
+
+def test_legacy_day_still_in_the_log_is_rebuilt(hub_log, cache_dir):
+    covered_day = FIRST_LOG_DAY + timedelta(days=4)
+    _, legacy_path = copy_legacy_day(cache_dir, as_day=covered_day)
+    day_range = (datetime.combine(covered_day, datetime.min.time()), datetime.combine(covered_day, datetime.max.time()))
+
+    stats, cache_meta = report.collect_with_daily_cache(hub_log, *day_range, cache_dir)
+
+    assert cache_meta["misses"] == 1
+    assert report.serialize_stats(stats) == single_pass_days(hub_log, covered_day, 1)[covered_day.isoformat()]
+    assert report.read_cache_payload(cache_dir, covered_day)["schemaVersion"] == report.CACHE_SCHEMA_VERSION
+    assert not legacy_path.exists()
@@ -0,0 +1,23 @@
+import bench_report_parser as bench
+
+EDGE_LINES = [
+    '172.19.5.20 - - [05/Mar/2025 10:00:00] "get /api/mkt?x=1 HTTP/1.1" 200 12 - user=ana@x.com',
+    '172.19.5.20 - - [05/Mar/2025 10:00:00] "POST /api/mkt HTTP/1.1" 500 -',
+    '172.19.5.20 - - [31/Feb/2025 10:00:00] "POST /api/mkt HTTP/1.1" 200 12 - user=ana@x.com',
+    "2025-03-05 10:00:00 linha sem formato de acesso",
+    "[RELATORIO][PUT /tickets/:id][ok] action=Update user=Ana@X.com ticketId=4",
+    "[relatorio][GET /tickets][OK]",
+    "[relatorioX] nao e evento",
+    "[ʀelatorio][PUT /tickets/:id][OK] action=update",
+    "[SESSION] ana@x.com Iniciou: Geral",
+    "Traceback (most recent call last):",
+]
+
+
+def test_fast_path_matches_regex_parser(tmp_path):
+    log_path = tmp_path / "hub-synthetic.log"
+    bench.write_synthetic_log(log_path, 20000, seed=3)
+    lines = [line.strip() for line in log_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    lines.extend(EDGE_LINES)
+
+    assert [bench.parse_fast_path(line) for line in lines] == [bench.parse_regex_only(line) for line in lines]
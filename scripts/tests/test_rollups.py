@@ -0,0 +1,24 @@
+import json
+from datetime import date
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, day_range
+
+DAYS = 12
+# 2025-03-03 e a unica semana ISO fechada dentro de 2025-03-01..03-12.
+WEEK_START = date(2025, 3, 3)
+
+
+def dump_stats(stats):
+    return json.dumps(report.serialize_stats(stats), sort_keys=True)
+
+
+def test_warm_cache_reads_every_day_back(hub_log, cache_dir):
+    cold_stats, _ = report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+    warm_stats, cache_meta = report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+
+    assert report.rollup_file(cache_dir, report.ROLLUP_WEEK, WEEK_START).exists()
+    assert cache_meta["misses"] == 0
+    assert cache_meta["hits"] == DAYS
+    assert cache_meta["rollupHits"] == 1
+    assert dump_stats(warm_stats) == dump_stats(cold_stats)
@@ -0,0 +1,51 @@
+import gzip
+from datetime import date
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, cached_days, day_range, full_scan_days
+
+DAYS = 12
+ZED_EVENT = "[relatorio][GET /tickets/:id][OK] action=view user=zed@x.com ticketId=9\n"
+
+
+def split_hub_log(hub_log, log_dir, cut_days=(3, 6, 9)):
+    """Corta o log em tres .log.gz e o ativo logo depois do ultimo evento de cada dia de
+    corte, com eventos ainda pendentes na virada de arquivo."""
+    lines = hub_log.read_text(encoding="utf-8").splitlines(keepends=True)
+    day_ends = [index + 1 for index, line in enumerate(lines) if line == ZED_EVENT]
+    cuts = [0] + [day_ends[cut_day - 1] for cut_day in cut_days] + [len(lines)]
+
+    log_dir.mkdir()
+    for part, (first, last) in enumerate(zip(cuts, cuts[1:-1])):
+        with gzip.open(log_dir / f"hub-out__{part}.log.gz", "wt", encoding="utf-8") as handle:
+            handle.writelines(lines[first:last])
+    live_log = log_dir / "hub-out.log"
+    live_log.write_text("".join(lines[cuts[-2]:]), encoding="utf-8")
+    return report.resolve_log_set(str(log_dir))
+
+
+def test_rotated_set_matches_single_file(hub_log, tmp_path):
+    live_log, rotated_logs = split_hub_log(hub_log, tmp_path / "logs")
+    assert len(rotated_logs) == 3
+
+    for first_day, days in [(FIRST_LOG_DAY, DAYS), (date(2025, 3, 3), 5), (date(2025, 3, 9), 1)]:
+        cache_dir = tmp_path / f"cache-{first_day}-{days}"
+        report.collect_with_daily_cache(live_log, *day_range(first_day, days), cache_dir, rotated_logs=rotated_logs)
+
+        assert cached_days(cache_dir, first_day, days) == full_scan_days(hub_log, first_day, days)
+
+
+def test_rotated_holes_match_single_file(hub_log, tmp_path):
+    live_log, rotated_logs = split_hub_log(hub_log, tmp_path / "logs")
+    cache_dir = tmp_path / "cache"
+    report.collect_with_daily_cache(live_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir, rotated_logs=rotated_logs)
+    holes = [date(2025, 3, 3), date(2025, 3, 6), date(2025, 3, 10)]
+    for hole in holes:
+        report.cache_file_for_day(cache_dir, hole).unlink()
+
+    _, cache_meta = report.collect_with_daily_cache(live_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir, rotated_logs=rotated_logs)
+
+    assert cache_meta["misses"] == len(holes)
+    rebuilt = cached_days(cache_dir)
+    for hole in holes:
+        assert rebuilt[hole.isoformat()] == full_scan_days(hub_log, hole, 1)[hole.isoformat()]
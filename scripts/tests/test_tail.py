@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, format_log_ts, single_pass_days, write_hub_log
+
+TODAY = FIRST_LOG_DAY + timedelta(days=5)
+
+
+class FakeNow:
+    value = datetime.combine(TODAY, datetime.min.time()) + timedelta(hours=12)
+
+
+class FakeDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return FakeNow.value
+
+
+@pytest.fixture
+def log_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(report, "datetime", FakeDatetime)
+    # Os testes que mudam o relogio voltam ao valor inicial no fim.
+    monkeypatch.setattr(FakeNow, "value", FakeNow.value)
+    source = write_hub_log(tmp_path / "source.log", days=8)
+    return source.read_bytes().splitlines(keepends=True)
+
+
+def first_line_at(lines, ts):
+    prefix = f"[{format_log_ts(ts)[:14]}".encode()
+    return next(index for index, line in enumerate(lines) if prefix in line)
+
+
+def cached_day_stats(log_path, cache_dir, day):
+    start_dt = FakeDatetime.combine(day, datetime.min.time())
+    stats, cache_meta = report.collect_with_daily_cache(log_path, start_dt, start_dt.replace(hour=23, minute=59, second=59), cache_dir)
+    return report.serialize_stats(stats), cache_meta
+
+
+def expected_day_stats(log_path, day):
+    return single_pass_days(log_path, day, 1).get(day.isoformat(), report.serialize_stats(report.empty_stats()))
+
+
+def test_tail_follows_a_growing_log(log_lines, tmp_path, cache_dir):
+    log_path = tmp_path / "hub-out.log"
+    noon = first_line_at(log_lines, FakeNow.value)
+
+    steps = (noon - 150, noon - 60, noon - 5, noon)
+    for step, upto in enumerate(steps):
+        log_path.write_bytes(b"".join(log_lines[:upto]))
+        stats, cache_meta = cached_day_stats(log_path, cache_dir, TODAY)
+        assert stats["kpis"]["totalRequests"] > 0
+        assert stats == expected_day_stats(log_path, TODAY)
+        assert report.read_cache_payload(cache_dir, TODAY)["open"]
+        # Depois da primeira rodada, so o que foi acrescentado ao log e lido.
+        if step:
+            assert cache_meta["tailBytes"] == len(b"".join(log_lines[steps[step - 1]:upto]))
+
+
+def test_tail_ignores_a_partial_last_line(log_lines, tmp_path, cache_dir):
+    log_path = tmp_path / "hub-out.log"
+    noon = first_line_at(log_lines, FakeNow.value)
+    log_path.write_bytes(b"".join(log_lines[:noon]) + log_lines[noon][:15])
+
+    cached_day_stats(log_path, cache_dir, TODAY)
+    log_path.write_bytes(b"".join(log_lines[:noon + 1]))
+    stats, _ = cached_day_stats(log_path, cache_dir, TODAY)
+
+    assert stats == expected_day_stats(log_path, TODAY)
+
+
+def test_tail_seals_the_day_after_midnight(log_lines, tmp_path, cache_dir, monkeypatch):
+    log_path = tmp_path / "hub-out.log"
+    log_path.write_bytes(b"".join(log_lines[:first_line_at(log_lines, FakeNow.value)]))
+    cached_day_stats(log_path, cache_dir, TODAY)
+
+    tomorrow = TODAY + timedelta(days=1)
+    monkeypatch.setattr(FakeNow, "value", datetime.combine(tomorrow, datetime.min.time()) + timedelta(hours=9))
+    log_path.write_bytes(b"".join(log_lines[:first_line_at(log_lines, FakeNow.value)]))
+
+    for day in (TODAY, tomorrow):
+        stats, _ = cached_day_stats(log_path, cache_dir, day)
+        assert stats == expected_day_stats(log_path, day)
+    assert not report.read_cache_payload(cache_dir, TODAY)["open"]
+    assert report.read_cache_payload(cache_dir, tomorrow)["open"]
+
+
+def test_tail_restarts_after_truncation(log_lines, tmp_path, cache_dir):
+    log_path = tmp_path / "hub-out.log"
+    noon = first_line_at(log_lines, FakeNow.value)
+    log_path.write_bytes(b"".join(log_lines[:noon]))
+    cached_day_stats(log_path, cache_dir, TODAY)
+
+    # pm2 rotacionou: o arquivo recomeca menor, so com o fim da manha.
+    log_path.write_bytes(b"".join(log_lines[noon - 400:noon]))
+    stats, cache_meta = cached_day_stats(log_path, cache_dir, TODAY)
+
+    assert cache_meta["misses"] == 1
+    assert stats == expected_day_stats(log_path, TODAY)
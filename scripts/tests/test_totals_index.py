@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, day_range, write_hub_log
+
+DAYS = 12
+
+
+def report_totals(log_path, cache_dir, first_day, days):
+    stats, _ = report.collect_with_daily_cache(log_path, *day_range(first_day, days), cache_dir)
+    return report.totals_from_payload(report.serialize_stats(stats))
+
+
+def test_totals_match_the_full_report(hub_log, cache_dir):
+    report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+
+    totals, meta = report.collect_range_totals(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir, None)
+
+    assert meta["indexedDays"] == DAYS
+    assert totals == report_totals(hub_log, cache_dir, FIRST_LOG_DAY, DAYS)
+
+
+def test_totals_index_extends_to_earlier_days(hub_log, cache_dir):
+    later_day = FIRST_LOG_DAY + timedelta(days=6)
+    report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+    report.collect_range_totals(hub_log, *day_range(later_day, DAYS - 6), cache_dir, None)
+    month_start = FIRST_LOG_DAY.replace(day=1)
+    indexed_days = set(report.load_totals_month(cache_dir, month_start)["days"])
+
+    totals, meta = report.collect_range_totals(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir, None)
+
+    # Os dias anteriores entram no mesmo arquivo do mes, sem descartar os que ja estavam.
+    assert indexed_days < set(report.load_totals_month(cache_dir, month_start)["days"])
+    assert meta["indexedDays"] == DAYS
+    assert totals == report_totals(hub_log, cache_dir, FIRST_LOG_DAY, DAYS)
+
+
+def test_rebuilt_day_leaves_the_totals_index(hub_log, cache_dir):
+    report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir)
+    report.collect_range_totals(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir, None)
+    rebuilt_day = FIRST_LOG_DAY + timedelta(days=3)
+    report.write_cached_day(cache_dir, rebuilt_day, report.empty_stats(), hub_log, 0)
+
+    totals, _ = report.collect_range_totals(hub_log, *day_range(FIRST_LOG_DAY, DAYS), cache_dir, None)
+
+    assert totals == report_totals(hub_log, cache_dir, FIRST_LOG_DAY, DAYS)
+
+
+def test_later_month_offset_follows_earlier_days(tmp_path):
+    first_day = date(2025, 2, 24)
+    log_path = write_hub_log(tmp_path / "hub-out.log", first_day=first_day, days=DAYS)
+    cache_dir = tmp_path / "cache"
+    report.collect_with_daily_cache(log_path, *day_range(first_day, DAYS), cache_dir)
+    march = date(2025, 3, 1)
+    report.collect_range_totals(log_path, *day_range(march, 7), cache_dir, None)
+    assert report.load_totals_month(cache_dir, march)["offset"] == report.empty_totals()
+
+    totals, meta = report.collect_range_totals(log_path, *day_range(date(2025, 2, 26), 6), cache_dir, None)
+
+    # Fevereiro entrou antes de marco: o offset de marco passa a carregar o mes anterior.
+    february = report.load_totals_month(cache_dir, date(2025, 2, 1))
+    assert report.load_totals_month(cache_dir, march)["offset"] == report.totals_month_end(february)
+    assert meta["indexedDays"] == 6
+    assert totals == report_totals(log_path, cache_dir, date(2025, 2, 26), 6)
@@ -0,0 +1,24 @@
+import json
+
+import generate_report_data as report
+from conftest import FIRST_LOG_DAY, cached_days, day_range
+
+DAYS = 12
+
+
+def dump_stats(stats):
+    return json.dumps(report.serialize_stats(stats), sort_keys=True)
+
+
+def test_workers_match_sequential_scan(hub_log, tmp_path, monkeypatch):
+    # Trechos pequenos para o log sintetico ser dividido entre os processos.
+    monkeypatch.setattr(report, "SCAN_CHUNK_BYTES", 16 * 1024)
+    sequential_dir = tmp_path / "sequential"
+    parallel_dir = tmp_path / "parallel"
+
+    sequential_stats, _ = report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), sequential_dir)
+    parallel_stats, _ = report.collect_with_daily_cache(hub_log, *day_range(FIRST_LOG_DAY, DAYS), parallel_dir, workers=2)
+
+    assert dump_stats(parallel_stats) == dump_stats(sequential_stats)
+    assert cached_days(parallel_dir) == cached_days(sequential_dir)
+    assert report.update_log_index(hub_log, parallel_dir)["days"] == report.update_log_index(hub_log, sequential_dir)["days"]
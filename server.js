@@ -4,6 +4,8 @@ import session from "express-session";
 import express from "express";
 import morgan from "morgan";
 import path from "path";
+import { existsSync } from "node:fs";
+import { readFile } from "node:fs/promises";
 import { fileURLToPath } from "url";
 
 // Imports de middleware
@@ -112,9 +114,27 @@ app.get("/hub.html", ensureAdmin, (req, res) => {
   res.redirect("/admin/hub-relatorio");
 });
 
-app.get("/reportData.js", ensureAdmin, (req, res) => {
-  res.set("Cache-Control", "no-store");
-  res.sendFile(path.join(__dirname, "public", "reportData.js"));
+app.get("/reportData.js", ensureAdmin, async (req, res) => {
+  const reportPath = path.join(__dirname, "public", "reportData.js");
+  // generate_report_data.py grava o hash do conteudo e a versao .gz ao lado do arquivo.
+  const contentHash = await readFile(`${reportPath}.sha256`, "utf8").then((value) => value.trim(), () => "");
+  if (!contentHash) {
+    res.set("Cache-Control", "no-store");
+    return res.sendFile(reportPath);
+  }
+
+  res.set("Cache-Control", "no-cache");
+  res.set("ETag", `W/"${contentHash}"`);
+  res.vary("Accept-Encoding");
+  if (req.fresh) {
+    return res.status(304).end();
+  }
+  if (req.acceptsEncodings("gzip", "identity") === "gzip" && existsSync(`${reportPath}.gz`)) {
+    res.set("Content-Encoding", "gzip");
+    res.type("application/javascript");
+    return res.sendFile(`${reportPath}.gz`);
+  }
+  return res.sendFile(reportPath);
 });
 
 app.get("/homeAdmin", ensureAdmin, (req, res) => {
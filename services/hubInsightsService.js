@@ -2,12 +2,15 @@ import { spawn } from "node:child_process";
 import { existsSync } from "node:fs";
 import { homedir } from "node:os";
 import path from "node:path";
+import { createInterface } from "node:readline";
 import { fileURLToPath } from "node:url";
 
 export const MAX_HUB_INSIGHTS_DAYS = 90;
 
 const DATE_RE = /^\d{4}-\d{2}-\d{2}$/;
 const MS_PER_DAY = 24 * 60 * 60 * 1000;
+const DAEMON_REQUEST_TIMEOUT_MS = 2 * 60 * 1000;
+const DAEMON_STDERR_LIMIT = 4000;
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -198,8 +201,180 @@ async function runPythonGenerator(range) {
   );
 }
 
+// Processo Python residente (generate_report_data.py --serve): mantem os dias em memoria
+// e responde um pedido JSON por linha, evitando subir um interpretador a cada consulta.
+// O processo atende um pedido por vez, entao so um fica em voo e os demais esperam na fila:
+// o timeout conta a partir da escrita e nao pune quem esta atras de uma varredura longa.
+let activeDaemon = null;
+let daemonStart = null;
+
+// Erro respondido pelo proprio processo residente: ele esta de pe, entao nao ha fallback.
+class HubInsightsDaemonError extends Error {
+  constructor(message) {
+    super(message);
+    this.name = "HubInsightsDaemonError";
+  }
+}
+
+function failDaemonRequests(daemon, error) {
+  for (const request of daemon.pending.values()) {
+    clearTimeout(request.timer);
+    request.reject(error);
+  }
+  daemon.pending.clear();
+  daemon.queue = [];
+}
+
+function sendNextDaemonRequest(daemon) {
+  if (daemon.inFlightId !== null || daemon.queue.length === 0) {
+    return;
+  }
+
+  const request = daemon.queue.shift();
+  daemon.inFlightId = request.id;
+  request.timer = setTimeout(() => {
+    // Processo travado: encerra para o "close" falhar a fila e o proximo pedido subir outro.
+    daemon.pending.delete(request.id);
+    request.reject(new Error(`${daemon.label}: sem resposta do modo residente em ${DAEMON_REQUEST_TIMEOUT_MS} ms`));
+    if (activeDaemon === daemon) {
+      activeDaemon = null;
+    }
+    daemon.child.kill();
+  }, DAEMON_REQUEST_TIMEOUT_MS);
+  daemon.child.stdin.write(`${JSON.stringify(request.message)}\n`);
+}
+
+function attachDaemon(child, label) {
+  const daemon = { child, label, nextId: 1, pending: new Map(), queue: [], inFlightId: null, stderr: "" };
+
+  createInterface({ input: child.stdout, crlfDelay: Infinity }).on("line", (line) => {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      return;
+    }
+
+    if (message.id === daemon.inFlightId) {
+      daemon.inFlightId = null;
+      sendNextDaemonRequest(daemon);
+    }
+
+    const request = daemon.pending.get(message.id);
+    if (!request) {
+      return;
+    }
+
+    daemon.pending.delete(message.id);
+    clearTimeout(request.timer);
+    if (message.error) {
+      request.reject(
+        message.validation
+          ? new HubInsightsValidationError(message.error)
+          : new HubInsightsDaemonError(`${label}: ${message.error}`),
+      );
+      return;
+    }
+    request.resolve(message.report);
+  });
+
+  child.stderr.on("data", (chunk) => {
+    daemon.stderr = (daemon.stderr + chunk.toString()).slice(-DAEMON_STDERR_LIMIT);
+  });
+
+  // Escrita em um processo que acabou de morrer; o "close" abaixo rejeita os pendentes.
+  child.stdin.on("error", () => {});
+
+  child.on("close", (code) => {
+    if (activeDaemon === daemon) {
+      activeDaemon = null;
+    }
+    failDaemonRequests(daemon, new Error(`${label}: ${daemon.stderr.trim() || `exit ${code}`}`));
+  });
+
+  return daemon;
+}
+
+function spawnDaemon(candidate) {
+  const scriptArgs = [
+    path.join(projectRoot, "scripts", "generate_report_data.py"),
+    "--log",
+    defaultLogPath,
+    "--serve",
+  ];
+
+  return new Promise((resolve, reject) => {
+    const child = spawn(candidate.command, [...candidate.args, ...scriptArgs], {
+      cwd: projectRoot,
+      windowsHide: true,
+      stdio: ["pipe", "pipe", "pipe"],
+    });
+
+    child.once("error", reject);
+    child.once("spawn", () => resolve(child));
+  });
+}
+
+async function startDaemon() {
+  let lastError = null;
+
+  for (const candidate of pythonCandidates) {
+    if (path.isAbsolute(candidate.command) && !existsSync(candidate.command)) {
+      continue;
+    }
+
+    try {
+      const child = await spawnDaemon(candidate);
+      activeDaemon = attachDaemon(child, candidate.label);
+      return activeDaemon;
+    } catch (error) {
+      lastError = `${candidate.label}: ${error.message}`;
+    }
+  }
+
+  throw new Error(
+    lastError ||
+      "Python nao encontrado. Habilite 'py' ou 'python' no PATH, ou ajuste o caminho do python.exe.",
+  );
+}
+
+async function getDaemon() {
+  if (activeDaemon) {
+    return activeDaemon;
+  }
+
+  if (!daemonStart) {
+    daemonStart = startDaemon().finally(() => {
+      daemonStart = null;
+    });
+  }
+  return daemonStart;
+}
+
+async function requestFromDaemon(range) {
+  const daemon = await getDaemon();
+  const id = daemon.nextId++;
+
+  return new Promise((resolve, reject) => {
+    const request = { id, message: { id, from: range.from, to: range.to }, resolve, reject, timer: null };
+    daemon.pending.set(id, request);
+    daemon.queue.push(request);
+    sendNextDaemonRequest(daemon);
+  });
+}
+
 export async function getHubInsightsReport({ from, to }) {
   const range = resolveHubInsightsRange({ from, to });
+
+  try {
+    return await requestFromDaemon(range);
+  } catch (error) {
+    if (error instanceof HubInsightsValidationError || error instanceof HubInsightsDaemonError) {
+      throw error;
+    }
+    console.warn("[hubInsightsService] modo residente indisponivel, gerando avulso:", error.message);
+  }
+
   const output = await runPythonGenerator(range);
 
   try {